@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""Stand-in for katanaBin used by the benchmarks.
+
+It is called through a ``.sh``/``.bat`` wrapper with the arguments
+``AnalyzeKatana`` passes to such wrappers: the analysis script, the task
+folder and the scene. The scene is analysed with the offline parser, which
+writes the same task.json and asset.json as the Katana script, so the
+client side of the analysis runs exactly as in production.
+
+"""
+
+import json
+import os
+import sys
+
+from rayvision_katana.offline_parser import analyse_scene
+
+
+def main(argv):
+    """Analyse the scene and return the exit code."""
+    _, task_path, cg_file = argv[:3]
+    result = analyse_scene(cg_file, task_path)
+    if not result.resolved:
+        sys.stderr.write("\n".join(result.unresolved) + "\n")
+        return 1
+    with open(os.path.join(task_path, "tips.json"), "w") as tips:
+        json.dump({}, tips)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
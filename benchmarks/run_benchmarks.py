@@ -0,0 +1,331 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""Benchmark the analysis end to end against a stand-in katanaBin.
+
+A synthetic scene and its asset tree are generated at the requested scale,
+then ``AnalyzeKatana.analyse`` runs several times against ``fake_katana.py``
+through the ``.sh``/``.bat`` branch of the analysis command, and
+``get_file_md5`` is timed with and without the hash cache, as are the bulk
+``hash_files`` of a batch of files, the import of the package and the
+construction of analyzers. The report gives throughput, latency percentiles
+and peak memory, and is compared with a stored baseline::
+
+    python benchmarks/run_benchmarks.py --assets 100000 --iterations 5
+    python benchmarks/run_benchmarks.py --save-baseline
+
+The exit code is 1 when a metric regressed by more than the tolerance.
+
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import shutil
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCHMARKS)
+
+# pylint: disable=wrong-import-position
+from rayvision_katana.analyse_katana import AnalyzeKatana
+from rayvision_katana.analyse_metrics import peak_rss_kb
+from rayvision_katana.hash_cache import HashCache
+from rayvision_katana.hashing import hash_files
+from scenes import generate_assets
+from scenes import generate_scene
+
+BASELINE = os.path.join(BENCHMARKS, "baseline.json")
+
+# Metrics where a larger value is an improvement; for the others, such as
+# latencies and memory, smaller is better.
+HIGHER_IS_BETTER = ("analyse.assets_per_second", "analyse.scenes_per_second",
+                    "md5.cold_mb_per_second",
+                    "hash_files.md5_serial_mb_per_second",
+                    "hash_files.md5_mb_per_second",
+                    "hash_files.blake2b_mb_per_second",
+                    "hash_files.md5_sampled_mb_per_second")
+
+# Files hashed together by the bulk hashing benchmark.
+HASHED_FILES = 16
+
+# Analyzers created per timing of the construction.
+CONSTRUCTIONS = 1000
+
+IMPORT_SCRIPT = ("import time; start = time.time(); "
+                 "import rayvision_katana.analyse_katana; "
+                 "print(time.time() - start)")
+
+# Latency changes below this many seconds are timer noise, not regressions.
+NOISE_SECONDS = 0.01
+
+
+def percentile(values, percent):
+    """Get the nearest-rank percentile of a list of numbers."""
+    ordered = sorted(values)
+    rank = max(int(math.ceil(percent / 100.0 * len(ordered))) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def latency_stats(prefix, seconds):
+    """Summarize latencies in seconds under ``prefix``."""
+    return {
+        prefix + ".mean": sum(seconds) / len(seconds),
+        prefix + ".p50": percentile(seconds, 50),
+        prefix + ".p90": percentile(seconds, 90),
+        prefix + ".p99": percentile(seconds, 99),
+    }
+
+
+def write_fake_katana(folder):
+    """Write the ``.sh``/``.bat`` wrapper that runs fake_katana.py."""
+    script = os.path.join(BENCHMARKS, "fake_katana.py")
+    if os.name == "nt":
+        exe_path = os.path.join(folder, "fake_katana.bat")
+        content = '@echo off\r\nset PYTHONPATH={}\r\n"{}" "{}" %*\r\n'.format(
+            ROOT, sys.executable, script)
+    else:
+        exe_path = os.path.join(folder, "fake_katana.sh")
+        content = '#!/bin/sh\nPYTHONPATH="{}" exec "{}" "{}" "$@"\n'.format(
+            ROOT, sys.executable, script)
+    with open(exe_path, "w") as exe_file:
+        exe_file.write(content)
+    os.chmod(exe_path, os.stat(exe_path).st_mode | stat.S_IEXEC)
+    return exe_path
+
+
+def bench_analyse(folder, cg_file, exe_path, iterations, assets, logger):
+    """Time complete analyses of the synthetic scene."""
+    seconds = []
+    for _ in range(iterations):
+        analyzer = AnalyzeKatana(cg_file, "3.2v1", "benchmark", {},
+                                 workspace=folder, hash_cache=False,
+                                 logger=logger)
+        start = time.time()
+        analyzer.analyse(exe_path=exe_path)
+        seconds.append(time.time() - start)
+    results = latency_stats("analyse.seconds", seconds)
+    mean = results["analyse.seconds.mean"]
+    results["analyse.assets_per_second"] = assets / mean
+    results["analyse.scenes_per_second"] = 1 / mean
+    return results
+
+
+def bench_md5(folder, file_size, iterations, logger):
+    """Time ``get_file_md5`` on a file without and with the hash cache."""
+    data_file = os.path.join(folder, "md5.bin")
+    chunk = os.urandom(1024 * 1024)
+    with open(data_file, "wb") as data:
+        for _ in range(max(file_size // len(chunk), 1)):
+            data.write(chunk)
+    size_mb = os.path.getsize(data_file) / (1024.0 * 1024)
+
+    workspace = os.path.join(folder, "md5")
+    os.makedirs(workspace)
+    hash_cache = HashCache(os.path.join(workspace, "hash_cache.db"))
+    results = {}
+    for name, cache in (("cold", False), ("warm", hash_cache)):
+        analyzer = AnalyzeKatana(data_file, "3.2v1", "benchmark", {},
+                                 workspace=workspace, hash_cache=cache,
+                                 logger=logger)
+        analyzer.get_file_md5(data_file)
+        seconds = []
+        for _ in range(iterations):
+            start = time.time()
+            analyzer.get_file_md5(data_file)
+            seconds.append(time.time() - start)
+        results.update(latency_stats("md5.%s_seconds" % name, seconds))
+    hash_cache.close()
+    results["md5.cold_mb_per_second"] = (
+        size_mb / results["md5.cold_seconds.mean"])
+    return results
+
+
+def bench_hash_files(folder, file_size, iterations):
+    """Time ``hash_files`` on a batch of files, serially and concurrently.
+
+    Files are written from random data rather than left sparse, so reading
+    them costs like reading real assets.
+
+    """
+    hashed = os.path.join(folder, "hashed")
+    os.makedirs(hashed)
+    chunk = os.urandom(min(file_size, 1024 * 1024))
+    paths = []
+    for index in range(HASHED_FILES):
+        path = os.path.join(hashed, "%s.bin" % index)
+        with open(path, "wb") as data:
+            for _ in range(max(file_size // len(chunk), 1)):
+                data.write(chunk)
+        paths.append(path)
+    size_mb = sum(os.path.getsize(path) for path in paths) / (1024.0 * 1024)
+    results = {}
+    for name, kwargs in (
+            ("md5_serial", {"workers": 1}),
+            ("md5", {}),
+            ("blake2b", {"algorithm": "blake2b"}),
+            ("md5_sampled", {"sampled": True})):
+        seconds = []
+        for _ in range(iterations):
+            start = time.time()
+            hash_files(paths, **kwargs)
+            seconds.append(time.time() - start)
+        results.update(latency_stats("hash_files.%s_seconds" % name,
+                                     seconds))
+        results["hash_files.%s_mb_per_second" % name] = (
+            size_mb / results["hash_files.%s_seconds.mean" % name])
+    return results
+
+
+def bench_construction(folder, cg_file, iterations):
+    """Time the import of the package and the creation of analyzers.
+
+    Analyzers use the default logger here, and nothing should touch the
+    disk before their first write.
+
+    """
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    import_seconds = []
+    for _ in range(iterations):
+        output = subprocess.check_output([sys.executable, "-c",
+                                          IMPORT_SCRIPT], env=env)
+        import_seconds.append(float(output.decode().strip()))
+    results = latency_stats("import.seconds", import_seconds)
+
+    workspace = os.path.join(folder, "construction")
+    os.makedirs(workspace)
+    seconds = []
+    for _ in range(iterations):
+        start = time.time()
+        for _ in range(CONSTRUCTIONS):
+            AnalyzeKatana(cg_file, "3.2v1", "benchmark", {},
+                          workspace=workspace, log_folder=workspace)
+        seconds.append(time.time() - start)
+    results.update(latency_stats("construct.seconds_per_%s" % CONSTRUCTIONS,
+                                 seconds))
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Compare results with a baseline.
+
+    Returns:
+        list: ``(metric, baseline, value)`` of every regression.
+
+    """
+    regressions = []
+    for metric, expected in sorted(baseline.items()):
+        value = results.get(metric)
+        if value is None or not expected:
+            continue
+        if "seconds." in metric and abs(value - expected) < NOISE_SECONDS:
+            continue
+        if metric in HIGHER_IS_BETTER:
+            regressed = value < expected * (1 - tolerance)
+        else:
+            regressed = value > expected * (1 + tolerance)
+        if regressed:
+            regressions.append((metric, expected, value))
+    return regressions
+
+
+def run(args):
+    """Generate the data, run the benchmarks and get the report."""
+    logger = logging.getLogger("benchmarks")
+    logger.setLevel(logging.WARNING)
+    folder = args.workdir or tempfile.mkdtemp(prefix="katana_benchmark_")
+    try:
+        asset_root = os.path.join(folder, "assets")
+        cg_file = generate_scene(os.path.join(folder, "scene.katana"),
+                                 asset_root, args.render_nodes, args.outputs,
+                                 args.assets)
+        generate_assets(asset_root, args.assets, args.file_size,
+                        args.existing)
+        exe_path = write_fake_katana(folder)
+        results = {}
+        results.update(bench_analyse(folder, cg_file, exe_path,
+                                     args.iterations, args.assets, logger))
+        results.update(bench_md5(folder, args.file_size, args.iterations,
+                                 logger))
+        results.update(bench_hash_files(folder, args.file_size,
+                                        args.iterations))
+        results.update(bench_construction(folder, cg_file, args.iterations))
+        results["memory.client_peak_kb"] = peak_rss_kb()
+        results["memory.katana_peak_kb"] = peak_rss_kb(children=True)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(folder, ignore_errors=True)
+    config = {key: getattr(args, key) for key in (
+        "render_nodes", "outputs", "assets", "file_size", "existing",
+        "iterations")}
+    return {"config": config, "results": results}
+
+
+def parse_args(argv=None):
+    """Parse the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--render-nodes", type=int, default=4)
+    parser.add_argument("--outputs", type=int, default=4,
+                        help="File outputs of every render node.")
+    parser.add_argument("--assets", type=int, default=10000,
+                        help="Asset paths of the scene, at least 1.")
+    parser.add_argument("--file-size", type=int, default=1024 * 1024,
+                        help="Size of the asset files and the hashed file.")
+    parser.add_argument("--existing", type=float, default=1.0,
+                        help="Share of the asset paths that exist.")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--workdir",
+                        help="Keep the generated data in this folder.")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Store this run as the baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed relative regression.")
+    parser.add_argument("--output", help="Also write the report here.")
+    args = parser.parse_args(argv)
+    if args.assets < 1:
+        parser.error("--assets must be at least 1")
+    return args
+
+
+def main(argv=None):
+    """Run the benchmarks and compare them with the baseline."""
+    args = parse_args(argv)
+    report = run(args)
+    results = report["results"]
+    for metric in sorted(results):
+        print("%-32s %14.4f" % (metric, results[metric] or 0))
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=4, sort_keys=True)
+    if args.save_baseline:
+        with open(args.baseline, "w") as baseline_file:
+            json.dump(report, baseline_file, indent=4, sort_keys=True)
+        print("baseline saved to %s" % args.baseline)
+        return 0
+    if not os.path.exists(args.baseline):
+        print("no baseline at %s" % args.baseline)
+        return 0
+
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+    if baseline["config"] != report["config"]:
+        print("the baseline was recorded with %s, results are not "
+              "comparable" % baseline["config"])
+        return 0
+    regressions = compare(results, baseline["results"], args.tolerance)
+    for metric, expected, value in regressions:
+        print("REGRESSION %s: %.4f -> %.4f" % (metric, expected, value))
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
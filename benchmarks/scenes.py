@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""Generate synthetic .katana scenes and asset trees for the benchmarks.
+
+Scenes are written node by node so millions of asset nodes never sit in
+memory. Every render node gets its own chain of ``RenderOutputDefine`` nodes
+and the asset nodes alternate between ``Alembic_In`` caches and Arnold image
+textures, so both the model and image rules of filter.txt are exercised.
+
+"""
+
+import os
+from xml.sax.saxutils import quoteattr
+
+# Asset files per directory of the generated asset tree.
+FILES_PER_DIRECTORY = 1000
+
+HEADER = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+          '<katana release="3.2v1" version="3.2.1.000001">\n'
+          '  <node name="rootNode" type="RootNode">\n')
+
+FOOTER = '  </node>\n</katana>\n'
+
+ALEMBIC = """    <node name={name} type="Alembic_In">
+      <port name="out" type="out"/>
+      <group_parameter name={name}>
+        <string_parameter name="abcAsset" value={path}/>
+      </group_parameter>
+    </node>
+"""
+
+TEXTURE = """    <node name={name} type="ArnoldShadingNode">
+      <group_parameter name={name}>
+        <string_parameter name="nodeType" value="image"/>
+        <group_parameter name="parameters">
+          <group_parameter name="filename">
+            <string_parameter name="value" value={path}/>
+          </group_parameter>
+        </group_parameter>
+      </group_parameter>
+    </node>
+"""
+
+OUTPUT = """    <node name={name} type="RenderOutputDefine">
+      <port name="input" type="in" source={source}/>
+      <port name="out" type="out"/>
+      <group_parameter name={name}>
+        <string_parameter name="outputName" value={output}/>
+        <group_parameter name="args">
+          <group_parameter name="renderSettings">
+            <group_parameter name="outputs">
+              <group_parameter name="outputName">
+                <group_parameter name="locationType">
+                  <string_parameter name="value" value="file"/>
+                </group_parameter>
+                <group_parameter name="locationSettings">
+                  <group_parameter name="renderLocation">
+                    <string_parameter name="value" value={path}/>
+                  </group_parameter>
+                </group_parameter>
+              </group_parameter>
+            </group_parameter>
+          </group_parameter>
+        </group_parameter>
+      </group_parameter>
+    </node>
+"""
+
+RENDER = """    <node name={name} type="Render">
+      <port name="input" type="in" source={source}/>
+      <group_parameter name={name}>
+        <group_parameter name="farmSettings">
+          <group_parameter name="activeFrameRange">
+            <number_parameter name="start" value="1"/>
+            <number_parameter name="end" value="100"/>
+          </group_parameter>
+        </group_parameter>
+      </group_parameter>
+    </node>
+"""
+
+
+def asset_path(asset_root, index):
+    """Get the path of the asset of a given index."""
+    extension = ".abc" if index % 2 == 0 else ".tx"
+    return "/".join([asset_root.replace("\\", "/"),
+                     "d%05d" % (index // FILES_PER_DIRECTORY),
+                     "f%07d%s" % (index, extension)])
+
+
+def generate_scene(cg_file, asset_root, render_nodes=1, outputs=1,
+                   assets=100):
+    """Write a synthetic .katana scene.
+
+    Args:
+        cg_file (str): Scene file to write.
+        asset_root (str): Folder the asset paths point into.
+        render_nodes (int): Render nodes, each with its own output chain.
+        outputs (int): File outputs of every render node.
+        assets (int): Asset nodes, at least one: the output chains start
+            from the first of them.
+
+    Returns:
+        str: The scene file path.
+
+    """
+    with open(cg_file, "w") as scene:
+        scene.write(HEADER)
+        for index in range(assets):
+            template = ALEMBIC if index % 2 == 0 else TEXTURE
+            scene.write(template.format(
+                name=quoteattr("asset%07d" % index),
+                path=quoteattr(asset_path(asset_root, index))))
+        for render_index in range(render_nodes):
+            source = "asset0000000.out"
+            for output_index in range(outputs):
+                name = "output%03d_%03d" % (render_index, output_index)
+                scene.write(OUTPUT.format(
+                    name=quoteattr(name), source=quoteattr(source),
+                    output=quoteattr("aov%03d" % output_index),
+                    path=quoteattr("/out/r%03d/aov%03d.####.exr" % (
+                        render_index, output_index))))
+                source = name + ".out"
+            scene.write(RENDER.format(
+                name=quoteattr("Render%03d" % render_index),
+                source=quoteattr(source)))
+        scene.write(FOOTER)
+    return cg_file
+
+
+def generate_assets(asset_root, assets=100, file_size=1024, existing=1.0):
+    """Create the files of the asset tree a synthetic scene points to.
+
+    Files are created sparse, so large sizes cost no disk space or time.
+
+    Args:
+        asset_root (str): Folder of the asset tree.
+        assets (int): Asset paths of the scene.
+        file_size (int): Size of every file in bytes.
+        existing (float): Share of the paths that get a file, rounded to
+            one file every n paths; the others are reported as missing.
+
+    Returns:
+        int: Number of files created.
+
+    """
+    created = 0
+    every = int(round(1 / existing)) if existing > 0 else 0
+    for index in range(assets):
+        if not every or index % every:
+            continue
+        path = asset_path(asset_root, index)
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(path, "wb") as asset:
+            asset.truncate(file_size)
+        created += 1
+    return created
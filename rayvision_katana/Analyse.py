@@ -12,16 +12,9 @@ except:
 scriptPath = os.path.dirname(os.sys.argv[0]).replace("\\", "/")
 sys.path.append(scriptPath)
 
-sys_name = "windows" if sys.platform.startswith('win') else "linux"
-sys.path.append(os.path.join(scriptPath, sys_name))
-if sys.version[0] == "2":
-    import script
-
-if sys.version[:3] == "3.7":
-    import script37 as script
-
-if sys.version[:3] == "3.9":
-    import script39 as script
+# The analysis is katana_analyse_script, shared with the warm worker, so
+# the options of analyse_options.json reach every katanaBin run.
+import katana_analyse_script
 
 parser = argparse.ArgumentParser()
 parser.add_argument("-task", help='task id', type=str)
@@ -33,4 +26,4 @@ print(args)
 file = args.file
 task = args.task
 
-script.main(file, task)
\ No newline at end of file
+katana_analyse_script.main(file, task)
@@ -1,20 +1,65 @@
 #!/usr/bin/env python
 # -*- encoding: utf-8 -*-
+import copy
+import functools
 import hashlib
+import itertools
 import logging
 import os
+import shutil
 import sys
 import time
-import traceback
 import threading
 
-from rayvision_utils import constants
-from rayvision_utils import utils
-from rayvision_utils.cmd import Cmd
-from rayvision_utils.exception import tips_code
-from rayvision_utils.exception.error_msg import ERROR9899_CGEXE_NOTEXIST
-from rayvision_utils.exception.exception import CGFileNotExistsError, AnalyseFailError, CGExeNotExistError
+# rayvision_utils and the heavier modules below are imported where they are
+# used: many analyzers are only created to read results back.
+from rayvision_katana.analyse_metrics import Metrics
+from rayvision_katana.assets import iter_asset_paths
+from rayvision_katana.assets import iter_asset_records
+from rayvision_katana.assets import merge_records
+from rayvision_katana.constants import ANALYSE_OPTIONS_NAME
+from rayvision_katana.constants import CONTENT_INDEX_NAME
+from rayvision_katana.constants import DEEP_SCAN_NAME
+from rayvision_katana.constants import HASH_CACHE_NAME
+from rayvision_katana.constants import HASH_WORKERS
+from rayvision_katana.constants import HISTORY_NAME
+from rayvision_katana.constants import INSTALL_INDEX_NAME
+from rayvision_katana.constants import KATANA_METRICS_NAME
+from rayvision_katana.constants import METRICS_NAME
 from rayvision_katana.constants import PACKAGE_NAME
+from rayvision_katana.constants import RESULT_CACHE_NAME
+from rayvision_katana.filter_rules import NamePatterns
+from rayvision_katana.path_mapping import PathMapper
+from rayvision_katana.results import AssetTable
+from rayvision_katana.results import compress_result
+from rayvision_katana.results import iter_asset_json
+from rayvision_katana.results import load_result
+from rayvision_katana.results import result_path
+
+_LOGGER_CONFIGS = set()
+_LOGGER_LOCK = threading.Lock()
+# Numbers the analyses of the process, so no two share a workspace.
+_WORKSPACE_IDS = itertools.count()
+
+
+def get_default_logger(log_folder=None, log_name=None, log_level="DEBUG"):
+    """Get the package logger, set up once per process and log file.
+
+    Args:
+        log_folder (str, optional): Custom log save location.
+        log_name (str, optional): Custom log file name.
+        log_level (str): Log level, e.g. "DEBUG" or "INFO".
+
+    """
+    with _LOGGER_LOCK:
+        if (log_folder, log_name) not in _LOGGER_CONFIGS:
+            from rayvision_log.core import init_logger
+            init_logger(PACKAGE_NAME, log_folder, log_name)
+            _LOGGER_CONFIGS.add((log_folder, log_name))
+    logger = logging.getLogger(__name__)
+    logger.setLevel(level=log_level.upper())
+    return logger
+
 
 class AnalyzeKatana(object):
     def __init__(self,
@@ -31,7 +76,25 @@ class AnalyzeKatana(object):
                  logger=None,
                  log_folder=None,
                  log_name=None,
-                 log_level="DEBUG"
+                 log_level="DEBUG",
+                 hash_cache=None,
+                 license_pool=None,
+                 worker=None,
+                 result_cache=False,
+                 analyse_mode="katana",
+                 metrics=False,
+                 metrics_hooks=None,
+                 incremental=False,
+                 content_index=None,
+                 dedup="mark",
+                 dependency_mode=False,
+                 references=None,
+                 deep_scan=False,
+                 hash_algorithm="md5",
+                 hash_workers=HASH_WORKERS,
+                 path_remaps=None,
+                 event_hooks=None,
+                 compress_results=False
                  ):
         """Initialize and examine the analysis information.
 
@@ -50,13 +113,61 @@ class AnalyzeKatana(object):
             log_folder (str, optional): Custom log save location.
             log_name (str, optional): Custom log file name.
             log_level (string):  Set log level, example: "DEBUG","INFO","WARNING","ERROR".
+            hash_cache (HashCache or bool, optional): Content-hash cache used
+                by ``get_file_md5``, by default a cache shared by every
+                analysis in the workspace root. Pass False to disable it.
+            license_pool (LicensePool, optional): Held while katanaBin runs
+                to cap the number of live Katana processes.
+            worker (KatanaWorker, optional): Warm Katana process that runs
+                the analysis instead of a new katanaBin per scene.
+            result_cache (ResultCache or bool, optional): Cache of finished
+                analyses that lets an unchanged scene skip Katana. Pass True
+                to use the cache in the workspace root.
+            analyse_mode (str): "katana" runs Katana, "offline" reads the
+                .katana file directly and only falls back to Katana for what
+                it cannot resolve.
+            metrics (bool): Record the timing, peak memory and counts of
+                every phase in metrics.json.
+            metrics_hooks (list, optional): Callables given the metrics dict
+                once it is saved; setting hooks turns metrics on.
+            incremental (bool): Only put the files that are new or changed
+                since the previous upload of the scene in upload.json, and
+                write the complete list to manifest.json. The list becomes
+                the history of the scene once ``record_uploaded`` is called.
+            content_index (ContentIndex or bool, optional): Index of the
+                content already transferred to the farm. Pass True to use
+                the index in the workspace root.
+            dedup (str): What to do with files the content index knows:
+                "mark" adds their ``source`` server path and ``uploaded_at``
+                time to upload.json, "drop" moves them from the ``asset``
+                list to a ``deduplicated`` list.
+            dependency_mode (bool): Only collect the assets of the nodes
+                upstream of the render nodes, and attribute every asset to
+                the ``render_nodes`` using it.
+            references (ReferenceResolver or bool, optional): Resolver that
+                adds the assets of the LiveGroups, look files and scenes the
+                scene references to asset.json. Pass True for a resolver of
+                this analysis only; share one to read every file once.
+            deep_scan (DeepScanner or bool): Scanner that adds the
+                sublayers, references, payloads and textures of the USD and
+                Alembic files to asset.json. Pass True to use the scan cache
+                in the workspace root.
+            hash_algorithm (str): ``hashlib`` algorithm of the hashes of
+                manifest.json and the content index, e.g. "blake2b". The
+                scene hash of upload.json stays md5.
+            hash_workers (int): Files hashed at once.
+            path_remaps (dict, optional): Server prefix by local prefix for
+                the site mounts the server knows under another path; other
+                paths are converted like ``utils.convert_path``.
+            event_hooks (list, optional): Callables given every event of the
+                analysis as a dict, as soon as it happens, see
+                ``rayvision_katana.events``.
+            compress_results (bool): Keep asset.json gzip-compressed, as
+                asset.json.gz, once the analysis is done.
         """
         self.logger = logger
         if not self.logger:
-            from rayvision_log.core import init_logger
-            init_logger(PACKAGE_NAME, log_folder, log_name)
-            self.logger = logging.getLogger(__name__)
-            self.logger.setLevel(level=log_level.upper())
+            self.logger = get_default_logger(log_folder, log_name, log_level)
 
         self.check_path(cg_file)
         self.cg_file = cg_file
@@ -69,11 +180,13 @@ class AnalyzeKatana(object):
 
         local_os = self.check_local_os(local_os)
         self.local_os = local_os
-        self.tmp_mark = str(int(time.time())) + str(self.get_current_id())
-        workspace = os.path.join(self.check_workspace(workspace),
-                                 self.tmp_mark)
-        if not os.path.exists(workspace):
-            os.makedirs(workspace)
+        # All digits, see ``rayvision_katana.workspace``: the time, the pid
+        # and a fixed-width number unique within the process.
+        self.tmp_mark = "{}{}{:06d}".format(int(time.time()), os.getpid(),
+                                            next(_WORKSPACE_IDS) % 1000000)
+        self.workspace_root = self.check_workspace(workspace)
+        # Created by the first write, see ``_ensure_workspace``.
+        workspace = os.path.join(self.workspace_root, self.tmp_mark)
         self.workspace = workspace
 
         if custom_exe_path:
@@ -82,26 +195,193 @@ class AnalyzeKatana(object):
 
         self.platform = platform
 
+        # None stands for the default cache, opened on first use.
+        self._hash_cache = hash_cache
+        self.license_pool = license_pool
+        self.worker = worker
+
+        if result_cache is True:
+            from rayvision_katana.result_cache import ResultCache
+            result_cache = ResultCache(os.path.join(self.workspace_root,
+                                                    RESULT_CACHE_NAME))
+        self.result_cache = result_cache or None
+        if analyse_mode not in ("katana", "offline"):
+            raise ValueError("unknown analyse_mode {}".format(analyse_mode))
+        self.analyse_mode = analyse_mode
+        self.metrics = Metrics(enabled=bool(metrics or metrics_hooks),
+                               hooks=metrics_hooks)
+        if content_index is True:
+            from rayvision_katana.content_index import ContentIndex
+            content_index = ContentIndex(os.path.join(self.workspace_root,
+                                                      CONTENT_INDEX_NAME))
+        elif content_index is False:
+            content_index = None
+        self.content_index = content_index
+        if dedup not in ("mark", "drop"):
+            raise ValueError("unknown dedup {}".format(dedup))
+        self.dedup = dedup
+        self.dependency_mode = dependency_mode
+        if references is True:
+            from rayvision_katana.references import ReferenceResolver
+            references = ReferenceResolver()
+        elif references is False:
+            references = None
+        self.references = references
+        if deep_scan is True:
+            from rayvision_katana.deep_scan import DeepScanCache
+            from rayvision_katana.deep_scan import DeepScanner
+            deep_scan = DeepScanner(DeepScanCache(os.path.join(
+                self.workspace_root, DEEP_SCAN_NAME)))
+        self.deep_scan = deep_scan or None
+        hashlib.new(hash_algorithm)
+        self.hash_algorithm = hash_algorithm
+        self.hash_workers = hash_workers
+        self.path_mapper = PathMapper(path_remaps)
+        self.event_hooks = list(event_hooks or [])
+        self.compress_results = compress_results
+        self.rendernode_patterns = NamePatterns()
+        self.category_patterns = NamePatterns()
+        self._events_streamed = False
+        self.history = None
+        # Manifest of the scene, committed to the history after the upload.
+        self._pending_manifest = None
+        if incremental:
+            from rayvision_katana.history import SceneHistory
+            self.history = SceneHistory(os.path.join(self.workspace_root,
+                                                     HISTORY_NAME))
+
         self.task_json = os.path.join(workspace, "task.json")
         self.tips_json = os.path.join(workspace, "tips.json")
         self.asset_json = os.path.join(workspace, "asset.json")
         self.upload_json = os.path.join(workspace, "upload.json")
-        self.tips_info = {}
-        self.task_info = {}
-        self.asset_info = {}
+        self.manifest_json = os.path.join(workspace, "manifest.json")
+        self.options_json = os.path.join(workspace, ANALYSE_OPTIONS_NAME)
+        self.metrics_json = os.path.join(workspace, METRICS_NAME)
+        # Result json by attribute name; a missing one is read on access.
+        self._results = {"tips_info": {}, "task_info": {}, "asset_info": {}}
+        self._asset_table = None
         self.upload_info = {}
+        self.asset_stats = None
+
+    def _result(self, name, json_path):
+        value = self._results.get(name)
+        if value is None:
+            value = self._results[name] = load_result(json_path)
+        return value
+
+    @property
+    def tips_info(self):
+        """dict: tips.json, read on first access after ``load_result``."""
+        return self._result("tips_info", self.tips_json)
+
+    @tips_info.setter
+    def tips_info(self, tips_info):
+        self._results["tips_info"] = tips_info
+
+    @property
+    def task_info(self):
+        """dict: task.json, read on first access after ``load_result``."""
+        return self._result("task_info", self.task_json)
+
+    @task_info.setter
+    def task_info(self, task_info):
+        self._results["task_info"] = task_info
+
+    @property
+    def asset_info(self):
+        """dict: asset.json, read on first access after ``load_result``.
+
+        Prefer ``iter_assets`` to only read the records: the dict of a large
+        scene is by far the largest object of an analysis.
+
+        """
+        if self._results.get("asset_info") is None \
+                and self._asset_table is not None:
+            self._results["asset_info"] = self._asset_table.to_dict()
+            self._asset_table = None
+        return self._result("asset_info", self.asset_json)
+
+    @asset_info.setter
+    def asset_info(self, asset_info):
+        self._results["asset_info"] = asset_info
+        self._asset_table = None
+
+    def iter_assets(self):
+        """Iterate over the records of asset.json without loading the dict.
+
+        Records come from ``asset_info`` once it is loaded, from the compact
+        table of ``compact_result``, or else straight from the file.
+
+        Returns:
+            iterator: ``(category, record)`` pairs.
+
+        """
+        asset_info = self._results.get("asset_info")
+        if asset_info is not None:
+            return iter_asset_records(asset_info)
+        if self._asset_table is not None:
+            return iter(self._asset_table)
+        return iter_asset_json(self.asset_json)
+
+    def compact_result(self):
+        """Hold the records of asset.json as a compact ``AssetTable``.
+
+        The ``asset_info`` dict is dropped, and built again from the table
+        if it is accessed later.
+
+        Returns:
+            AssetTable
+
+        """
+        if self._asset_table is None:
+            asset_info = self._results.pop("asset_info", None)
+            if asset_info is not None:
+                self._asset_table = AssetTable.from_dict(asset_info)
+            else:
+                self._asset_table = AssetTable.from_json(self.asset_json)
+        return self._asset_table
+
+    @property
+    def hash_cache(self):
+        """HashCache: The content-hash cache, or None if it is disabled."""
+        if self._hash_cache is None:
+            from rayvision_katana.hash_cache import HashCache
+            self._hash_cache = HashCache(os.path.join(self.workspace_root,
+                                                      HASH_CACHE_NAME))
+        if self._hash_cache is False:
+            return None
+        return self._hash_cache
+
+    @hash_cache.setter
+    def hash_cache(self, hash_cache):
+        self._hash_cache = False if hash_cache is None else hash_cache
+
+    def _ensure_workspace(self):
+        """Create the workspace folder before the first write to it."""
+        if not os.path.isdir(self.workspace):
+            try:
+                os.makedirs(self.workspace)
+            except OSError:
+                if not os.path.isdir(self.workspace):
+                    raise
+
+    def _save_json(self, json_path, data, **kwargs):
+        """Save json data in the workspace."""
+        from rayvision_utils import utils
+        self._ensure_workspace()
+        utils.json_save(json_path, data, **kwargs)
 
     @staticmethod
-    def get_current_id():
-        if isinstance(threading.current_thread(), threading._MainThread):
-            return os.getpid()
-        else:
-            return threading.get_ident()
+    def _load_json(json_path):
+        from rayvision_utils import utils
+        return utils.json_load(json_path)
 
     @staticmethod
     def check_path(tmp_path):
         """Check if the path exists."""
         if not os.path.exists(tmp_path):
+            from rayvision_utils.exception.exception import \
+                CGFileNotExistsError
             raise CGFileNotExistsError("{} is not found".format(tmp_path))
 
     @staticmethod
@@ -142,76 +422,33 @@ class AnalyzeKatana(object):
 
         return workspace
 
-    def location_from_reg(self, version):
-        """Get the path in the registry of the local CG.
-
-        When the system environment is Windows or linux, get the path where the
-        local Katana startup file is located in the registry.
-
-        Args:
-            version (str): Katana version.
-                e.g.:
-                    "3.2v1".
-
-        Returns:
-            str: The path where katana's startup files are located.
-                e.g.:
-                    "C:/Program Files/Katana3.2v1/".
-
-        """
-        temp = 2
-        try:
-            import _winreg
-        except ImportError:
-            import winreg as _winreg
-            temp = 3
-
-        location = None
-        string = r'SOFTWARE\Microsoft\Windows\CurrentVersion\Uninstall\Katana {}_is1'.format(version)
-        self.logger.debug(string)
-        try:
-            if temp == 2:
-                handle = _winreg.OpenKey(_winreg.HKEY_LOCAL_MACHINE,
-                                         string)
-            else:
-                handle = _winreg.OpenKey(_winreg.HKEY_LOCAL_MACHINE,
-                                         string, 0,
-                                         (_winreg.KEY_WOW64_64KEY
-                                          + _winreg.KEY_READ))
-            location, _type = _winreg.QueryValueEx(
-                handle, "InstallLocation")
-            self.logger.debug('localtion: %s, type: %s', location, _type)
-        except WindowsError:
-            self.logger.debug(traceback.format_exc())
-
-        return location
-
     def find_location(self):
-        """Get the path where the local Houdini startup file is located.
+        """Get the path where the local Katana startup file is located.
+
+        The executable is looked up in the install index shared by the
+        analyses of the process, see ``rayvision_katana.discovery``.
 
         Raises:
             CGExeNotExistError: The path to the startup file does not exist.
 
         """
-        exe_path = None
-        if self.local_os == "linux":
-            exe_path = "/opt/Foundry/Katana{}/katana".format(self.software_version)
-            if not os.path.isfile(exe_path):
-                self.logger.info("The linux software address is not found, please specify the software path directly")
-                exe_path = None
-        else:
-            location = self.location_from_reg(self.software_version)
-            tmp_exe_path = os.path.join(location, "bin", "katanaBin.exe")
-            if os.path.exists(tmp_exe_path):
-                exe_path = tmp_exe_path
-
-        if exe_path is None:
-            error_msg = "Software of scene has not been found"
+        from rayvision_katana.discovery import get_index
+        index = get_index(os.path.join(self.workspace_root,
+                                       INSTALL_INDEX_NAME), self.local_os)
+        install = index.lookup(self.software_version)
+        if install is None:
+            from rayvision_utils.exception import tips_code
+            from rayvision_utils.exception.error_msg import \
+                ERROR9899_CGEXE_NOTEXIST
+            from rayvision_utils.exception.exception import CGExeNotExistError
+            error_msg = index.missing_message(self.software_version)
+            self.logger.info(error_msg)
             self.add_tip(tips_code.CG_NOTEXISTS, error_msg)
             self.save_tips()
             raise CGExeNotExistError(ERROR9899_CGEXE_NOTEXIST.format(
                 self.render_software))
 
+        exe_path = install.exe_path
         self.logger.info("exe_path: %s", exe_path)
         return exe_path
 
@@ -225,23 +462,109 @@ class AnalyzeKatana(object):
         if self.custom_exe_path is not None:
             exe_path = self.custom_exe_path
         else:
-            exe_path = self.find_location()
+            with self.metrics.phase("find_location"):
+                exe_path = self.find_location()
 
         return exe_path
 
     def write_task_json(self):
         """The initialization task.json."""
-        constants.TASK_INFO["task_info"]["input_cg_file"] = self.cg_file.replace("\\", "/")
-        constants.TASK_INFO["task_info"]["project_name"] = self.project_name
-        constants.TASK_INFO["task_info"]["cg_id"] = constants.CG_SETTING.get(self.render_software.capitalize())
-        constants.TASK_INFO["task_info"]["os_name"] = "1" if self.local_os == "windows" else "0"
-        constants.TASK_INFO["task_info"]["platform"] = self.platform
-        constants.TASK_INFO["software_config"] = {
+        from rayvision_utils import constants
+        # Work on a copy: concurrent analyses must not share the template.
+        task_info = copy.deepcopy(constants.TASK_INFO)
+        task_info["task_info"]["input_cg_file"] = self.cg_file.replace("\\", "/")
+        task_info["task_info"]["project_name"] = self.project_name
+        task_info["task_info"]["cg_id"] = constants.CG_SETTING.get(self.render_software.capitalize())
+        task_info["task_info"]["os_name"] = "1" if self.local_os == "windows" else "0"
+        task_info["task_info"]["platform"] = self.platform
+        task_info["software_config"] = {
             "plugins": self.plugin_config,
             "cg_version": self.software_version,
             "cg_name": self.render_software
         }
-        utils.json_save(self.task_json, constants.TASK_INFO)
+        self._save_json(self.task_json, task_info)
+
+    def analyse_options(self):
+        """Get the options passed to the Katana script."""
+        return {"metrics": self.metrics.enabled,
+                "dependency_mode": self.dependency_mode,
+                "events": bool(self.event_hooks) and self.worker is None,
+                "rendernodes": self.rendernode_patterns.to_dict(),
+                "categories": self.category_patterns.to_dict()}
+
+    def write_analyse_options(self):
+        """Write analyse_options.json for the Katana script."""
+        self._save_json(self.options_json, self.analyse_options())
+
+    def save_metrics(self):
+        """Write metrics.json, merging what the Katana script recorded.
+
+        The Katana startup time is the delay between launching Katana and
+        the script starting. The ``katana`` phase gets the highest peak
+        memory of the phases the Katana process measured of itself, as the
+        client cannot tell its child apart from those of concurrent
+        analyses.
+
+        """
+        if not self.metrics.enabled:
+            return
+        self._ensure_workspace()
+        katana_json = os.path.join(self.workspace, KATANA_METRICS_NAME)
+        if os.path.exists(katana_json):
+            katana_metrics = self._load_json(katana_json)
+            peaks = [phase.get("peak_rss_kb") or 0
+                     for phase in katana_metrics.get("phases", [])]
+            for phase in self.metrics.phases:
+                if phase["name"] == "katana":
+                    launched = self.metrics.started_at + phase["start"]
+                    katana_metrics["startup_seconds"] = round(
+                        katana_metrics["started_at"] - launched, 6)
+                    phase["katana_peak_rss_kb"] = max(peaks) if any(peaks) \
+                        else None
+            self.metrics.extra["katana"] = katana_metrics
+        rendernodes = self.task_info.get("scene_info", {}).get(
+            "rendernodes", {})
+        self.metrics.counts["rendernodes"] = len(rendernodes)
+        self.metrics.counts["outputs"] = sum(
+            len(info.get("aov") or {}) for info in rendernodes.values())
+        self.metrics.counts["assets"] = sum(1 for _ in self.iter_assets())
+        self.metrics.save(self.metrics_json)
+
+    def emit_event(self, kind, data):
+        """Pass an event to the event hooks.
+
+        Args:
+            kind (str): "rendernode", "asset" or "warning".
+            data (dict): The fields of the event.
+
+        """
+        if not self.event_hooks:
+            return
+        event = dict(data)
+        event["event"] = kind
+        for hook in self.event_hooks:
+            hook(event)
+
+    def replay_events(self):
+        """Emit the events of a result that was not analysed by streaming.
+
+        Results of the worker or of the result cache are loaded whole; their
+        render nodes and assets are emitted in one go, as they would have
+        been streamed.
+
+        """
+        if not self.event_hooks:
+            return
+        rendernodes = self.task_info.get("scene_info", {}).get(
+            "rendernodes", {})
+        for name in sorted(rendernodes):
+            self.emit_event("rendernode", {"name": name,
+                                           "info": rendernodes[name]})
+        for category, record in self.iter_assets():
+            self._emit_asset(category, record)
+
+    def _emit_asset(self, category, record):
+        self.emit_event("asset", {"category": category, "record": record})
 
     def add_tip(self, code, info):
         """Add error message.
@@ -258,82 +581,705 @@ class AnalyzeKatana(object):
 
     def save_tips(self):
         """Write the error message to tips.json."""
-        utils.json_save(self.tips_json, self.tips_info, ensure_ascii=False)
+        self._save_json(self.tips_json, self.tips_info, ensure_ascii=False)
 
     def get_file_md5(self, file_path):
-        """Generate the md5 values for the scenario."""
-        hash_md5 = hashlib.md5()
-        if os.path.exists(file_path):
-            with open(file_path, 'rb') as file_path_f:
-                while True:
-                    data_flow = file_path_f.read(8096)
-                    if not data_flow:
-                        break
-                    hash_md5.update(data_flow)
-        return hash_md5.hexdigest()
+        """Generate the md5 values for the scenario.
+
+        Unchanged files are answered from the hash cache with a single stat
+        call; missing files get the md5 of empty content.
+
+        """
+        from rayvision_katana.hash_cache import compute_md5
+        if self.hash_cache is not None:
+            digest = self.hash_cache.get_digest(file_path, compute_md5)
+        elif os.path.exists(file_path):
+            digest = compute_md5(file_path)
+        else:
+            digest = None
+        return digest or hashlib.md5().hexdigest()
+
+    def get_file_digests(self, paths, sampled=False):
+        """Hash many files concurrently with ``hash_algorithm``.
+
+        Unchanged files are answered from the hash cache; missing files get
+        the digest of empty content, like ``get_file_md5``.
+
+        Args:
+            paths (iterable): Files to hash.
+            sampled (bool): Only digest the head, middle and tail of the
+                files, see ``rayvision_katana.hashing.sample_file``.
+
+        Returns:
+            dict: Hex digest by path.
+
+        """
+        from rayvision_katana.hashing import hash_files
+        digests = hash_files(paths, self.hash_algorithm, self.hash_workers,
+                             sampled=sampled, cache=self.hash_cache)
+        empty = hashlib.new(self.hash_algorithm).hexdigest()
+        return dict((path, digest or empty)
+                    for path, digest in digests.items())
+
+    def upload_assets(self):
+        """Get the upload.json entries of the asset files that exist."""
+        if self.asset_stats is None:
+            self.verify_assets()
+        files = []
+        seen = set()
+        for asset_stat in self.asset_stats.values():
+            for file_info in asset_stat.files:
+                if file_info[0] in seen:
+                    continue
+                seen.add(file_info[0])
+                files.append(file_info)
+        paths = self.path_mapper.map_many(file_info[0] for file_info in files)
+        return [{"local": local, "server": server, "size": size,
+                 "mtime": mtime}
+                for (local, server), (_, size, mtime) in zip(paths, files)]
 
     def write_upload_json(self):
         """handle analyse result.
 
         Save the analyzed scene file information and texture information to
-        the upload.json file.
+        the upload.json file. In incremental mode upload.json only lists the
+        new or changed files and manifest.json lists them all.
 
         """
         upload_asset = []
+        local, server = self.path_mapper.map_many([self.cg_file])[0]
         self.upload_info["scene"] = [
             {
-                "local": self.cg_file.replace("\\", "/"),
-                "server": utils.convert_path(self.cg_file),
+                "local": local,
+                "server": server,
                 "hash": self.get_file_md5(self.cg_file)
             }
         ]
 
         upload_asset.append({
-            "local": self.cg_file.replace("\\", "/"),
-            "server": utils.convert_path(self.cg_file)
+            "local": local,
+            "server": server
         })
+        upload_asset.extend(self.upload_assets())
+        if self.history is not None:
+            upload_asset = self.write_manifest(upload_asset)
+        if self.content_index is not None:
+            upload_asset = self.deduplicate(upload_asset)
 
         self.upload_info["asset"] = upload_asset
 
-        utils.json_save(self.upload_json, self.upload_info)
+        self._save_json(self.upload_json, self.upload_info)
 
-    def analyse(self, exe_path="", no_upload=False):
-        """Build a cmd command to perform an analysis scenario.
+    def write_manifest(self, upload_asset):
+        """Diff the files with the previous analysis of the scene.
+
+        Only files whose size or mtime changed are hashed again. The
+        complete list goes to manifest.json and becomes the history of the
+        scene when ``record_uploaded`` is called.
 
         Args:
-            no_upload (bool): Do you not generate an upload,json file.
+            upload_asset (list): upload.json entries of every file.
 
-        Raises:
-            AnalyseFailError: Analysis scenario failed.
+        Returns:
+            list: The entries of the files that are new or changed.
 
         """
-        if not os.path.exists(exe_path):
-            exe_path = self.analyse_cg_file()
-        self.write_task_json()
+        from rayvision_katana.history import diff_files
+        from rayvision_katana.history import make_manifest
+        scene_stat = os.stat(self.cg_file)
+        upload_asset[0].update(size=scene_stat.st_size,
+                               mtime=scene_stat.st_mtime)
+        previous = self.history.load(self.cg_file) or {}
+        # Hashes of another algorithm cannot be compared, hash everything.
+        previous_files = previous.get("files", {}) \
+            if previous.get("algorithm") == self.hash_algorithm else {}
+        files, changed, removed = diff_files(
+            upload_asset, previous_files, self.get_file_digests)
+        self._save_json(self.manifest_json, {
+            "scene": self.upload_info["scene"],
+            "asset": [dict(entry, hash=files[entry["local"]]["hash"])
+                      for entry in upload_asset],
+            "removed": removed,
+        })
+        self._pending_manifest = make_manifest(self.cg_file, files, previous,
+                                               self.hash_algorithm)
+        self.logger.info("%s of %s files are new or changed since the "
+                         "previous analysis", len(changed), len(files))
+        return changed
+
+    def deduplicate(self, upload_asset):
+        """Mark or drop the files whose content was already transferred.
+
+        The content index is queried once for every file of the task.
+
+        Args:
+            upload_asset (list): upload.json entries.
+
+        Returns:
+            list: The entries left in upload.json.
+
+        """
+        digests = self.get_file_digests(entry["local"] for entry in upload_asset
+                                        if "hash" not in entry)
+        for entry in upload_asset:
+            if "hash" not in entry:
+                entry["hash"] = digests[entry["local"]]
+        known = self.content_index.lookup_many(
+            (entry["hash"] for entry in upload_asset), self.hash_algorithm)
+        kept = []
+        deduplicated = []
+        transferred = 0
+        for entry in upload_asset:
+            match = known.get(entry["hash"])
+            if match is None:
+                kept.append(entry)
+                continue
+            transferred += 1
+            entry.update(source=match[0], uploaded_at=match[1])
+            if self.dedup == "mark":
+                kept.append(entry)
+            else:
+                deduplicated.append(entry)
+        if deduplicated:
+            self.upload_info["deduplicated"] = deduplicated
+        self.logger.info("%s of %s files were already transferred",
+                         transferred, len(upload_asset))
+        return kept
+
+    def record_uploaded(self, uploaded=None):
+        """Record the files of upload.json as transferred.
+
+        Call it once the upload of the task succeeded: the files go to the
+        content index and, in incremental mode, the manifest of the scene
+        becomes its history.
+
+        Args:
+            uploaded (float, optional): Upload time, now by default.
+
+        """
+        uploaded = time.time() if uploaded is None else uploaded
+        if self.history is not None and self._pending_manifest is not None:
+            self.history.save(self.cg_file, dict(self._pending_manifest,
+                                                 uploaded_at=uploaded))
+            self._pending_manifest = None
+        if self.content_index is None:
+            return
+        self.content_index.record_many(
+            ((entry["hash"], entry.get("size"), entry["server"])
+             for entry in self.upload_info.get("asset", [])
+             if "source" not in entry), uploaded, self.hash_algorithm)
+
+    def forget_history(self):
+        """Make the next incremental analysis upload every file again.
+
+        The history of a scene only changes when ``record_uploaded`` is
+        called; call this to drop a history that no longer matches the farm.
+
+        """
+        self._pending_manifest = None
+        if self.history is not None:
+            self.history.forget(self.cg_file)
+
+    def resolve_references(self):
+        """Add the assets of the files the scene references to asset.json.
+
+        Returns:
+            ResolvedReferences
+
+        """
+        resolved = self.references.resolve(
+            record["path"] for _, record in iter_asset_records(
+                self.asset_info))
+        for cycle in resolved.cycles:
+            self.logger.warning("reference cycle: %s", " -> ".join(cycle))
+        for unresolved in resolved.unresolved:
+            self.logger.info("unresolved reference parameter %s", unresolved)
+        added = resolved.merge_into(self.asset_info, self._emit_asset)
+        if added:
+            self._save_json(self.asset_json, self.asset_info)
+        self.metrics.count("reference_files", len(resolved.files))
+        self.metrics.count("reference_assets", added)
+        return resolved
+
+    def scan_dependencies(self):
+        """Add the dependencies of the USD and Alembic files to asset.json.
+
+        Returns:
+            int: Number of records added.
+
+        """
+        unscanned = []
+        added = merge_records(self.asset_info, self.deep_scan.scan(
+            list(iter_asset_paths(self.asset_info)), unscanned),
+                              self._emit_asset)
+        for file_path, error in unscanned:
+            self.logger.warning("could not scan the dependencies of %s: %s",
+                                file_path, error)
+        if added:
+            self._save_json(self.asset_json, self.asset_info)
+        self.metrics.count("deep_scan_assets", added)
+        return added
+
+    def verify_assets(self):
+        """Check that the assets found by the analysis exist.
+
+        Missing files are added to tips.json; the size and mtime of the
+        others are kept for upload.json.
+
+        Returns:
+            dict: ``AssetStat`` by asset path.
+
+        """
+        from rayvision_katana.asset_check import verify_assets
+        from rayvision_utils.exception import tips_code
+        self.asset_stats = verify_assets(
+            record["path"] for _, record in self.iter_assets())
+        missing = sorted(path for path, asset_stat in self.asset_stats.items()
+                         if not asset_stat.exists)
+        if missing:
+            self.logger.warning("%s assets are missing", len(missing))
+            self.emit_event("warning", {
+                "message": "{} assets are missing".format(len(missing))})
+            # Katana may have reported missing files of its own already.
+            known = self.tips_info.get(tips_code.MISSING_FILE, [])
+            self.add_tip(tips_code.MISSING_FILE, known + [
+                path for path in missing if path not in known])
+            self.save_tips()
+        return self.asset_stats
+
+    @staticmethod
+    def analyse_script_path():
+        """Get the path of the script katanaBin runs."""
         analyse_script_name = "Analyse.py"
-        analyze_script_path = os.path.normpath(os.path.join(os.path.dirname(__file__),
-                                           analyse_script_name))
-        task_path = os.path.dirname(self.task_json).replace("\\", "/")
+        return os.path.normpath(os.path.join(os.path.dirname(__file__),
+                                             analyse_script_name))
+
+    def build_argv(self, exe_path, task_path):
+        """Build the argument list that analyses the scene without a shell.
+
+        Args:
+            exe_path (str): katanaBin, or a ``.sh``/``.bat`` wrapper.
+            task_path (str): Folder holding task.json.
+
+        Returns:
+            list: Program and arguments.
+
+        """
+        script_full_path = self.analyse_script_path()
+        if exe_path and (str(exe_path).endswith(('.sh', '.bat'))):
+            return [exe_path, script_full_path, task_path, self.cg_file]
+        return [exe_path, "--script", script_full_path, "-task", task_path,
+                "-file", self.cg_file]
+
+    def build_cmd(self, exe_path, task_path):
+        """Build the cmd command that analyses the scene in a new Katana.
+
+        Args:
+            exe_path (str): katanaBin, or a ``.sh``/``.bat`` wrapper.
+            task_path (str): Folder holding task.json.
+
+        Returns:
+            str: Cmd command.
+
+        """
+        analyze_script_path = self.analyse_script_path()
 
         cmd = '"{exe_path}" --script "{script_full_path}" -task "{task_path}" -file "{cg_file}"'
         if exe_path and (str(exe_path).endswith(('.sh', '.bat'))):
             cmd = '"{exe_path}" "{script_full_path}" "{task_path}" "{cg_file}"'
-        cmd = cmd.format(
+        return cmd.format(
             exe_path=exe_path,
             script_full_path=analyze_script_path,
             cg_file=self.cg_file,
             task_path=task_path
         )
-        self.logger.debug(cmd)
-        code, _, _ = Cmd.run(cmd, shell=True)
-        if code != 0:
-            self.add_tip(tips_code.UNKNOW_ERR, "")
-            self.save_tips()
-            raise AnalyseFailError
-        
-        self.tips_info = utils.json_load(self.tips_json)
-        self.asset_info = utils.json_load(self.asset_json)
-        self.task_info = utils.json_load(self.task_json)
-        # if not no_upload:
-        #     self.write_upload_json()
+
+    def run_katana(self, cmd):
+        """Run a Katana command, holding a license slot if a pool is set.
+
+        Args:
+            cmd (str): Cmd command.
+
+        Returns:
+            tuple: Status code of the cmd command, output information, error
+                message.
+
+        """
+        from rayvision_utils.cmd import Cmd
+        run = self.stream_katana if self.event_hooks else \
+            functools.partial(Cmd.run, shell=True)
+        if self.license_pool is None:
+            return run(cmd)
+        with self.license_pool:
+            return run(cmd)
+
+    def katana_output(self, line):
+        """Handle a line of the Katana output: emit events, log the rest."""
+        from rayvision_katana.events import parse_event
+        event = parse_event(line)
+        if event is None:
+            if isinstance(line, bytes):
+                line = line.decode(sys.getfilesystemencoding(), "replace")
+            line = line.rstrip()
+            if line:
+                self.logger.info(line)
+            return
+        self._events_streamed = True
+        kind = event.pop("event")
+        self.emit_event(kind, event)
+
+    def stream_katana(self, cmd):
+        """Run a Katana command, emitting its events as they are printed.
+
+        Args:
+            cmd (str): Cmd command.
+
+        Returns:
+            tuple: Status code of the cmd command, and None for the output
+                and the error message, which went to the log.
+
+        """
+        import subprocess
+        from rayvision_utils.cmd import Cmd
+        self.logger.info("run command:\n%s", cmd)
+        process = subprocess.Popen(Cmd.compatible(cmd), stdout=subprocess.PIPE,
+                                   stderr=subprocess.STDOUT, shell=True)
+        for line in iter(process.stdout.readline, b""):
+            self.katana_output(line)
+        process.stdout.close()
+        return process.wait(), None, None
+
+    def analyse_in_worker(self, task_path):
+        """Run the analysis in the warm Katana worker.
+
+        Args:
+            task_path (str): Folder holding task.json.
+
+        Returns:
+            int: 0 on success, 1 if the analysis or the worker failed.
+
+        """
+        from rayvision_utils.exception.exception import AnalyseFailError
+        try:
+            self.worker.analyse(self.cg_file, task_path)
+        except AnalyseFailError as err:
+            self.logger.error("worker analysis failed: %s", err)
+            return 1
+        return 0
+
+    def result_cache_key(self):
+        """Get the result cache key of the scene in its current state."""
+        extra = {"analyse_mode": self.analyse_mode}
+        if self.dependency_mode:
+            extra["dependency_mode"] = True
+        if self.rendernode_patterns:
+            extra["rendernodes"] = self.rendernode_patterns.to_dict()
+        if self.category_patterns:
+            extra["categories"] = self.category_patterns.to_dict()
+        return self.result_cache.make_key(self.get_file_md5(self.cg_file),
+                                          self.software_version,
+                                          self.plugin_config, **extra)
+
+    def restore_cached_result(self, key):
+        """Restore a cached analysis into the workspace.
+
+        task.json keeps the task and software information just written for
+        this submission and takes everything else from the cached analysis.
+
+        Returns:
+            bool: True if the result was found and restored.
+
+        """
+        folder = self.result_cache.get(key)
+        if folder is None:
+            return False
+        cached_task = self._load_json(os.path.join(folder, "task.json"))
+        task_info = self._load_json(self.task_json)
+        cached_task["task_info"] = task_info["task_info"]
+        cached_task["software_config"] = task_info["software_config"]
+        self._save_json(self.task_json, cached_task)
+        shutil.copyfile(os.path.join(folder, "asset.json"), self.asset_json)
+        shutil.copyfile(os.path.join(folder, "tips.json"), self.tips_json)
+        self.logger.info("restored the analysis of %s from %s",
+                         self.cg_file, folder)
+        return True
+
+    def invalidate_result_cache(self):
+        """Drop the cached analysis of the scene."""
+        if self.result_cache is not None:
+            self.result_cache.invalidate(self.result_cache_key())
+
+    def analyse_offline(self):
+        """Analyse the scene without Katana.
+
+        Returns:
+            bool: True if the whole scene was resolved, False if Katana is
+                needed.
+
+        """
+        from rayvision_katana.offline_parser import analyse_scene
+        task_path = os.path.dirname(self.task_json)
+        # The events of a scene that falls back to Katana are dropped.
+        events = []
+        try:
+            with self.metrics.phase("offline"):
+                result = analyse_scene(
+                    self.cg_file, task_path,
+                    dependency_mode=self.dependency_mode,
+                    rendernodes=self.rendernode_patterns,
+                    categories=self.category_patterns,
+                    hooks=[lambda kind, data: events.append((kind, data))]
+                    if self.event_hooks else None)
+        except Exception as err:  # pylint: disable=broad-except
+            self.logger.info("offline analysis of %s failed: %s",
+                             self.cg_file, err)
+            return False
+        if not result.resolved:
+            self.logger.info("offline analysis falls back to Katana: %s",
+                             "; ".join(result.unresolved))
+            return False
+        for kind, data in events:
+            self.emit_event(kind, data)
+        self._events_streamed = bool(self.event_hooks)
+        self.save_tips()
+        self.logger.info("offline analysis found %s render nodes and %s "
+                         "assets", result.rendernodes, result.assets)
+        return True
+
+    def load_result(self):
+        """Use the tips.json, asset.json and task.json of the analysis.
+
+        The files are only parsed on the first access of ``tips_info``,
+        ``asset_info`` and ``task_info``.
+
+        Raises:
+            IOError: A result file does not exist.
+
+        """
+        for json_path in (self.tips_json, self.asset_json, self.task_json):
+            os.stat(result_path(json_path))
+        self._results.clear()
+        self._asset_table = None
+        return self
+
+    def plan_chunks(self, chunk_size):
+        """Split the frames of every render node into farm job chunks.
+
+        Args:
+            chunk_size (int): Frames per job.
+
+        Returns:
+            list: ``rendernode``, ``chunk`` and ``frames`` of every job.
+
+        """
+        from rayvision_katana.frames import plan_chunks
+        rendernodes = self.task_info.get("scene_info", {}).get(
+            "rendernodes", {})
+        return list(plan_chunks(rendernodes, chunk_size))
+
+    def post_analyse(self, no_upload=False, check_assets=True):
+        """Check the assets and write upload.json after an analysis."""
+        if self.references is not None:
+            with self.metrics.phase("references"):
+                self.resolve_references()
+        if self.deep_scan is not None:
+            with self.metrics.phase("deep_scan"):
+                self.scan_dependencies()
+        if check_assets:
+            with self.metrics.phase("verify_assets"):
+                self.verify_assets()
+        if not no_upload:
+            with self.metrics.phase("write_upload_json"):
+                self.write_upload_json()
+        self.save_metrics()
+        if self.compress_results and os.path.exists(self.asset_json):
+            compress_result(self.asset_json)
         return self
+
+    def begin_analyse(self):
+        """Write task.json and look the scene up in the result cache.
+
+        Returns:
+            tuple: The result cache key (None without a cache), and True if
+                the cached result was restored.
+
+        """
+        cache_key = None
+        self._events_streamed = False
+        if self.result_cache is not None:
+            with self.metrics.phase("result_cache_key"):
+                cache_key = self.result_cache_key()
+        self.write_task_json()
+        self.write_analyse_options()
+        if cache_key is not None and self.restore_cached_result(cache_key):
+            self.load_result()
+            self.replay_events()
+            self.metrics.count("result_cache_hits")
+            return cache_key, True
+        return cache_key, False
+
+    def fail_analyse(self, info=""):
+        """Record an analysis failure in tips.json and raise.
+
+        Raises:
+            AnalyseFailError: Always.
+
+        """
+        from rayvision_utils.exception import tips_code
+        from rayvision_utils.exception.exception import AnalyseFailError
+        self.add_tip(tips_code.UNKNOW_ERR, info)
+        self.save_tips()
+        self.save_metrics()
+        if info:
+            raise AnalyseFailError(info)
+        raise AnalyseFailError
+
+    def finish_analyse(self, code, cache_key=None, no_upload=False,
+                       check_assets=True):
+        """Load the result of a finished analysis and post-process it.
+
+        Args:
+            code (int): Exit code of the analysis.
+            cache_key (str, optional): Result cache key to store it under.
+            no_upload (bool): Do you not generate an upload,json file.
+            check_assets (bool): Check that the assets exist.
+
+        Raises:
+            AnalyseFailError: The analysis failed.
+
+        """
+        if code != 0:
+            self.fail_analyse()
+        with self.metrics.phase("load_result"):
+            self.load_result()
+        if not self._events_streamed:
+            self.replay_events()
+        if cache_key is not None:
+            self.result_cache.store(cache_key, self.workspace)
+        return self.post_analyse(no_upload, check_assets)
+
+    def select(self, rendernodes=None, exclude_rendernodes=None,
+               categories=None, exclude_categories=None):
+        """Limit the analyses to some render nodes and asset categories.
+
+        The selection holds until ``select`` is called again, by itself or
+        through the pattern arguments of ``analyse``. Patterns are
+        ``fnmatch`` globs of render node names and of the ``#category``
+        sections of filter.txt, e.g. ``["Render_beauty*"]``. Render nodes
+        that are not selected are neither unlocked nor evaluated by Katana.
+
+        Args:
+            rendernodes (str or list, optional): Render nodes analysed, all
+                by default.
+            exclude_rendernodes (str or list, optional): Render nodes left
+                out.
+            categories (str or list, optional): Asset categories collected,
+                all by default.
+            exclude_categories (str or list, optional): Asset categories
+                left out.
+
+        """
+        self.rendernode_patterns = NamePatterns(rendernodes,
+                                                exclude_rendernodes)
+        self.category_patterns = NamePatterns(categories, exclude_categories)
+
+    def analyse(self, exe_path="", no_upload=False, check_assets=True,
+                rendernodes=None, exclude_rendernodes=None, categories=None,
+                exclude_categories=None):
+        """Build a cmd command to perform an analysis scenario.
+
+        Args:
+            no_upload (bool): Do you not generate an upload,json file.
+            check_assets (bool): Check that the assets exist afterwards.
+            rendernodes, exclude_rendernodes, categories, exclude_categories:
+                Render node and asset category patterns, see ``select``;
+                giving any of them replaces the current selection.
+
+        Raises:
+            AnalyseFailError: Analysis scenario failed.
+
+        """
+        if any(patterns is not None for patterns in (
+                rendernodes, exclude_rendernodes, categories,
+                exclude_categories)):
+            self.select(rendernodes, exclude_rendernodes, categories,
+                        exclude_categories)
+        cache_key, restored = self.begin_analyse()
+        if restored:
+            return self.post_analyse(no_upload, check_assets)
+
+        task_path = os.path.dirname(self.task_json).replace("\\", "/")
+        if self.analyse_mode == "offline" and self.analyse_offline():
+            code = 0
+        elif self.worker is not None:
+            with self.metrics.phase("katana_worker"):
+                code = self.analyse_in_worker(task_path)
+        else:
+            if not os.path.exists(exe_path):
+                exe_path = self.analyse_cg_file()
+            cmd = self.build_cmd(exe_path, task_path)
+            self.logger.debug(cmd)
+            with self.metrics.phase("katana"):
+                code, _, _ = self.run_katana(cmd)
+        return self.finish_analyse(code, cache_key, no_upload, check_assets)
+
+    def iter_events(self, exe_path="", no_upload=False, check_assets=True,
+                    **selection):
+        """Analyse the scene in a thread, yielding its events as they happen.
+
+        Takes the arguments of ``analyse``. The events are those the event
+        hooks get, e.g. ``{"event": "asset", "category": "texture",
+        "record": {...}}``; the generator ends once the analysis, upload.json
+        included, is done.
+
+        Raises:
+            AnalyseFailError: Analysis scenario failed, after the events that
+                came before the failure.
+
+        """
+        try:
+            import queue
+        except ImportError:
+            import Queue as queue
+        events = queue.Queue()
+        done = object()
+        errors = []
+
+        def run():
+            try:
+                self.analyse(exe_path, no_upload, check_assets, **selection)
+            except BaseException as err:  # pylint: disable=broad-except
+                errors.append(err)
+            finally:
+                self.event_hooks.remove(events.put)
+                events.put(done)
+
+        self.event_hooks.append(events.put)
+        thread = threading.Thread(target=run, name="analyse-events")
+        thread.daemon = True
+        thread.start()
+        while True:
+            event = events.get()
+            if event is done:
+                break
+            yield event
+        thread.join()
+        if errors:
+            raise errors[0]
+
+    def analyse_async(self, exe_path="", no_upload=False, check_assets=True,
+                      timeout=None, max_memory_mb=None, semaphore=None,
+                      **selection):
+        """Get a coroutine that analyses the scene without blocking the loop.
+
+        Katana is started without a shell; see
+        ``rayvision_katana.async_analyse.analyse_async`` for the arguments,
+        and ``select`` for the render node and category patterns.
+
+        """
+        from rayvision_katana.async_analyse import analyse_async
+        if any(patterns is not None for patterns in selection.values()):
+            self.select(**selection)
+        return analyse_async(self, exe_path=exe_path, no_upload=no_upload,
+                             check_assets=check_assets, timeout=timeout,
+                             max_memory_mb=max_memory_mb, semaphore=semaphore)
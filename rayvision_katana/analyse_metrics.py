@@ -0,0 +1,191 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+"""Per-phase timing, memory and count instrumentation of an analysis.
+
+``Metrics.phase`` times a block and records its start offset, the resident
+memory at its end and its peak memory; ``Metrics.count`` adds to a named
+counter. A disabled ``Metrics`` hands out one shared no-op context and
+returns at once, so instrumented code costs next to nothing when metrics are
+off.
+
+The peak of a phase is the high water mark of the process, reset at the
+start of the phase through ``/proc/self/clear_refs``. It is only measured on
+Linux, and it is the peak of the whole process, so the analyses running in
+threads of one process share it.
+
+This module runs inside Katana as well, so it only uses the standard library
+and stays compatible with Katana's Python 2.
+
+"""
+import json
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def _status_kb(field):
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith(field):
+                    return int(line.split()[1])
+    except (IOError, OSError):
+        pass
+    return None
+
+
+def current_rss_kb():
+    """Get the resident memory of this process in KB, or None."""
+    return _status_kb("VmRSS:")
+
+
+def high_water_kb():
+    """Get the peak resident memory since the last reset in KB, or None."""
+    return _status_kb("VmHWM:")
+
+
+def reset_high_water():
+    """Reset the peak resident memory of this process to the current one.
+
+    Returns:
+        bool: False where the peak cannot be reset.
+
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+    except (IOError, OSError):
+        return False
+    return True
+
+
+def peak_rss_kb(children=False):
+    """Get the peak resident memory in KB, or None where unsupported.
+
+    The peak covers the life of the process since the last
+    ``reset_high_water``.
+
+    Args:
+        children (bool): Measure the largest child process that finished so
+            far instead of this one, whichever analysis started it.
+
+    """
+    if resource is None:
+        return None
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    peak = resource.getrusage(who).ru_maxrss
+    if sys.platform == "darwin":
+        peak //= 1024
+    return peak
+
+
+class _NullPhase(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+NULL_PHASE = _NullPhase()
+
+
+class _Phase(object):
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+        self.start = None
+        self.peak = None
+
+    def __enter__(self):
+        # The enclosing phases keep the peak the reset is about to drop.
+        self.metrics.fold_peak(high_water_kb())
+        if reset_high_water():
+            self.peak = 0
+        self.metrics.open_phases.append(self)
+        self.start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        seconds = time.time() - self.start
+        self.metrics.fold_peak(high_water_kb())
+        self.metrics.open_phases.remove(self)
+        self.metrics.fold_peak(self.peak)
+        self.metrics.phases.append({
+            "name": self.name,
+            "start": round(self.start - self.metrics.started_at, 6),
+            "seconds": round(seconds, 6),
+            "rss_kb": current_rss_kb(),
+            "peak_rss_kb": self.peak,
+            "ok": exc_type is None,
+        })
+        return False
+
+
+class Metrics(object):
+    """Collect phases and counters, then save them as json."""
+
+    def __init__(self, enabled=True, hooks=None):
+        """Initialize the metrics.
+
+        Args:
+            enabled (bool): Record anything at all.
+            hooks (list, optional): Callables given the metrics dict when
+                they are saved, e.g. to forward them to a monitoring system.
+
+        """
+        self.enabled = enabled
+        self.hooks = list(hooks or [])
+        self.started_at = time.time()
+        self.phases = []
+        self.counts = {}
+        self.extra = {}
+        self.open_phases = []
+
+    def phase(self, name):
+        """Time a block of code.
+
+        Args:
+            name (str): Phase name.
+
+        """
+        if not self.enabled:
+            return NULL_PHASE
+        return _Phase(self, name)
+
+    def fold_peak(self, peak_kb):
+        """Raise the peak of the open phases that measure one to a peak."""
+        if peak_kb is None:
+            return
+        for phase in self.open_phases:
+            if phase.peak is not None:
+                phase.peak = max(phase.peak, peak_kb)
+
+    def count(self, name, value=1):
+        """Add to a counter."""
+        if self.enabled:
+            self.counts[name] = self.counts.get(name, 0) + value
+
+    def to_dict(self):
+        """Get the metrics as a json serializable dict."""
+        data = {
+            "started_at": self.started_at,
+            "phases": self.phases,
+            "counts": self.counts,
+        }
+        data.update(self.extra)
+        return data
+
+    def save(self, path):
+        """Write the metrics to a json file and call the hooks."""
+        if not self.enabled:
+            return
+        data = self.to_dict()
+        with open(path, "w") as metrics_file:
+            json.dump(data, metrics_file, indent=4)
+        for hook in self.hooks:
+            hook(data)
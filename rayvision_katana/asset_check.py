@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""Check that the assets of a scene exist, one directory listing at a time.
+
+Paths are grouped by directory and every directory is listed once instead of
+calling ``os.path.exists`` per file. The listing is an ``os.scandir`` one, so
+on Windows the sizes and mtimes come with it and no file is stat'ed.
+Directories are listed on a thread pool and a semaphore per mount bounds the
+requests in flight against one share, so a slow SMB/NFS server is not
+flooded while other mounts keep going.
+
+File sequences are understood as well: a name holding ``<UDIM>``, ``#``,
+``%04d`` or ``$F4`` matches every file of the directory that fits it.
+
+"""
+
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from os import scandir
+except ImportError:  # Python 2
+    scandir = None
+
+from rayvision_katana.constants import ASSET_CHECK_PER_MOUNT
+from rayvision_katana.constants import ASSET_CHECK_WORKERS
+
+# Tokens of file sequences and the pattern each one stands for.
+SEQUENCE_TOKENS = re.compile(
+    r"(?P<udim><UDIM>|<udim>)"
+    r"|(?P<uv><UVTILE>|<uvtile>|_u<U>_v<V>)"
+    r"|(?P<hashes>#+)"
+    r"|(?P<printf>%0?\d*d)"
+    r"|(?P<houdini>\$F\d*)")
+
+
+def sequence_regex(name):
+    """Get the regex matching the files of a sequence name.
+
+    Args:
+        name (str): File name, e.g. ``"color.<UDIM>.tx"``.
+
+    Returns:
+        re.Pattern: The compiled pattern, or None if ``name`` is a plain
+            file name.
+
+    """
+    parts = []
+    position = 0
+    for match in SEQUENCE_TOKENS.finditer(name):
+        parts.append(re.escape(name[position:match.start()]))
+        if match.group("udim"):
+            parts.append(r"\d{4}")
+        elif match.group("uv"):
+            parts.append(r"(?:_?u\d+_v\d+)")
+        else:
+            parts.append(r"-?\d+")
+        position = match.end()
+    if not parts:
+        return None
+    parts.append(re.escape(name[position:]))
+    return re.compile("".join(parts) + "$",
+                      re.IGNORECASE if os.name == "nt" else 0)
+
+
+class AssetStat(object):
+    """Result of checking one asset path."""
+
+    __slots__ = ("path", "files")
+
+    def __init__(self, path, files=()):
+        """Initialize the result.
+
+        Args:
+            path (str): Asset path as found by the analysis.
+            files (list): ``(file_path, size, mtime)`` of every existing
+                file, several for a sequence.
+
+        """
+        self.path = path
+        self.files = list(files)
+
+    @property
+    def exists(self):
+        """bool: True if at least one file was found."""
+        return bool(self.files)
+
+    @property
+    def size(self):
+        """int: Total size of the files."""
+        return sum(item[1] for item in self.files)
+
+    @property
+    def mtime(self):
+        """float: Latest modification time of the files, or None."""
+        if not self.files:
+            return None
+        return max(item[2] for item in self.files)
+
+
+_MOUNTS = {}
+
+
+def mount_of(directory):
+    """Get the mount point, drive or UNC share holding a directory.
+
+    The mount of every folder walked through is cached, so the folders of
+    one tree only check the ancestors no other folder checked.
+
+    """
+    drive, _ = os.path.splitdrive(directory)
+    if drive:
+        return drive.lower()
+    folder = os.path.abspath(directory)
+    walked = []
+    while folder not in _MOUNTS:
+        walked.append(folder)
+        parent = os.path.dirname(folder)
+        if parent == folder or os.path.ismount(folder):
+            _MOUNTS[folder] = folder
+            break
+        folder = parent
+    mount = _MOUNTS[folder]
+    for folder in walked:
+        _MOUNTS[folder] = mount
+    return mount
+
+
+def _list_directory(directory, names):
+    """Stat the wanted names of one directory from a single listing.
+
+    Args:
+        directory (str): Directory to list.
+        names (dict): Maps file names, or sequence names, to the asset paths
+            asking for them.
+
+    Returns:
+        list of AssetStat
+
+    """
+    try:
+        if scandir is None:
+            listing = dict.fromkeys(os.listdir(directory))
+        else:
+            listing = {entry.name: entry for entry in scandir(directory)}
+    except OSError:
+        return [AssetStat(path) for paths in names.values() for path in paths]
+
+    normcase = os.path.normcase
+    entries = {normcase(entry): entry for entry in listing}
+    results = []
+    for name, paths in names.items():
+        regex = sequence_regex(name)
+        if regex is None:
+            found = entries.get(normcase(name))
+            matches = [found] if found else []
+        else:
+            matches = sorted(entry for entry in listing if regex.match(entry))
+        files = []
+        for entry in matches:
+            file_path = os.path.join(directory, entry)
+            dir_entry = listing[entry]
+            try:
+                file_stat = os.stat(file_path) if dir_entry is None \
+                    else dir_entry.stat()
+            except OSError:
+                continue
+            files.append((file_path, file_stat.st_size, file_stat.st_mtime))
+        results.extend(AssetStat(path, files) for path in paths)
+    return results
+
+
+def verify_assets(paths, max_workers=ASSET_CHECK_WORKERS,
+                  per_mount=ASSET_CHECK_PER_MOUNT):
+    """Check which asset paths exist and get their sizes and mtimes.
+
+    Args:
+        paths (iterable): Asset paths.
+        max_workers (int): Directories listed at once overall.
+        per_mount (int): Directories listed at once on one mount.
+
+    Returns:
+        dict: ``AssetStat`` by asset path.
+
+    """
+    directories = {}
+    for path in paths:
+        directory, name = os.path.split(os.path.normpath(path))
+        directories.setdefault(directory, {}).setdefault(name, []).append(
+            path)
+
+    semaphores = {}
+    for directory in directories:
+        mount = mount_of(directory)
+        if mount not in semaphores:
+            semaphores[mount] = threading.BoundedSemaphore(per_mount)
+
+    def check(directory):
+        with semaphores[mount_of(directory)]:
+            return _list_directory(directory, directories[directory])
+
+    results = {}
+    if not directories:
+        return results
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for stats in executor.map(check, directories):
+            for asset_stat in stats:
+                results[asset_stat.path] = asset_stat
+    return results
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""Helpers to read the records of asset.json.
+
+asset.json maps every filter.txt category to a list of records::
+
+    {
+        "model": [
+            {"node": "Alembic_In", "type": "Alembic_In",
+             "parameter": "abcAsset", "path": "/cache/shot.abc"}
+        ]
+    }
+
+"""
+
+
+def iter_asset_records(asset_info):
+    """Yield ``(category, record)`` for every asset record with a path.
+
+    Args:
+        asset_info (dict): Content of asset.json.
+
+    """
+    for category, records in asset_info.items():
+        if not isinstance(records, list):
+            continue
+        for record in records:
+            if isinstance(record, dict) and record.get("path"):
+                yield category, record
+
+
+def iter_asset_paths(asset_info):
+    """Yield every asset path once, in asset.json order."""
+    seen = set()
+    for _, record in iter_asset_records(asset_info):
+        path = record["path"]
+        if path not in seen:
+            seen.add(path)
+            yield path
+
+
+def merge_records(asset_info, records, on_added=None):
+    """Add ``(category, record)`` pairs to asset.json, skipping known paths.
+
+    Args:
+        asset_info (dict): asset.json dict.
+        records (iterable): ``(category, record)`` pairs.
+        on_added (callable, optional): Given the category and record of every
+            record added.
+
+    Returns:
+        int: Number of records added.
+
+    """
+    known = set(record["path"] for _, record in iter_asset_records(asset_info))
+    added = 0
+    for category, record in records:
+        if record["path"] in known:
+            continue
+        known.add(record["path"])
+        asset_info.setdefault(category, []).append(record)
+        added += 1
+        if on_added is not None:
+            on_added(category, record)
+    return added
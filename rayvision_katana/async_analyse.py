@@ -0,0 +1,277 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""Run Katana analyses on an asyncio event loop.
+
+Katana is started without a shell in its own process group, its output is
+streamed into the logger line by line, and a watchdog enforces a wall-clock
+timeout and a memory ceiling over the whole process tree. A timeout, a
+memory overrun or a cancellation kills the tree. Blocking steps such as
+hashing and asset checks run in the loop's executor, so one loop can drive
+many analyses at once.
+
+"""
+
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Seconds between two memory checks of the Katana process tree.
+POLL_INTERVAL = 1.0
+
+# Seconds to wait for a killed process tree to close its output.
+KILL_GRACE = 10
+
+
+class MemoryLimitError(Exception):
+    """The Katana process tree used more memory than allowed."""
+
+
+def _proc_tree_rss(pid):
+    """Get the resident memory of a process group from /proc, in bytes."""
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    total = 0
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open("/proc/{}/stat".format(entry)) as stat_file:
+                fields = stat_file.read().rsplit(")", 1)[1].split()
+            # fields[2] is the process group, fields[21] the rss in pages.
+            if int(fields[2]) == pid:
+                total += int(fields[21]) * page_size
+        except (IOError, OSError, IndexError, ValueError):
+            continue
+    return total
+
+
+def tree_rss(pid):
+    """Get the resident memory of a process and its children, in bytes.
+
+    Returns:
+        int: Memory in bytes, or None where it cannot be measured.
+
+    """
+    if psutil is not None:
+        try:
+            process = psutil.Process(pid)
+            processes = [process] + process.children(recursive=True)
+        except psutil.Error:
+            return 0
+        total = 0
+        for item in processes:
+            try:
+                total += item.memory_info().rss
+            except psutil.Error:
+                continue
+        return total
+    if os.path.isdir("/proc"):
+        return _proc_tree_rss(pid)
+    return None
+
+
+def kill_tree(process):
+    """Kill a process started by ``start_process`` and all its children."""
+    if process.returncode is not None:
+        return
+    if os.name == "nt":
+        subprocess.call(["taskkill", "/F", "/T", "/PID", str(process.pid)],
+                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except OSError:
+        pass
+
+
+async def start_process(argv):
+    """Start a program without a shell in a new process group."""
+    kwargs = {}
+    if os.name == "nt":
+        kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs["start_new_session"] = True
+    return await asyncio.create_subprocess_exec(
+        *argv, stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE, **kwargs)
+
+
+async def _log_stream(stream, log):
+    while True:
+        line = await stream.readline()
+        if not line:
+            break
+        line = line.decode(sys.getfilesystemencoding(), "replace").rstrip()
+        if line:
+            log(line)
+
+
+async def _watch_memory(process, max_bytes, logger):
+    while process.returncode is None:
+        rss = tree_rss(process.pid)
+        if rss is None:
+            logger.warning("memory of the Katana process cannot be measured "
+                           "on this platform without psutil")
+            return
+        if rss > max_bytes:
+            raise MemoryLimitError(rss)
+        await asyncio.sleep(POLL_INTERVAL)
+
+
+async def run_process(argv, logger, timeout=None, max_memory_mb=None,
+                      output=None):
+    """Run a program, streaming its output and enforcing the limits.
+
+    Args:
+        argv (list): Program and arguments.
+        logger (logging.Logger): Receives stdout as info and stderr as
+            warning, line by line.
+        timeout (float, optional): Wall-clock seconds before it is killed.
+        max_memory_mb (int, optional): Resident memory of the process tree
+            above which it is killed.
+        output (callable, optional): Given the stdout lines instead of the
+            logger.
+
+    Returns:
+        int: The exit code.
+
+    Raises:
+        asyncio.TimeoutError: The timeout expired.
+        MemoryLimitError: The memory ceiling was passed.
+        asyncio.CancelledError: The run was cancelled.
+
+    """
+    logger.info("run command:\n%s", argv)
+    process = await start_process(argv)
+    tasks = [_log_stream(process.stdout, output or logger.info),
+             _log_stream(process.stderr, logger.warning),
+             process.wait()]
+    run = asyncio.ensure_future(asyncio.gather(*tasks))
+    watchdog = None
+    if max_memory_mb:
+        watchdog = asyncio.ensure_future(
+            _watch_memory(process, max_memory_mb * 1024 * 1024, logger))
+    deadline = None if timeout is None else time.time() + timeout
+    try:
+        if watchdog is not None:
+            await asyncio.wait([run, watchdog], timeout=timeout,
+                               return_when=asyncio.FIRST_COMPLETED)
+            if watchdog.done() and watchdog.exception() is not None:
+                raise watchdog.exception()
+        remaining = None if deadline is None else max(deadline - time.time(),
+                                                      0)
+        await asyncio.wait_for(run, remaining)
+    except BaseException:
+        kill_tree(process)
+        # Let the readers drain and the killed process be reaped.
+        done, _ = await asyncio.wait([run], timeout=KILL_GRACE)
+        if not done:
+            run.cancel()
+        raise
+    finally:
+        if watchdog is not None:
+            watchdog.cancel()
+    return process.returncode
+
+
+async def acquire_license(license_pool):
+    """Take a slot of a ``LicensePool`` without blocking the event loop.
+
+    The slot is waited for in the loop's executor; a slot that comes after
+    the caller was cancelled is given back at once.
+
+    """
+    loop = asyncio.get_event_loop()
+    acquiring = loop.run_in_executor(None, license_pool.__enter__)
+    try:
+        await asyncio.shield(acquiring)
+    except asyncio.CancelledError:
+        acquiring.add_done_callback(
+            lambda _: license_pool.__exit__(None, None, None))
+        raise
+
+
+async def analyse_async(analyzer, exe_path="", no_upload=False,
+                        check_assets=True, timeout=None, max_memory_mb=None,
+                        semaphore=None):
+    """Analyse a scene of an ``AnalyzeKatana`` on the running event loop.
+
+    Args:
+        analyzer (AnalyzeKatana): The analysis to run.
+        exe_path (str): Katana executable, looked up if empty.
+        no_upload (bool): Do you not generate an upload,json file.
+        check_assets (bool): Check that the assets exist afterwards.
+        timeout (float, optional): Wall-clock seconds Katana may run.
+        max_memory_mb (int, optional): Memory ceiling of the Katana tree.
+        semaphore (asyncio.Semaphore, optional): Held while Katana runs to
+            cap the number of live Katana processes. The ``license_pool``
+            of the analyzer is held as well, inside the semaphore.
+
+    Returns:
+        AnalyzeKatana: The analyzer, with its results loaded.
+
+    Raises:
+        AnalyseFailError: Katana failed, timed out or used too much memory;
+            the reason is recorded in tips.json.
+
+    """
+    loop = asyncio.get_event_loop()
+    cache_key, restored = await loop.run_in_executor(
+        None, analyzer.begin_analyse)
+    if restored:
+        return await loop.run_in_executor(
+            None, analyzer.post_analyse, no_upload, check_assets)
+
+    task_path = os.path.dirname(analyzer.task_json).replace("\\", "/")
+    code = None
+    if analyzer.analyse_mode == "offline":
+        if await loop.run_in_executor(None, analyzer.analyse_offline):
+            code = 0
+    if code is None and analyzer.worker is not None:
+        with analyzer.metrics.phase("katana_worker"):
+            code = await loop.run_in_executor(
+                None, analyzer.analyse_in_worker, task_path)
+    if code is None:
+        if not os.path.exists(exe_path):
+            exe_path = await loop.run_in_executor(
+                None, analyzer.analyse_cg_file)
+        argv = analyzer.build_argv(exe_path, task_path)
+        license_pool = analyzer.license_pool
+
+        async def run_katana():
+            if license_pool is not None:
+                await acquire_license(license_pool)
+            try:
+                with analyzer.metrics.phase("katana"):
+                    return await run_process(argv, analyzer.logger, timeout,
+                                             max_memory_mb,
+                                             analyzer.katana_output)
+            finally:
+                if license_pool is not None:
+                    license_pool.__exit__(None, None, None)
+
+        try:
+            if semaphore is None:
+                code = await run_katana()
+            else:
+                async with semaphore:
+                    code = await run_katana()
+        except asyncio.TimeoutError:
+            analyzer.fail_analyse(
+                "Katana analysis timed out after {} seconds".format(timeout))
+        except MemoryLimitError as err:
+            analyzer.fail_analyse(
+                "Katana analysis used {} MB, more than the {} MB "
+                "allowed".format(int(err.args[0]) // (1024 * 1024),
+                                 max_memory_mb))
+
+    return await loop.run_in_executor(
+        None, analyzer.finish_analyse, code, cache_key, no_upload,
+        check_assets)
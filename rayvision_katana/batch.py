@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""Analyse many Katana scenes concurrently.
+
+Scenes run on a thread pool; every thread blocks on its own katanaBin
+process, and a ``LicensePool`` caps how many of those processes are alive
+at the same time so a batch never asks for more licenses than we own.
+
+"""
+
+import argparse
+import json
+import logging
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from rayvision_katana.analyse_katana import AnalyzeKatana
+
+# Number of scenes analysed at once when neither workers nor licenses are set.
+DEFAULT_MAX_WORKERS = 4
+
+
+class LicensePool(object):
+    """Bounded pool of Katana license slots, used as a context manager."""
+
+    def __init__(self, licenses):
+        """Initialize the pool.
+
+        Args:
+            licenses (int): Number of Katana processes allowed to run at once.
+
+        """
+        if licenses < 1:
+            raise ValueError("licenses must be at least 1")
+        self.licenses = licenses
+        self._semaphore = threading.BoundedSemaphore(licenses)
+
+    def __enter__(self):
+        self._semaphore.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._semaphore.release()
+
+
+class BatchResult(object):
+    """Outcome of analysing one scene of a batch."""
+
+    def __init__(self, cg_file, analyzer=None, error=None):
+        """Initialize the result.
+
+        Args:
+            cg_file (str): Scene file path.
+            analyzer (AnalyzeKatana, optional): The finished analysis.
+            error (Exception, optional): Why the analysis failed.
+
+        """
+        self.cg_file = cg_file
+        self.analyzer = analyzer
+        self.error = error
+
+    @property
+    def ok(self):
+        """bool: True if the scene was analysed successfully."""
+        return self.error is None
+
+    def to_dict(self):
+        """Get a json serializable summary of the result."""
+        return {
+            "cg_file": self.cg_file,
+            "status": "ok" if self.ok else "failed",
+            "workspace": self.analyzer.workspace if self.analyzer else None,
+            "error": None if self.ok else "{}: {}".format(
+                type(self.error).__name__, self.error),
+        }
+
+
+# ``AnalyzeKatana.analyse`` arguments a scene dict may hold.
+SELECTION_KEYS = ("rendernodes", "exclude_rendernodes", "categories",
+                  "exclude_categories")
+
+
+def _analyse_one(scene, exe_path, no_upload, license_pool, logger):
+    analyzer = None
+    scene = dict(scene)
+    selection = dict((key, scene.pop(key)) for key in SELECTION_KEYS
+                     if key in scene)
+    try:
+        analyzer = AnalyzeKatana(license_pool=license_pool, **scene)
+        analyzer.analyse(exe_path=exe_path, no_upload=no_upload,
+                         **selection)
+    except Exception as err:  # pylint: disable=broad-except
+        logger.exception("Analysis of %s failed", scene.get("cg_file"))
+        return BatchResult(scene.get("cg_file"), analyzer, err)
+    return BatchResult(scene.get("cg_file"), analyzer)
+
+
+def analyse_many(scenes, max_workers=None, licenses=None, exe_path="",
+                 no_upload=False, **defaults):
+    """Analyse several scenes concurrently.
+
+    A failing scene is recorded in its result and does not stop the batch.
+
+    Args:
+        scenes (list): Scene file paths, or dicts of ``AnalyzeKatana``
+            arguments that override ``defaults``, and optionally of the
+            render node and category patterns of ``analyse``, e.g.
+            ``{"cg_file": ..., "rendernodes": ["Render_hero*"]}``.
+        max_workers (int, optional): Number of scenes analysed at once.
+        licenses (int, optional): Maximum number of live Katana processes,
+            ``max_workers`` by default.
+        exe_path (str): Katana executable, looked up per scene if empty.
+        no_upload (bool): Do you not generate an upload,json file.
+        **defaults: ``AnalyzeKatana`` arguments shared by every scene;
+            ``references=True`` shares one ``ReferenceResolver``.
+            e.g.:
+                software_version="3.2v1", project_name="Project1",
+                plugin_config={"KtoA": "2.4.0.3"}
+
+    Returns:
+        list of BatchResult: One result per scene, in input order.
+
+    """
+    if defaults.get("references") is True:
+        # One resolver for the batch reads a shared reference file once.
+        from rayvision_katana.references import ReferenceResolver
+        defaults["references"] = ReferenceResolver()
+    scene_args = []
+    for scene in scenes:
+        if not isinstance(scene, dict):
+            scene = {"cg_file": scene}
+        kwargs = dict(defaults)
+        kwargs.update(scene)
+        scene_args.append(kwargs)
+
+    max_workers = max_workers or licenses or DEFAULT_MAX_WORKERS
+    license_pool = LicensePool(licenses or max_workers)
+    logger = defaults.get("logger") or logging.getLogger(__name__)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_analyse_one, kwargs, exe_path, no_upload,
+                                   license_pool, logger)
+                   for kwargs in scene_args]
+        return [future.result() for future in futures]
+
+
+def _parse_plugins(values):
+    plugins = {}
+    for value in values or []:
+        name, _, version = value.partition("=")
+        plugins[name] = version
+    return plugins
+
+
+def main(argv=None):
+    """Analyse scenes given on the command line and print a json summary.
+
+    Returns:
+        int: 0 if every scene was analysed, 1 otherwise.
+
+    """
+    parser = argparse.ArgumentParser(
+        prog="rayvision-katana-analyse",
+        description="Analyse Katana scenes for Renderbus.")
+    parser.add_argument("cg_files", nargs="*", help="Scene file paths.")
+    parser.add_argument("--scenes", help="Json file holding a list of scene "
+                                         "paths or AnalyzeKatana arguments.")
+    parser.add_argument("--software-version", required=True)
+    parser.add_argument("--project-name", required=True)
+    parser.add_argument("--plugin", action="append", metavar="NAME=VERSION",
+                        help="Plugin of the scene, may be repeated.")
+    parser.add_argument("--workspace")
+    parser.add_argument("--exe-path", default="")
+    parser.add_argument("--platform", default="2")
+    parser.add_argument("--max-workers", type=int)
+    parser.add_argument("--licenses", type=int,
+                        help="Maximum number of live Katana processes.")
+    parser.add_argument("--no-upload", action="store_true")
+    args = parser.parse_args(argv)
+
+    scenes = list(args.cg_files)
+    if args.scenes:
+        with open(args.scenes) as scenes_file:
+            scenes.extend(json.load(scenes_file))
+    if not scenes:
+        parser.error("no scene to analyse")
+
+    results = analyse_many(scenes,
+                           max_workers=args.max_workers,
+                           licenses=args.licenses,
+                           exe_path=args.exe_path,
+                           no_upload=args.no_upload,
+                           software_version=args.software_version,
+                           project_name=args.project_name,
+                           plugin_config=_parse_plugins(args.plugin),
+                           workspace=args.workspace,
+                           platform=args.platform)
+    json.dump([result.to_dict() for result in results], sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return 0 if all(result.ok for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,75 @@
 """The constants of the rayvision_katana."""
 
 PACKAGE_NAME = "rayvision_katana"
+
+# File name of the persistent content-hash cache kept in the workspace root.
+HASH_CACHE_NAME = "hash_cache.db"
+
+# Maximum number of digests kept in the hash cache before LRU eviction.
+HASH_CACHE_MAX_ENTRIES = 200000
+
+# Jobs a warm Katana worker serves before it is restarted.
+WORKER_MAX_JOBS = 50
+
+# Seconds to wait for a warm Katana worker to start and load its plugins.
+WORKER_START_TIMEOUT = 600
+
+# Folder of the analysis result cache in the workspace root.
+RESULT_CACHE_NAME = "result_cache"
+
+# Maximum number of analyses kept in the result cache.
+RESULT_CACHE_MAX_ENTRIES = 2000
+
+# Directories listed at once when checking that assets exist.
+ASSET_CHECK_WORKERS = 16
+
+# Directories listed at once on one mount, drive or UNC share.
+ASSET_CHECK_PER_MOUNT = 4
+
+# Options the client passes to the Katana script, written next to task.json.
+ANALYSE_OPTIONS_NAME = "analyse_options.json"
+
+# Per-phase metrics of an analysis, written next to task.json.
+METRICS_NAME = "metrics.json"
+
+# Metrics the Katana script writes for the client to merge.
+KATANA_METRICS_NAME = "metrics.katana.json"
+
+# File name of the index of installed Katana versions in the workspace root.
+INSTALL_INDEX_NAME = "katana_installs.json"
+
+# Seconds an install index is trusted before its roots are checked again.
+INSTALL_INDEX_CHECK_INTERVAL = 60
+
+# Folders holding "Katana<version>" install folders, by local os.
+INSTALL_ROOTS = {
+    "linux": ["/opt/Foundry", "/usr/local/Foundry"],
+    "windows": ["C:/Program Files", "C:/Program Files/Foundry"],
+}
+
+# Environment variable listing more install roots, separated by os.pathsep.
+INSTALL_ROOTS_ENV = "KATANA_INSTALL_ROOTS"
+
+# Folder of the manifests of the previous analysis of every scene.
+HISTORY_NAME = "history"
+
+# File name of the index of content already transferred to the farm.
+CONTENT_INDEX_NAME = "content_index.db"
+
+# Folder of the daily archives of removed workspaces in the workspace root.
+WORKSPACE_ARCHIVE_NAME = "archive"
+
+# Seconds since its last change before a workspace counts as finished.
+WORKSPACE_GRACE = 3600
+
+# Reference files read at once when resolving the references of a scene.
+REFERENCE_WORKERS = 8
+
+# File name of the cache of USD and Alembic dependencies in the workspace root.
+DEEP_SCAN_NAME = "deep_scan.db"
+
+# Processes scanning USD and Alembic files at once.
+DEEP_SCAN_WORKERS = 4
+
+# Files hashed at once by the bulk hashing of the assets.
+HASH_WORKERS = 8
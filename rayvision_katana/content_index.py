@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""Index of the content already transferred to the farm.
+
+Content hashes map to the server path the content was uploaded to and the
+upload time. Every hash is stored with its ``hashlib`` algorithm and only
+looked up with the same one, so an md5 and a blake2b digest never match.
+Shared libraries such as HDRIs, lookdev textures and Alembic caches are then
+only sent once: later tasks find their hashes in the index and mark or drop
+the files from upload.json.
+
+The index lives in a SQLite database that concurrent analyser processes can
+share, like the hash cache.
+
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Digests per ``IN (...)`` query, below the SQLite variable limit.
+LOOKUP_BATCH = 500
+
+
+class ContentIndex(object):
+    """SQLite index of content hash to server path and upload time."""
+
+    def __init__(self, db_path, timeout=30):
+        """Initialize the index.
+
+        Args:
+            db_path (str): Path of the SQLite database file.
+            timeout (int): Seconds to wait on a database locked by another
+                process.
+
+        """
+        self.db_path = db_path
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            folder = os.path.dirname(self.db_path)
+            if folder and not os.path.exists(folder):
+                os.makedirs(folder)
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout,
+                                   isolation_level=None,
+                                   check_same_thread=False)
+            columns = [row[1] for row in
+                       conn.execute("PRAGMA table_info(content)")]
+            if columns and "algorithm" not in columns:
+                # Digests of an unknown algorithm cannot be trusted.
+                conn.execute("DROP TABLE content")
+            conn.execute("CREATE TABLE IF NOT EXISTS content ("
+                         "digest TEXT NOT NULL, "
+                         "algorithm TEXT NOT NULL, "
+                         "size INTEGER, "
+                         "server TEXT NOT NULL, "
+                         "uploaded REAL NOT NULL, "
+                         "PRIMARY KEY (digest, algorithm))")
+            self._conn = conn
+        return self._conn
+
+    def lookup_many(self, digests, algorithm="md5"):
+        """Find which contents were already transferred.
+
+        Args:
+            digests (iterable): Content hashes.
+            algorithm (str): ``hashlib`` algorithm of the hashes.
+
+        Returns:
+            dict: ``(server, uploaded)`` by known digest.
+
+        """
+        digests = list(set(digests))
+        found = {}
+        with self._lock:
+            conn = self._connect()
+            for start in range(0, len(digests), LOOKUP_BATCH):
+                batch = digests[start:start + LOOKUP_BATCH]
+                rows = conn.execute(
+                    "SELECT digest, server, uploaded FROM content "
+                    "WHERE algorithm = ? AND digest IN ({})".format(
+                        ",".join("?" * len(batch))),
+                    [algorithm] + batch)
+                for digest, server, uploaded in rows:
+                    found[digest] = (server, uploaded)
+        return found
+
+    def record_many(self, entries, uploaded=None, algorithm="md5"):
+        """Record transferred contents.
+
+        Args:
+            entries (iterable): ``(digest, size, server)`` tuples.
+            uploaded (float, optional): Upload time, now by default.
+            algorithm (str): ``hashlib`` algorithm of the hashes.
+
+        """
+        uploaded = time.time() if uploaded is None else uploaded
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            try:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO content VALUES (?, ?, ?, ?, ?)",
+                    ((digest, algorithm, size, server, uploaded)
+                     for digest, size, server in entries))
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def remove_many(self, digests, algorithm="md5"):
+        """Forget contents, e.g. when they were deleted from the farm.
+
+        Args:
+            digests (iterable): Content hashes.
+            algorithm (str): ``hashlib`` algorithm of the hashes.
+
+        """
+        with self._lock:
+            self._connect().executemany(
+                "DELETE FROM content WHERE digest = ? AND algorithm = ?",
+                ((digest, algorithm) for digest in digests))
+
+    def rebuild(self, history_root):
+        """Add the contents of the uploaded scene manifests to the index.
+
+        Only the manifests committed after a successful upload, which carry
+        their ``uploaded_at`` time and hash ``algorithm``, are read. Their
+        files are merged with the records of the index, whose newest upload
+        of a content wins; no record is removed.
+
+        Args:
+            history_root (str): Folder of the ``SceneHistory`` manifests.
+
+        Returns:
+            int: Number of contents in the rebuilt index.
+
+        """
+        latest = {}
+        names = os.listdir(history_root) if os.path.isdir(history_root) \
+            else []
+        for name in names:
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(history_root, name)) as manifest_file:
+                    manifest = json.load(manifest_file)
+            except (IOError, OSError, ValueError):
+                continue
+            uploaded = manifest.get("uploaded_at")
+            algorithm = manifest.get("algorithm")
+            if uploaded is None or not algorithm:
+                continue
+            for info in manifest.get("files", {}).values():
+                key = (info.get("hash"), algorithm)
+                if key[0] and uploaded >= latest.get(key, (0,))[0]:
+                    latest[key] = (uploaded, info.get("size"), info["server"])
+        rows = [(digest, algorithm, size, server, uploaded)
+                for (digest, algorithm), (uploaded, size, server)
+                in latest.items()]
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            try:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO content VALUES (?, ?, ?, ?, ?)",
+                    rows)
+                conn.executemany(
+                    "UPDATE content SET size = ?, server = ?, uploaded = ? "
+                    "WHERE digest = ? AND algorithm = ? AND uploaded < ?",
+                    ((size, server, uploaded, digest, algorithm, uploaded)
+                     for digest, algorithm, size, server, uploaded in rows))
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            return conn.execute("SELECT COUNT(*) FROM content").fetchone()[0]
+
+    def verify(self, exists=None):
+        """Check the database and drop contents missing from the farm.
+
+        Args:
+            exists (callable, optional): Given a server path, returns False
+                if the content is gone from the farm storage.
+
+        Returns:
+            list: Digests that were dropped.
+
+        Raises:
+            sqlite3.DatabaseError: The database is corrupt; delete the file
+                and ``rebuild`` it.
+
+        """
+        with self._lock:
+            conn = self._connect()
+            status = conn.execute("PRAGMA integrity_check").fetchone()[0]
+            if status != "ok":
+                raise sqlite3.DatabaseError(status)
+            rows = conn.execute(
+                "SELECT digest, algorithm, server FROM content").fetchall()
+        if exists is None:
+            return []
+        stale = {}
+        for digest, algorithm, server in rows:
+            if not exists(server):
+                stale.setdefault(algorithm, []).append(digest)
+        for algorithm, digests in stale.items():
+            self.remove_many(digests, algorithm)
+        return [digest for digests in stale.values() for digest in digests]
+
+    def __len__(self):
+        with self._lock:
+            return self._connect().execute(
+                "SELECT COUNT(*) FROM content").fetchone()[0]
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
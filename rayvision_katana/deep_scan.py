@@ -0,0 +1,325 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""Dependencies of the USD and Alembic files of a scene.
+
+The filter rules only record the top level USD or Alembic file of a node.
+``DeepScanner`` follows what those files use:
+
+* USD ASCII layers (.usda, and .usd files starting with ``#usda``) are read
+  line by line for ``@asset@`` paths: sublayers, references and payloads
+  are scanned in turn, other paths such as textures are assets;
+* binary USD crates and Alembic archives are scanned for the paths
+  embedded in their bytes, see ``references.scan_paths``: absolute paths
+  and paths starting with ``./`` or ``../``. A bare relative path such as
+  ``tex/wood.tx`` cannot be told from the other strings of a binary file
+  and is not found.
+
+Relative paths are resolved against the folder of the layer using them.
+A file that cannot be read, such as a folder, is reported as unscanned.
+Files are scanned on a process pool one level of layers at a time, and the
+dependencies of every file are cached by its ``(size, mtime, inode)``
+fingerprint in a SQLite database, so an unchanged layer shared by many shots
+is scanned once.
+
+"""
+
+import io
+import json
+import multiprocessing
+import os
+import re
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from rayvision_katana.constants import DEEP_SCAN_WORKERS
+from rayvision_katana.hash_cache import stat_fingerprint
+from rayvision_katana.references import CATEGORY_BY_EXTENSION
+from rayvision_katana.references import extension
+from rayvision_katana.references import path_pattern
+from rayvision_katana.references import scan_paths
+
+USD_EXTENSIONS = (".usd", ".usda", ".usdc", ".usdz")
+
+# Extensions of the files whose dependencies are scanned.
+SCANNED_EXTENSIONS = USD_EXTENSIONS + (".abc",)
+
+ASSET_PATH = re.compile(r"@@@(.+?)@@@|@([^@\r\n]+)@")
+LAYER_ARC = re.compile(r"\b(subLayers|references|payload)\b")
+URI_SCHEME = re.compile(r"^[A-Za-z][A-Za-z0-9+.-]+://")
+
+# Paths of binary files: absolute or explicitly relative ones.
+BINARY_PATH = path_pattern(br"[A-Za-z]:[\\/]|[\\/]|\.\.?[\\/]")
+
+# asset.json category of the dependencies of an unknown extension.
+OTHER_CATEGORY = "other"
+
+
+def is_usd_ascii(file_path):
+    """Check whether a USD layer is a text layer."""
+    with open(file_path, "rb") as layer:
+        return layer.read(5) == b"#usda"
+
+
+def anchor(path, layer_path):
+    """Resolve a path used by a layer against the folder of the layer.
+
+    Returns:
+        str: The absolute path, or None for a non file URI.
+
+    """
+    if URI_SCHEME.match(path):
+        return None
+    path = path.replace("\\", "/")
+    if path.startswith("/") or re.match(r"^[A-Za-z]:/", path):
+        return path
+    return os.path.normpath(os.path.join(os.path.dirname(layer_path),
+                                         path)).replace("\\", "/")
+
+
+def scan_usda(file_path):
+    """Read the asset paths of a USD ASCII layer line by line.
+
+    Yields:
+        tuple: ``(arc, path)`` where arc is "subLayers", "references",
+            "payload" or "asset" and path is as written in the layer.
+
+    """
+    arc = None
+    with io.open(file_path, "r", encoding="utf-8", errors="replace") as layer:
+        for line in layer:
+            line_arc = arc
+            opens = False
+            found = None if arc else LAYER_ARC.search(line)
+            if found:
+                line_arc = found.group(1)
+                tail = line[found.end():]
+                opens = "[" in tail and "]" not in tail
+            for match in ASSET_PATH.finditer(line):
+                yield line_arc or "asset", match.group(1) or match.group(2)
+            if arc:
+                if "]" in line:
+                    arc = None
+            elif opens:
+                arc = line_arc
+
+
+def scan_file(file_path):
+    """Get the dependencies of one USD or Alembic file.
+
+    Runs in the worker processes of the scanner.
+
+    Returns:
+        list: Unique ``(arc, absolute path)`` pairs, in file order.
+
+    """
+    if extension(file_path) in (".usd", ".usda") and is_usd_ascii(file_path):
+        found = ((arc, anchor(path, file_path))
+                 for arc, path in scan_usda(file_path))
+    else:
+        found = (("asset", anchor(path, file_path))
+                 for path in scan_paths(file_path, pattern=BINARY_PATH))
+    dependencies = []
+    seen = set()
+    for arc, path in found:
+        if path and path not in seen:
+            seen.add(path)
+            dependencies.append((arc, path))
+    return dependencies
+
+
+def scan_file_safely(file_path):
+    """Get the dependencies of a file, or the error reading it.
+
+    Returns:
+        tuple: The ``scan_file`` list and None, or None and the error
+            message.
+
+    """
+    try:
+        return scan_file(file_path), None
+    except (IOError, OSError) as err:
+        return None, str(err)
+
+
+def process_pool(max_workers):
+    """Start a process pool that is safe to start from any thread.
+
+    Forking a process whose other threads hold locks can deadlock the
+    child, so the workers come from a fork server, or are spawned where
+    there is none.
+
+    """
+    try:
+        methods = multiprocessing.get_all_start_methods()
+    except AttributeError:  # Python 2
+        return ProcessPoolExecutor(max_workers)
+    context = multiprocessing.get_context(
+        "forkserver" if "forkserver" in methods else "spawn")
+    return ProcessPoolExecutor(max_workers, mp_context=context)
+
+
+class DeepScanCache(object):
+    """SQLite cache of file dependencies keyed by file fingerprint."""
+
+    def __init__(self, db_path, timeout=30):
+        """Initialize the cache.
+
+        Args:
+            db_path (str): Path of the SQLite database file.
+            timeout (int): Seconds to wait on a database locked by another
+                process.
+
+        """
+        self.db_path = db_path
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            folder = os.path.dirname(self.db_path)
+            if folder and not os.path.exists(folder):
+                os.makedirs(folder)
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout,
+                                   isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute("CREATE TABLE IF NOT EXISTS deep_scan ("
+                         "path TEXT PRIMARY KEY, "
+                         "size INTEGER, "
+                         "mtime INTEGER, "
+                         "inode INTEGER, "
+                         "dependencies TEXT)")
+            self._conn = conn
+        return self._conn
+
+    def get(self, file_path, fingerprint):
+        """Get the cached dependencies of a file, or None."""
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT size, mtime, inode, dependencies FROM deep_scan "
+                "WHERE path = ?", (file_path,)).fetchone()
+        if row and tuple(row[:3]) == fingerprint:
+            return [tuple(item) for item in json.loads(row[3])]
+        return None
+
+    def set(self, file_path, fingerprint, dependencies):
+        """Store the dependencies of a file for its fingerprint."""
+        size, mtime, inode = fingerprint
+        with self._lock:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO deep_scan VALUES (?, ?, ?, ?, ?)",
+                (file_path, size, mtime, inode, json.dumps(dependencies)))
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class DeepScanner(object):
+    """Follow the dependencies of USD and Alembic files recursively."""
+
+    def __init__(self, cache=None, max_workers=DEEP_SCAN_WORKERS):
+        """Initialize the scanner.
+
+        Args:
+            cache (DeepScanCache, optional): Cache of the dependencies.
+            max_workers (int): Processes scanning files at once; 1 scans in
+                the calling process.
+
+        """
+        self.cache = cache
+        self.max_workers = max_workers
+        self.scanned = 0
+
+    def _scan_level(self, files, pool, unscanned):
+        """Get the dependencies of files, from the cache when possible.
+
+        ``pool`` holds the process pool once a level needs one, and
+        ``unscanned`` gets the files that could not be read.
+
+        """
+        results = {}
+        misses = []
+        for file_path, fingerprint in files:
+            cached = None
+            if self.cache is not None:
+                cached = self.cache.get(file_path, fingerprint)
+            if cached is None:
+                misses.append((file_path, fingerprint))
+            else:
+                results[file_path] = cached
+        if len(misses) > 1 and self.max_workers > 1:
+            if not pool:
+                pool.append(process_pool(self.max_workers))
+            scanned = pool[0].map(scan_file_safely,
+                                  [path for path, _ in misses])
+        else:
+            scanned = (scan_file_safely(path) for path, _ in misses)
+        for (file_path, fingerprint), (dependencies, error) in zip(
+                misses, scanned):
+            if error is not None:
+                unscanned.append((file_path, error))
+                results[file_path] = []
+                continue
+            dependencies = [tuple(item) for item in dependencies]
+            if self.cache is not None:
+                self.cache.set(file_path, fingerprint, dependencies)
+            results[file_path] = dependencies
+            self.scanned += 1
+        return results
+
+    def scan(self, paths, unscanned=None):
+        """Follow the dependencies of files, one level at a time.
+
+        Args:
+            paths (iterable): Files found by the analysis; only USD and
+                Alembic files are scanned.
+            unscanned (list, optional): Gets ``(path, error)`` for every
+                file that could not be read.
+
+        Yields:
+            tuple: ``(category, record)`` for every dependency, as soon as
+                its level is scanned. ``reference`` is the file using it.
+
+        """
+        visited = set()
+        found = set()
+        pending = [path.replace("\\", "/") for path in paths]
+        pool = []
+        try:
+            while pending:
+                files = []
+                for file_path in pending:
+                    if file_path in visited \
+                            or extension(file_path) not in SCANNED_EXTENSIONS:
+                        continue
+                    visited.add(file_path)
+                    try:
+                        files.append((file_path,
+                                      stat_fingerprint(os.stat(file_path))))
+                    except OSError:
+                        continue
+                results = self._scan_level(
+                    files, pool, [] if unscanned is None else unscanned)
+                pending = []
+                for file_path, _ in files:
+                    for arc, path in results[file_path]:
+                        pending.append(path)
+                        if path in found:
+                            continue
+                        found.add(path)
+                        yield CATEGORY_BY_EXTENSION.get(
+                            extension(path), OTHER_CATEGORY), {
+                            "node": "",
+                            "type": "embedded",
+                            "parameter": arc,
+                            "path": path,
+                            "reference": file_path,
+                        }
+        finally:
+            if pool:
+                pool[0].shutdown()
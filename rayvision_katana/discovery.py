@@ -0,0 +1,351 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""Index of the Katana versions installed on this machine.
+
+The install roots, ``KATANA_ROOT`` and, on Windows, the uninstall entries of
+the registry are scanned once; the index of versions to executables and
+bundled render plugins is saved as json next to the other workspace caches.
+It is rebuilt when the modification time of a root, one of the environment
+variables or the Katana entries of the registry change, or when the
+executable of a version looked up is gone, so installing or removing a
+version invalidates it without a rescan of every lookup. One index is shared
+by every analysis of the process and is revalidated at most every
+``INSTALL_INDEX_CHECK_INTERVAL`` seconds.
+
+"""
+
+import difflib
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+from rayvision_katana.constants import INSTALL_INDEX_CHECK_INTERVAL
+from rayvision_katana.constants import INSTALL_ROOTS
+from rayvision_katana.constants import INSTALL_ROOTS_ENV
+
+# Version in the name of an install folder, e.g. "Katana3.2v1".
+INSTALL_NAME = re.compile(r"^katana\s*(\d+\.\d+v\d+)$", re.IGNORECASE)
+
+# Uninstall entry of a Katana install in the Windows registry.
+REGISTRY_NAME = re.compile(r"^Katana (.+)_is1$")
+
+UNINSTALL_KEY = r"SOFTWARE\Microsoft\Windows\CurrentVersion\Uninstall"
+
+# Executables, relative to the install folder, in order of preference.
+EXECUTABLES = {
+    "linux": ("katana", "bin/katanaBin"),
+    "windows": ("bin/katanaBin.exe",),
+}
+
+# Folder of the render plugins bundled with Katana.
+PLUGIN_FOLDER = os.path.join("plugins", "Resources")
+
+LOGGER = logging.getLogger(__name__)
+
+
+class KatanaInstall(object):
+    """One installed Katana version."""
+
+    __slots__ = ("version", "exe_path", "root", "plugins")
+
+    def __init__(self, version, exe_path, root, plugins=()):
+        self.version = version
+        self.exe_path = exe_path
+        self.root = root
+        self.plugins = list(plugins)
+
+    def to_dict(self):
+        """Get the install as a json serializable dict."""
+        return {"version": self.version, "exe_path": self.exe_path,
+                "root": self.root, "plugins": self.plugins}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build an install from ``to_dict`` output."""
+        return cls(data["version"], data["exe_path"], data["root"],
+                   data.get("plugins", ()))
+
+
+def install_roots(local_os):
+    """Get the configured folders that hold Katana installs."""
+    roots = list(INSTALL_ROOTS.get(local_os, ()))
+    extra = os.environ.get(INSTALL_ROOTS_ENV)
+    if extra:
+        roots.extend(path for path in extra.split(os.pathsep) if path)
+    return roots
+
+
+def environment():
+    """Get the environment variables the index depends on."""
+    return {name: os.environ.get(name, "")
+            for name in (INSTALL_ROOTS_ENV, "KATANA_ROOT")}
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def probe_install(install_dir, local_os, version=None):
+    """Get the install in a folder, or None if it holds no Katana.
+
+    Args:
+        install_dir (str): Install folder, e.g. ``/opt/Foundry/Katana3.2v1``.
+        local_os (str): "linux" or "windows".
+        version (str, optional): Version, read from the folder name if not
+            given.
+
+    """
+    if version is None:
+        match = INSTALL_NAME.match(os.path.basename(
+            os.path.normpath(install_dir)))
+        if not match:
+            return None
+        version = match.group(1)
+    for name in EXECUTABLES[local_os]:
+        exe_path = os.path.join(install_dir, name)
+        if os.path.isfile(exe_path):
+            break
+    else:
+        return None
+    try:
+        plugins = sorted(os.listdir(os.path.join(install_dir, PLUGIN_FOLDER)))
+    except OSError:
+        plugins = []
+    return KatanaInstall(version, os.path.normpath(exe_path),
+                         os.path.normpath(install_dir), plugins)
+
+
+def probe_katana_root(katana_root, local_os):
+    """Get the install ``KATANA_ROOT`` points to, logging why it is skipped.
+
+    The version is read from the name of the folder or, for a link such as
+    ``/opt/katana``, of the folder it leads to.
+
+    """
+    for folder in (katana_root, os.path.realpath(katana_root)):
+        match = INSTALL_NAME.match(os.path.basename(os.path.normpath(folder)))
+        if match:
+            break
+    else:
+        LOGGER.warning("KATANA_ROOT %s is skipped: its folder name does not "
+                       "give the Katana version, e.g. Katana3.2v1",
+                       katana_root)
+        return None
+    install = probe_install(katana_root, local_os, match.group(1))
+    if install is None:
+        LOGGER.warning("KATANA_ROOT %s is skipped: it holds no %s",
+                       katana_root, " or ".join(EXECUTABLES[local_os]))
+    return install
+
+
+def registry_installs():
+    """Get the ``(version, install folder)`` of the registry entries."""
+    try:
+        import _winreg as winreg
+    except ImportError:
+        try:
+            import winreg
+        except ImportError:
+            return []
+    installs = []
+    try:
+        handle = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, UNINSTALL_KEY, 0,
+                                winreg.KEY_WOW64_64KEY + winreg.KEY_READ)
+    except OSError:
+        return installs
+    index = 0
+    while True:
+        try:
+            name = winreg.EnumKey(handle, index)
+        except OSError:
+            break
+        index += 1
+        match = REGISTRY_NAME.match(name)
+        if not match:
+            continue
+        try:
+            key = winreg.OpenKey(handle, name)
+            location, _ = winreg.QueryValueEx(key, "InstallLocation")
+        except OSError:
+            continue
+        installs.append((match.group(1), location))
+    return installs
+
+
+def registry_digest():
+    """Get a digest of the Katana entries of the registry."""
+    digest = hashlib.md5()
+    for version, location in sorted(registry_installs()):
+        digest.update(u"{}={}\n".format(version, location).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def scan(local_os, roots=None):
+    """Find the Katana installs of this machine.
+
+    Returns:
+        dict: ``KatanaInstall`` by version; the first found wins.
+
+    """
+    installs = {}
+
+    def add(install):
+        if install is not None and install.version not in installs:
+            installs[install.version] = install
+
+    katana_root = os.environ.get("KATANA_ROOT")
+    if katana_root:
+        add(probe_katana_root(katana_root, local_os))
+    if local_os == "windows":
+        for version, location in registry_installs():
+            add(probe_install(location, local_os, version))
+    for root in install_roots(local_os) if roots is None else roots:
+        try:
+            names = sorted(os.listdir(root))
+        except OSError:
+            continue
+        for name in names:
+            if INSTALL_NAME.match(name):
+                add(probe_install(os.path.join(root, name), local_os))
+    return installs
+
+
+class InstallIndex(object):
+    """Persistent index of the installed Katana versions."""
+
+    def __init__(self, index_path, local_os, roots=None):
+        """Initialize the index.
+
+        Args:
+            index_path (str): Json file the index is kept in.
+            local_os (str): "linux" or "windows".
+            roots (list, optional): Install roots, by default the configured
+                ones.
+
+        """
+        self.index_path = index_path
+        self.local_os = local_os
+        self.roots = roots
+        self.installs = {}
+        self.fingerprint = None
+        self.checked = 0
+        self._lock = threading.Lock()
+
+    def current_fingerprint(self):
+        """Get the root mtimes, environment and registry of the index."""
+        roots = install_roots(self.local_os) if self.roots is None \
+            else self.roots
+        return {"roots": {root: _mtime(root) for root in roots},
+                "env": environment(),
+                "registry": registry_digest()
+                            if self.local_os == "windows" else None}
+
+    def _load(self):
+        try:
+            with open(self.index_path) as index_file:
+                return json.load(index_file)
+        except (IOError, OSError, ValueError):
+            return None
+
+    def _save_as(self, fingerprint):
+        """Save the index; it is only a cache, so failures are ignored."""
+        data = {"fingerprint": fingerprint,
+                "installs": {version: install.to_dict()
+                             for version, install in self.installs.items()}}
+        tmp_path = "{}.{}.tmp".format(self.index_path, os.getpid())
+        try:
+            folder = os.path.dirname(self.index_path)
+            if folder and not os.path.isdir(folder):
+                os.makedirs(folder)
+            with open(tmp_path, "w") as index_file:
+                json.dump(data, index_file, indent=4)
+            if os.name == "nt" and os.path.exists(self.index_path):
+                os.remove(self.index_path)
+            os.rename(tmp_path, self.index_path)
+        except (IOError, OSError):
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def refresh(self, force=False):
+        """Make sure the index matches the machine.
+
+        The saved index is reused unless a root or the environment changed;
+        ``force`` rescans anyway.
+
+        """
+        with self._lock:
+            fingerprint = self.current_fingerprint()
+            if not force and fingerprint == self.fingerprint:
+                self.checked = time.time()
+                return
+            data = None if force else self._load()
+            if data and data.get("fingerprint") == fingerprint:
+                self.installs = {
+                    version: KatanaInstall.from_dict(install)
+                    for version, install in data["installs"].items()}
+            else:
+                self.installs = scan(self.local_os, self.roots)
+                self._save_as(fingerprint)
+            self.fingerprint = fingerprint
+            self.checked = time.time()
+
+    def lookup(self, version):
+        """Get the install of a Katana version, or None.
+
+        An install whose executable is gone rescans the machine.
+
+        """
+        if time.time() - self.checked > INSTALL_INDEX_CHECK_INTERVAL:
+            self.refresh()
+        install = self.installs.get(version)
+        if install is not None and not os.path.isfile(install.exe_path):
+            LOGGER.info("%s is gone, rescanning the Katana installs",
+                        install.exe_path)
+            self.refresh(force=True)
+            install = self.installs.get(version)
+        return install
+
+    def versions(self):
+        """Get the installed versions, sorted."""
+        return sorted(self.installs)
+
+    def near_misses(self, version, count=3):
+        """Get the installed versions closest to a missing one."""
+        same_release = [item for item in self.versions()
+                        if item.split("v")[0] == version.split("v")[0]]
+        return same_release or difflib.get_close_matches(
+            version, self.versions(), count, 0.5)
+
+    def missing_message(self, version):
+        """Get an actionable message for a version that is not installed."""
+        message = "Katana {} has not been found.".format(version)
+        near = self.near_misses(version)
+        if near:
+            message += " Installed close versions: {}.".format(
+                ", ".join(near))
+        elif self.installs:
+            message += " Installed versions: {}.".format(
+                ", ".join(self.versions()))
+        return message + (" Install it, add its parent folder to {} or set "
+                          "custom_exe_path.".format(INSTALL_ROOTS_ENV))
+
+
+_INDEXES = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def get_index(index_path, local_os):
+    """Get the install index shared by the analyses of this process."""
+    key = (index_path, local_os)
+    with _INDEXES_LOCK:
+        index = _INDEXES.get(key)
+        if index is None:
+            index = _INDEXES[key] = InstallIndex(index_path, local_os)
+    return index
@@ -0,0 +1,93 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+"""Events of an analysis, streamed while Katana is still running.
+
+The Katana script prints one line per event to its stdout, among the usual
+Katana output::
+
+    @@rayvision-event {"event": "rendernode", "name": "Render", "info": {...}}
+    @@rayvision-event {"event": "asset", "category": "texture", "record": {...}}
+    @@rayvision-event {"event": "warning", "message": "..."}
+
+``AnalyzeKatana`` picks these lines out of the output and passes the events
+to its event hooks, so uploads can be hashed and queued before the slowest
+node is analysed. The events mirror what the script writes to task.json and
+asset.json, which stay the result of the analysis.
+
+This module runs inside Katana as well, so it only uses the standard library
+and stays compatible with Katana's Python 2.
+
+"""
+import json
+import sys
+import time
+
+EVENT_PREFIX = "@@rayvision-event "
+RENDERNODE = "rendernode"
+ASSET = "asset"
+WARNING = "warning"
+# Seconds between two flushes of a stream of asset events.
+FLUSH_INTERVAL = 0.05
+
+
+def format_event(kind, data):
+    """Get the output line of an event, without the newline."""
+    event = dict(data)
+    event["event"] = kind
+    return EVENT_PREFIX + json.dumps(event)
+
+
+def parse_event(line):
+    """Get the event of an output line.
+
+    Args:
+        line (str or bytes): Line of the Katana output.
+
+    Returns:
+        dict: The event, with its kind under ``event``, or None if the line
+            is not an event.
+
+    """
+    if isinstance(line, bytes):
+        line = line.decode("utf-8", "replace")
+    line = line.strip()
+    if not line.startswith(EVENT_PREFIX):
+        return None
+    try:
+        event = json.loads(line[len(EVENT_PREFIX):])
+    except ValueError:
+        return None
+    if not isinstance(event, dict) or "event" not in event:
+        return None
+    return event
+
+
+class EventEmitter(object):
+    """``ResultWriter`` hook printing the events to a stream.
+
+    Asset events are flushed at most every ``interval`` seconds, the others
+    right away, so a scene with many assets does not pay a flush per asset.
+
+    """
+
+    def __init__(self, stream=None, interval=FLUSH_INTERVAL):
+        """Initialize the emitter.
+
+        Args:
+            stream (file, optional): Stream of the events, stdout by default.
+            interval (float): Seconds between two flushes of asset events.
+
+        """
+        self.stream = stream or sys.stdout
+        self.interval = interval
+        self._flushed = time.time()
+
+    def __call__(self, kind, data):
+        self.stream.write(format_event(kind, data) + "\n")
+        if kind != ASSET or time.time() - self._flushed >= self.interval:
+            self.flush()
+
+    def flush(self):
+        """Flush the pending events."""
+        self.stream.flush()
+        self._flushed = time.time()
@@ -0,0 +1,291 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+"""Compile filter.txt into asset rules indexed by node type.
+
+filter.txt groups rules in ``#category:`` sections, optionally split by a
+``#renderer`` comment, one rule per line::
+
+    {ArnoldShadingNode} : {parameters.filename.value}   &&  {nodeType}=={image}
+
+A rule reads the parameter of every node of the type, and only applies when
+all of its ``&&`` conditions hold. The forms the compiled script understood
+are still read: ``#procy`` is the ``proxy`` category and
+``{PrmanShadingNode} : {PrmanShadingNode}`` the file of a ``PxrTexture``. The compiled ``RuleTable`` answers "which
+rules apply to this node type" with one dict lookup, so the node graph is
+walked once however many rules there are.
+
+``NamePatterns`` selects render nodes or ``#category`` sections by name with
+include and exclude glob patterns, so an analysis can be limited to the
+render nodes being submitted and the categories it needs.
+
+This module runs inside Katana as well, so it only uses the standard library
+and stays compatible with Katana's Python 2.
+
+"""
+import codecs
+import fnmatch
+import os
+import re
+
+try:
+    string_types = basestring
+except NameError:
+    string_types = str  # pylint: disable=invalid-name
+
+FILTER_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           "filter.txt")
+
+RULE_RE = re.compile(r"^\{(?P<node_type>[^}]+)\}\s*:\s*"
+                     r"\{(?P<parameter>[^}]+)\}(?P<conditions>.*)$")
+CONDITION_RE = re.compile(r"&&\s*\{(?P<parameter>[^}]+)\}\s*==\s*"
+                          r"\{(?P<value>[^}]*)\}")
+
+# Category names of earlier filter files.
+LEGACY_CATEGORIES = {"procy": "proxy"}
+
+# Rules of earlier filter files handled by code of the compiled script, by
+# (node type, parameter): the parameter and conditions they stand for.
+LEGACY_RULES = {
+    ("PrmanShadingNode", "PrmanShadingNode"): (
+        "parameters.filename.value", (("nodeType", "PxrTexture"),)),
+}
+
+
+class FilterRuleError(ValueError):
+    """A line of the filter file cannot be parsed."""
+
+
+class NamePatterns(object):
+    """Include and exclude glob patterns of names, e.g. ``"Render_*"``."""
+
+    __slots__ = ("include", "exclude")
+
+    def __init__(self, include=None, exclude=None):
+        """Initialize the patterns.
+
+        Args:
+            include (str or list, optional): Patterns of the names kept, all
+                names by default.
+            exclude (str or list, optional): Patterns of the names dropped,
+                even if they are included.
+
+        """
+        self.include = None if include is None else _pattern_list(include)
+        self.exclude = _pattern_list(exclude or [])
+
+    @classmethod
+    def from_dict(cls, data):
+        """Read the patterns of ``to_dict``, None selects everything."""
+        data = data or {}
+        return cls(data.get("include"), data.get("exclude"))
+
+    def to_dict(self):
+        """Get the patterns as a json serializable dict."""
+        return {"include": self.include, "exclude": self.exclude}
+
+    def __bool__(self):
+        return self.include is not None or bool(self.exclude)
+
+    __nonzero__ = __bool__
+
+    def __repr__(self):
+        return "NamePatterns(%r, %r)" % (self.include, self.exclude)
+
+    def matches(self, name):
+        """Check whether a name is selected."""
+        if self.include is not None and not any(
+                fnmatch.fnmatchcase(name, pattern)
+                for pattern in self.include):
+            return False
+        return not any(fnmatch.fnmatchcase(name, pattern)
+                       for pattern in self.exclude)
+
+    def select(self, nodes):
+        """Get the nodes whose names are selected, in order."""
+        return [node for node in nodes if self.matches(node.getName())]
+
+
+def _pattern_list(patterns):
+    if isinstance(patterns, string_types):
+        return [patterns]
+    return list(patterns)
+
+
+class Rule(object):
+    """One node type -> parameter rule of the filter file."""
+
+    __slots__ = ("category", "renderer", "node_type", "parameter",
+                 "conditions")
+
+    def __init__(self, category, renderer, node_type, parameter,
+                 conditions=()):
+        self.category = category
+        self.renderer = renderer
+        self.node_type = node_type
+        self.parameter = parameter
+        self.conditions = tuple(conditions)
+
+    def __repr__(self):
+        return "Rule(%r, %r, %r, %r)" % (self.category, self.node_type,
+                                         self.parameter, self.conditions)
+
+    def applies(self, node):
+        """Check the conditions of the rule on a node."""
+        for parameter, expected in self.conditions:
+            if not value_matches(get_value(node, parameter), expected):
+                return False
+        return True
+
+
+def value_matches(value, expected):
+    """Compare a parameter value with the text of a condition."""
+    if value is None:
+        return False
+    if value == expected:
+        return True
+    try:
+        return float(value) == float(expected)
+    except (TypeError, ValueError):
+        return False
+
+
+def get_value(node, parameter):
+    """Get the value of a node parameter at frame 0, or None."""
+    param = node.getParameter(parameter)
+    if param is None:
+        return None
+    return param.getValue(0)
+
+
+def parse_rules(lines):
+    """Parse the lines of a filter file.
+
+    Args:
+        lines (iterable): Lines of the filter file.
+
+    Returns:
+        list of Rule: Rules in file order.
+
+    Raises:
+        FilterRuleError: A rule line is malformed.
+
+    """
+    rules = []
+    category = None
+    renderer = None
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("#"):
+            name = line.lstrip("#").strip()
+            if name.endswith(":"):
+                category = name[:-1].strip()
+                category = LEGACY_CATEGORIES.get(category, category)
+                renderer = None
+            else:
+                renderer = name
+            continue
+        match = RULE_RE.match(line)
+        if not match:
+            raise FilterRuleError("line %s: cannot parse %r" % (number, line))
+        conditions = match.group("conditions").strip()
+        parsed = [(item.group("parameter").strip(), item.group("value"))
+                  for item in CONDITION_RE.finditer(conditions)]
+        if CONDITION_RE.sub("", conditions).strip():
+            raise FilterRuleError("line %s: bad condition %r"
+                                  % (number, conditions))
+        node_type = match.group("node_type").strip()
+        parameter = match.group("parameter").strip()
+        if not parsed and (node_type, parameter) in LEGACY_RULES:
+            parameter, parsed = LEGACY_RULES[(node_type, parameter)]
+        rules.append(Rule(category, renderer, node_type, parameter,
+                          parsed))
+    return rules
+
+
+class RuleTable(object):
+    """Rules of a filter file indexed by node type."""
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+        self._by_type = {}
+        for rule in self.rules:
+            self._by_type.setdefault(rule.node_type, []).append(rule)
+
+    @property
+    def node_types(self):
+        """set: Node types at least one rule applies to."""
+        return set(self._by_type)
+
+    @property
+    def categories(self):
+        """list: Categories in file order."""
+        categories = []
+        for rule in self.rules:
+            if rule.category not in categories:
+                categories.append(rule.category)
+        return categories
+
+    def select(self, categories):
+        """Get the table of the rules of the selected categories.
+
+        Args:
+            categories (NamePatterns): Patterns of the ``#category`` names.
+
+        Returns:
+            RuleTable
+
+        """
+        if not categories:
+            return self
+        return RuleTable(rule for rule in self.rules
+                         if categories.matches(rule.category))
+
+    def rules_for(self, node_type):
+        """Get the rules of a node type."""
+        return self._by_type.get(node_type, ())
+
+    def match(self, node):
+        """Apply every rule of the node's type to one node.
+
+        Yields:
+            tuple: ``(rule, value)`` for every rule whose conditions hold and
+                whose parameter has a value.
+
+        """
+        for rule in self._by_type.get(node.getType(), ()):
+            if not rule.applies(node):
+                continue
+            value = get_value(node, rule.parameter)
+            if value:
+                yield rule, value
+
+    def collect(self, nodes):
+        """Walk nodes once and yield the assets found by the rules.
+
+        Args:
+            nodes (iterable): Katana nodes, or objects with ``getName``,
+                ``getType`` and ``getParameter``.
+
+        Yields:
+            tuple: ``(category, record)`` where record is a dict with the
+                ``node``, ``type``, ``parameter`` and ``path`` of the asset.
+
+        """
+        for node in nodes:
+            if node.getType() not in self._by_type:
+                continue
+            for rule, value in self.match(node):
+                yield rule.category, {
+                    "node": node.getName(),
+                    "type": rule.node_type,
+                    "parameter": rule.parameter,
+                    "path": value,
+                }
+
+
+def compile_rules(filter_file=FILTER_FILE):
+    """Compile a filter file into a ``RuleTable``."""
+    with codecs.open(filter_file, "r", "utf-8") as rules_file:
+        return RuleTable(parse_rules(rules_file))
@@ -0,0 +1,286 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+"""Frame sets of render nodes and the frame chunks of farm jobs.
+
+A ``FrameSet`` stores its frames as ``(start, end, step)`` progressions,
+never as a list, so a million-frame sequence costs three integers. It reads
+and writes the format of the ``frames`` of task.json::
+
+    "1-100[1]"            frames 1 to 100
+    "1-100[5]"            every 5th frame from 1
+    "1-10[1],20-30[2]"    several ranges
+    "1-10,15,20-30x2[1]"  a Katana TimeRange with the analysis suffix
+
+This module only uses the standard library and stays compatible with
+Katana's Python 2, so the Katana script can use it as well.
+
+"""
+import heapq
+import re
+
+try:
+    xrange
+except NameError:
+    xrange = range  # pylint: disable=invalid-name,redefined-builtin
+
+ITEM = re.compile(r"^\s*(-?\d+)(?:\s*-\s*(-?\d+))?"
+                  r"(?:\s*x\s*(\d+))?(?:\s*\[\s*(\d+)\s*\])?\s*$")
+
+
+def _gcd(first, second):
+    while second:
+        first, second = second, first % second
+    return abs(first)
+
+
+def _intersect(first, second):
+    """Get the progression common to two progressions, or None."""
+    start1, end1, step1 = first
+    start2, end2, step2 = second
+    low = max(start1, start2)
+    high = min(end1, end2)
+    if low > high:
+        return None
+    gcd = _gcd(step1, step2)
+    if (start2 - start1) % gcd:
+        return None
+    lcm = step1 // gcd * step2
+    # Walk the lattice of the larger step to find the first common frame.
+    if step1 < step2:
+        start1, step1, start2, step2 = start2, step2, start1, step1
+    frame = start1 + max(0, -(-(low - start1) // step1)) * step1
+    for _ in range(step2 // gcd):
+        if (frame - start2) % step2 == 0:
+            break
+        frame += step1
+    if frame > high:
+        return None
+    return frame, frame + (high - frame) // lcm * lcm, lcm
+
+
+class FrameSet(object):
+    """Immutable, sorted set of frames stored as progressions."""
+
+    __slots__ = ("_ranges",)
+
+    def __init__(self, ranges=()):
+        """Initialize the set.
+
+        Args:
+            ranges (iterable): ``(start, end, step)`` progressions; ``end``
+                is inclusive.
+
+        Raises:
+            ValueError: A step is not positive.
+
+        """
+        self._ranges = self._normalize(ranges)
+
+    @staticmethod
+    def _normalize(ranges):
+        items = []
+        for start, end, step in ranges:
+            start, end, step = int(start), int(end), int(step)
+            if step < 1:
+                raise ValueError("frame step must be positive: %s" % step)
+            if end < start:
+                continue
+            end -= (end - start) % step
+            if start == end:
+                step = 1
+            items.append((start, end, step))
+        items.sort()
+        merged = []
+        for start, end, step in items:
+            if merged:
+                last_start, last_end, last_step = merged[-1]
+                if last_start == last_end and start == end == last_end:
+                    continue
+                if start == end and last_start <= start <= last_end \
+                        and (start - last_start) % last_step == 0:
+                    continue
+                if last_start == last_end and start - last_end == step:
+                    merged[-1] = (last_start, end, step)
+                    continue
+                if start == end and start - last_end == last_step:
+                    merged[-1] = (last_start, end, last_step)
+                    continue
+                if step == last_step and start <= last_end + step \
+                        and (start - last_start) % step == 0:
+                    merged[-1] = (last_start, max(end, last_end), step)
+                    continue
+            merged.append((start, end, step))
+        return tuple(merged)
+
+    @classmethod
+    def from_range(cls, start, end, step=1):
+        """Get the frames from ``start`` to ``end`` included."""
+        return cls([(start, end, step)])
+
+    @classmethod
+    def parse(cls, text):
+        """Read a frames string of task.json or a Katana TimeRange.
+
+        Raises:
+            ValueError: The string is not a frame set.
+
+        """
+        items = [item for item in str(text).split(",") if item.strip()]
+        ranges = []
+        for item in items:
+            match = ITEM.match(item)
+            if not match:
+                raise ValueError("invalid frames: %r" % text)
+            start, end, by, step = match.groups()
+            end = start if end is None else end
+            ranges.append((int(start), int(end), int(by or step or 1)))
+        return cls(ranges)
+
+    @property
+    def ranges(self):
+        """tuple: The ``(start, end, step)`` progressions."""
+        return self._ranges
+
+    def _disjoint(self):
+        """Check that no progression starts before the previous ends."""
+        ranges = self._ranges
+        return all(ranges[index][0] > ranges[index - 1][1]
+                   for index in range(1, len(ranges)))
+
+    def __iter__(self):
+        if self._disjoint():
+            for start, end, step in self._ranges:
+                for frame in xrange(start, end + 1, step):
+                    yield frame
+            return
+        last = None
+        for frame in heapq.merge(*[xrange(start, end + 1, step)
+                                   for start, end, step in self._ranges]):
+            if frame != last:
+                yield frame
+                last = frame
+
+    def __len__(self):
+        if self._disjoint():
+            return sum((end - start) // step + 1
+                       for start, end, step in self._ranges)
+        return sum(1 for _ in self)
+
+    def __contains__(self, frame):
+        return any(start <= frame <= end and (frame - start) % step == 0
+                   for start, end, step in self._ranges)
+
+    def __bool__(self):
+        return bool(self._ranges)
+
+    __nonzero__ = __bool__
+
+    def __eq__(self, other):
+        if not isinstance(other, FrameSet):
+            return NotImplemented
+        if self._ranges == other.ranges:
+            return True
+        return len(self) == len(other) and list(self) == list(other)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __hash__(self):
+        return hash((self.first, self.last))
+
+    def union(self, other):
+        """Get the frames in either set."""
+        return FrameSet(self._ranges + other.ranges)
+
+    __or__ = union
+
+    def intersection(self, other):
+        """Get the frames in both sets, computed on the progressions."""
+        common = []
+        for first in self._ranges:
+            for second in other.ranges:
+                if second[0] > first[1]:
+                    break
+                result = _intersect(first, second)
+                if result is not None:
+                    common.append(result)
+        return FrameSet(common)
+
+    __and__ = intersection
+
+    @property
+    def first(self):
+        """int: The first frame, or None."""
+        return self._ranges[0][0] if self._ranges else None
+
+    @property
+    def last(self):
+        """int: The last frame, or None."""
+        return max(end for _, end, _ in self._ranges) if self._ranges \
+            else None
+
+    def chunks(self, size):
+        """Split the frames into consecutive sets of ``size`` frames.
+
+        Progressions are cut arithmetically; only overlapping progressions
+        with different steps are walked frame by frame.
+
+        Args:
+            size (int): Frames per chunk, the last one may have fewer.
+
+        Yields:
+            FrameSet
+
+        """
+        if size < 1:
+            raise ValueError("chunk size must be positive: %s" % size)
+        if not self._disjoint():
+            pending = []
+            for frame in self:
+                pending.append((frame, frame, 1))
+                if len(pending) == size:
+                    yield FrameSet(pending)
+                    pending = []
+            if pending:
+                yield FrameSet(pending)
+            return
+        pending = []
+        room = size
+        for start, end, step in self._ranges:
+            while start <= end:
+                count = min(room, (end - start) // step + 1)
+                stop = start + (count - 1) * step
+                pending.append((start, stop, step))
+                room -= count
+                start = stop + step
+                if not room:
+                    yield FrameSet(pending)
+                    pending = []
+                    room = size
+        if pending:
+            yield FrameSet(pending)
+
+    def __str__(self):
+        return ",".join("%s-%s[%s]" % item for item in self._ranges)
+
+    def __repr__(self):
+        return "FrameSet(%r)" % str(self)
+
+
+def plan_chunks(rendernodes, chunk_size):
+    """Split the frames of every render node into farm job chunks.
+
+    Args:
+        rendernodes (dict): ``scene_info.rendernodes`` of task.json.
+        chunk_size (int): Frames per job.
+
+    Yields:
+        dict: ``rendernode``, ``chunk`` index and ``frames`` string of every
+            job, in render node order.
+
+    """
+    for name in sorted(rendernodes):
+        frames = FrameSet.parse(rendernodes[name]["frames"])
+        for index, chunk in enumerate(frames.chunks(chunk_size)):
+            yield {"rendernode": name, "chunk": index, "frames": str(chunk)}
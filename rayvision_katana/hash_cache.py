@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""Persistent content-hash cache shared by analyser processes.
+
+Digests are stored in a small SQLite database keyed by the file path and
+validated against the ``(size, mtime, inode)`` fingerprint of the file, so
+an unchanged file costs a single ``os.stat`` call instead of a full read.
+
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+from rayvision_katana.constants import HASH_CACHE_MAX_ENTRIES
+from rayvision_katana.hashing import hash_file
+
+# Hits refresh their LRU timestamp at most this often (seconds), which keeps
+# cache hits from turning into a write per lookup.
+TOUCH_INTERVAL = 60
+
+# Eviction runs after this many inserts rather than after every one.
+EVICT_EVERY = 100
+
+
+def compute_md5(file_path):
+    """Read the whole file and return its md5 hex digest."""
+    return hash_file(file_path, "md5")
+
+
+def stat_fingerprint(file_stat):
+    """Get the ``(size, mtime, inode)`` fingerprint of a stat result."""
+    mtime = getattr(file_stat, "st_mtime_ns", None)
+    if mtime is None:
+        mtime = int(file_stat.st_mtime * 1000000000)
+    return file_stat.st_size, mtime, file_stat.st_ino
+
+
+class HashCache(object):
+    """On-disk LRU cache of file digests.
+
+    SQLite takes care of locking, so one cache file can be shared by
+    concurrent analyser processes; a lock serialises threads of one process.
+
+    """
+
+    def __init__(self, db_path, max_entries=HASH_CACHE_MAX_ENTRIES,
+                 timeout=30):
+        """Initialize the cache.
+
+        Args:
+            db_path (str): Path of the SQLite database file.
+            max_entries (int): Number of digests kept before the least
+                recently used ones are evicted.
+            timeout (int): Seconds to wait on a database locked by another
+                process.
+
+        """
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._conn = None
+        self._inserts = 0
+
+    def _connect(self):
+        if self._conn is None:
+            folder = os.path.dirname(self.db_path)
+            if folder and not os.path.exists(folder):
+                os.makedirs(folder)
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout,
+                                   isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute("CREATE TABLE IF NOT EXISTS file_hash ("
+                         "path TEXT NOT NULL, "
+                         "algorithm TEXT NOT NULL, "
+                         "size INTEGER, "
+                         "mtime INTEGER, "
+                         "inode INTEGER, "
+                         "digest TEXT, "
+                         "accessed REAL, "
+                         "PRIMARY KEY (path, algorithm))")
+            conn.execute("CREATE INDEX IF NOT EXISTS file_hash_accessed "
+                         "ON file_hash (accessed)")
+            self._conn = conn
+        return self._conn
+
+    def get_digest(self, file_path, compute=compute_md5, algorithm="md5"):
+        """Get the digest of a file, computing it only when it changed.
+
+        Args:
+            file_path (str): File to hash.
+            compute (callable): Called with ``file_path`` on a cache miss and
+                returns the digest.
+            algorithm (str): Name the digest is stored under.
+
+        Returns:
+            str: The digest, or None if the file cannot be stat'ed.
+
+        """
+        try:
+            fingerprint = stat_fingerprint(os.stat(file_path))
+        except OSError:
+            return None
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT size, mtime, inode, digest, accessed FROM file_hash "
+                "WHERE path = ? AND algorithm = ?",
+                (file_path, algorithm)).fetchone()
+            if row and tuple(row[:3]) == fingerprint:
+                if now - (row[4] or 0) > TOUCH_INTERVAL:
+                    conn.execute("UPDATE file_hash SET accessed = ? "
+                                 "WHERE path = ? AND algorithm = ?",
+                                 (now, file_path, algorithm))
+                return row[3]
+
+        digest = compute(file_path)
+        self.set_digest(file_path, fingerprint, digest, algorithm)
+        return digest
+
+    def set_digest(self, file_path, fingerprint, digest, algorithm="md5"):
+        """Store a digest computed for the given fingerprint."""
+        size, mtime, inode = fingerprint
+        with self._lock:
+            conn = self._connect()
+            conn.execute("INSERT OR REPLACE INTO file_hash VALUES "
+                         "(?, ?, ?, ?, ?, ?, ?)",
+                         (file_path, algorithm, size, mtime, inode, digest,
+                          time.time()))
+            self._inserts += 1
+            if self._inserts % EVICT_EVERY == 1:
+                self._evict(conn)
+
+    def _evict(self, conn):
+        conn.execute("DELETE FROM file_hash WHERE rowid IN ("
+                     "SELECT rowid FROM file_hash ORDER BY accessed DESC "
+                     "LIMIT -1 OFFSET ?)", (self.max_entries,))
+
+    def evict(self):
+        """Drop the least recently used entries above ``max_entries``."""
+        with self._lock:
+            self._evict(self._connect())
+
+    def clear(self):
+        """Remove every cached digest."""
+        with self._lock:
+            self._connect().execute("DELETE FROM file_hash")
+
+    def __len__(self):
+        with self._lock:
+            return self._connect().execute(
+                "SELECT COUNT(*) FROM file_hash").fetchone()[0]
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""Bulk hashing of the files of a scene.
+
+``hash_files`` hashes a whole asset list on a thread pool: hashlib releases
+the GIL while it digests large buffers, so several files are read and
+hashed at once. Files of ``MMAP_MIN_SIZE`` or more are memory-mapped and
+digested one large window at a time; smaller files, and files that cannot
+be mapped, are read into one reused buffer.
+
+Any ``hashlib`` algorithm can be used. md5 stays the default because the
+server compares md5 digests; blake2b is faster on 64-bit machines for the
+hashes only used locally.
+
+The sampled mode digests the size and three slices of a file, its head,
+middle and tail, instead of its whole content. It detects changes of very
+large caches quickly but is not a content hash: two files that differ
+outside the samples get the same fingerprint.
+
+"""
+
+import hashlib
+import mmap
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from rayvision_katana.constants import HASH_WORKERS
+
+# Read size of the files that are not memory-mapped.
+BUFFER_SIZE = 256 * 1024
+
+# Files from this size on are memory-mapped.
+MMAP_MIN_SIZE = 16 * 1024 * 1024
+
+# Bytes of a file mapped at once. Mapped pages count in the resident memory
+# of the process, so a file is mapped one window at a time.
+MMAP_WINDOW = 16 * 1024 * 1024
+
+# Bytes of every sample of the sampled mode.
+SAMPLE_SIZE = 1024 * 1024
+
+
+def _hash_mapped(digest, hashed, size):
+    """Digest a file window by window, False if it can't be mapped."""
+    offset = 0
+    while offset < size:
+        length = min(MMAP_WINDOW, size - offset)
+        try:
+            mapped = mmap.mmap(hashed.fileno(), length,
+                               access=mmap.ACCESS_READ, offset=offset)
+        except (ValueError, EnvironmentError):
+            if offset:
+                raise
+            return False
+        try:
+            view = memoryview(mapped)
+            try:
+                digest.update(view)
+            finally:
+                view.release()
+        finally:
+            mapped.close()
+        offset += length
+    return True
+
+
+def hash_file(file_path, algorithm="md5", buffer_size=BUFFER_SIZE):
+    """Get the hex digest of the whole content of a file.
+
+    Args:
+        file_path (str): File to hash.
+        algorithm (str): ``hashlib`` algorithm name.
+        buffer_size (int): Read size of the files that are not mapped.
+
+    """
+    digest = hashlib.new(algorithm)
+    with open(file_path, "rb") as hashed:
+        size = os.fstat(hashed.fileno()).st_size
+        if size >= MMAP_MIN_SIZE and _hash_mapped(digest, hashed, size):
+            return digest.hexdigest()
+        buffer = bytearray(min(buffer_size, size + 1))
+        view = memoryview(buffer)
+        while True:
+            count = hashed.readinto(buffer)
+            if not count:
+                break
+            digest.update(view[:count])
+    return digest.hexdigest()
+
+
+def sample_file(file_path, algorithm="md5", sample_size=SAMPLE_SIZE):
+    """Get the hex digest of the size, head, middle and tail of a file.
+
+    Files of up to three samples are hashed whole.
+
+    """
+    digest = hashlib.new(algorithm)
+    with open(file_path, "rb") as hashed:
+        size = os.fstat(hashed.fileno()).st_size
+        if size <= 3 * sample_size:
+            return hash_file(file_path, algorithm)
+        digest.update(str(size).encode("ascii"))
+        for offset in (0, (size - sample_size) // 2, size - sample_size):
+            hashed.seek(offset)
+            digest.update(hashed.read(sample_size))
+    return digest.hexdigest()
+
+
+def digest_name(algorithm="md5", sampled=False):
+    """Get the name the digests of a mode are stored under in a cache."""
+    return algorithm + "-sampled" if sampled else algorithm
+
+
+def hash_files(paths, algorithm="md5", workers=HASH_WORKERS, sampled=False,
+               cache=None):
+    """Hash many files concurrently.
+
+    Args:
+        paths (iterable): Files to hash; duplicates are hashed once.
+        algorithm (str): ``hashlib`` algorithm name, e.g. "md5" or
+            "blake2b".
+        workers (int): Files hashed at once.
+        sampled (bool): Digest the head, middle and tail of the files
+            instead of their whole content.
+        cache (HashCache, optional): Cache answering unchanged files, the
+            digests are stored under ``digest_name``.
+
+    Returns:
+        dict: Hex digest by path, None for files that cannot be read.
+
+    """
+    # Fail early on an unknown algorithm.
+    hashlib.new(algorithm)
+    paths = list(dict.fromkeys(paths))
+    compute = sample_file if sampled else hash_file
+    name = digest_name(algorithm, sampled)
+
+    def digest_one(file_path):
+        try:
+            if cache is not None:
+                return cache.get_digest(
+                    file_path, lambda path: compute(path, algorithm), name)
+            return compute(file_path, algorithm)
+        except EnvironmentError:
+            return None
+
+    if workers <= 1 or len(paths) < 2:
+        return dict((path, digest_one(path)) for path in paths)
+    with ThreadPoolExecutor(max_workers=min(workers, len(paths))) \
+            as executor:
+        return dict(zip(paths, executor.map(digest_one, paths)))
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""Manifests of the previous analysis of every scene.
+
+A manifest maps each uploaded file to its server path, size, mtime and
+content hash. Comparing the files of a new analysis with the manifest of the
+previous one gives the files that are new or changed: unchanged stat
+fingerprints reuse the stored hash, so only touched files are hashed again.
+
+"""
+
+import hashlib
+import json
+import os
+import time
+
+
+class SceneHistory(object):
+    """Folder of scene manifests, one json file per scene path."""
+
+    def __init__(self, root):
+        """Initialize the history.
+
+        Args:
+            root (str): Folder holding the manifests, created on first save.
+
+        """
+        self.root = root
+
+    def manifest_path(self, cg_file):
+        """Get the manifest file of a scene."""
+        key = os.path.normcase(os.path.abspath(cg_file)).replace("\\", "/")
+        name = hashlib.md5(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.root, name + ".json")
+
+    def load(self, cg_file):
+        """Get the manifest of the previous analysis of a scene, or None."""
+        try:
+            with open(self.manifest_path(cg_file)) as manifest_file:
+                return json.load(manifest_file)
+        except (IOError, OSError, ValueError):
+            return None
+
+    def save(self, cg_file, manifest):
+        """Replace the manifest of a scene."""
+        if not os.path.isdir(self.root):
+            try:
+                os.makedirs(self.root)
+            except OSError:
+                if not os.path.isdir(self.root):
+                    raise
+        path = self.manifest_path(cg_file)
+        tmp_path = "{}.{}.tmp".format(path, os.getpid())
+        with open(tmp_path, "w") as manifest_file:
+            json.dump(manifest, manifest_file)
+        if os.name == "nt" and os.path.exists(path):
+            os.remove(path)
+        os.rename(tmp_path, path)
+
+    def forget(self, cg_file):
+        """Drop the manifest of a scene, e.g. after a failed upload."""
+        try:
+            os.remove(self.manifest_path(cg_file))
+        except OSError:
+            pass
+
+
+def diff_files(entries, previous_files, hash_files):
+    """Compare the files of an analysis with the previous manifest.
+
+    Args:
+        entries (list): upload.json entries with ``local``, ``server``,
+            ``size`` and ``mtime``.
+        previous_files (dict): ``files`` of the previous manifest.
+        hash_files (callable): Gets the content hashes of a list of file
+            paths as a dict; only called with the files that changed.
+
+    Returns:
+        tuple: The ``files`` of the new manifest, the entries that are new
+            or changed, with their hash, and the sorted paths that are gone.
+
+    """
+    stale = [entry["local"] for entry in entries
+             if not _unchanged(previous_files.get(entry["local"]), entry)]
+    digests = hash_files(stale) if stale else {}
+    files = {}
+    changed = []
+    for entry in entries:
+        local = entry["local"]
+        old = previous_files.get(local)
+        if local in digests:
+            digest = digests[local]
+            if not old or old["hash"] != digest:
+                changed.append(dict(entry, hash=digest))
+        else:
+            digest = old["hash"]
+        files[local] = {"server": entry["server"], "size": entry["size"],
+                        "mtime": entry["mtime"], "hash": digest}
+    removed = sorted(set(previous_files) - set(files))
+    return files, changed, removed
+
+
+def _unchanged(old, entry):
+    return bool(old) and old["size"] == entry["size"] \
+        and old["mtime"] == entry["mtime"]
+
+
+def make_manifest(cg_file, files, previous=None, algorithm="md5"):
+    """Build the manifest stored for a scene.
+
+    Args:
+        cg_file (str): Scene path.
+        files (dict): ``files`` of the manifest, from ``diff_files``.
+        previous (dict, optional): Manifest of the previous upload.
+        algorithm (str): ``hashlib`` algorithm of the file hashes.
+
+    """
+    return {
+        "cg_file": cg_file,
+        "algorithm": algorithm,
+        "analysed_at": time.time(),
+        "previous_analysed_at": (previous or {}).get("analysed_at"),
+        "files": files,
+    }
@@ -8,6 +8,13 @@ import sys
 import NodegraphAPI
 from Katana import KatanaFile, FarmAPI, Nodes3DAPI
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from analyse_metrics import Metrics
+from events import EventEmitter
+from filter_rules import NamePatterns, compile_rules
+from node_graph import GLOBAL_TYPES, dependency_nodes
+from result_writer import ResultWriter
+
 '''
 katana cmd ::
 "C:\Program Files\Katana2.6v3\bin\katanaBin.exe" --script "E:\PycharmProjects\newPlatform\CG\Katana\script\katana_analyse_script.py"  "E:\fang\katana_prm\001_005_test.katana"  "E:\fang\katana_prm\taks_info\task.json"  "E:\fang\katana_prm\taks_info\system.json"
@@ -66,13 +73,26 @@ class ray_Katana_rendernodes(ray_Katana):
 
         pass
 
-    def kanana_rendernodes(self, task_json):
+    def kanana_rendernodes(self, task_json, writer=None, metrics=None,
+                           patterns=None):
+        """Stream the information of every Render node to the writer.
+
+        Without a writer the result is compacted into task.json right away.
+        With metrics, ``GetRenderNodeInfo`` is timed per render node. With
+        ``patterns``, the other render nodes are neither unlocked nor
+        evaluated.
 
+        """
+        metrics = metrics or Metrics(enabled=False)
+        own_writer = writer is None
+        if own_writer:
+            writer = ResultWriter(os.path.dirname(task_json))
         katana_scene = FarmAPI.GetKatanaFileName()
-        render_info_dict = {}
-        render_node_info_dict = {}
         render_nodes = NodegraphAPI.GetAllNodesByType("Render")
+        if patterns:
+            render_nodes = patterns.select(render_nodes)
         if len(render_nodes) != 0:
+            writer.start_rendernodes()
             for render_node in render_nodes:
                 render_output_dict = {}
                 render_frame_dict = {}
@@ -85,9 +105,10 @@ class ray_Katana_rendernodes(ray_Katana):
                 try:
                     render_node.getParameter("lock").setValue(0, 0)
                     # render_node_info=Nodes3DAPI.RenderNodeUtil.GetRenderNodeInfo(render_node,graphState)
-                    render_node_info = Nodes3DAPI.RenderNodeUtil.GetRenderNodeInfo(render_node)
+                    with metrics.phase("rendernode:%s" % render_name):
+                        render_node_info = Nodes3DAPI.RenderNodeUtil.GetRenderNodeInfo(render_node)
 
-                    for i in xrange(render_node_info.getNumberOfOutputs()):
+                    for i in range(render_node_info.getNumberOfOutputs()):
                         outputInfo = render_node_info.getOutputInfoByIndex(i, forceLocal=False)
 
                         render_output_name = outputInfo['name']
@@ -104,34 +125,69 @@ class ray_Katana_rendernodes(ray_Katana):
 
                     render_frame_dict["start"] = render_start
                     render_frame_dict["end"] = render_end
-                    render_info_dict[render_name] = {}
-                    render_info_dict[render_name]["aov"] = {}
-                    render_info_dict[render_name]["aov"] = render_output_dict
+                    render_info = {}
+                    render_info["aov"] = render_output_dict
                     try:
                         render_TimeRange = render_node.getParameter('farmSettings.TimeRange').getValue(0)
-                        render_info_dict[render_name]["frames"] = "%s[%s]" % (render_TimeRange, 1)
+                        render_info["frames"] = "%s[%s]" % (render_TimeRange, 1)
                     except:
-                        render_info_dict[render_name]["frames"] = "%s-%s[%s]" % (int(render_start), int(render_end), 1)
-                    render_info_dict[render_name]["denoise"] = "0"
-                    render_info_dict[render_name]["renderable"] = "1"
+                        render_info["frames"] = "%s-%s[%s]" % (int(render_start), int(render_end), 1)
+                    render_info["denoise"] = "0"
+                    render_info["renderable"] = "1"
+                    writer.add_rendernode(render_name, render_info)
+                    metrics.count("rendernodes")
+                    metrics.count("outputs", len(render_output_dict))
 
                 except Exception as err:
                     print (err)
                     print ("the bad render node name is   %s" % render_name)
-                    pass
+                    writer.warn("render node %s failed: %s"
+                                % (render_name, err))
 
-            render_node_info_dict["rendernodes"] = render_info_dict
-            self.write_json_info(task_json, "scene_info", render_node_info_dict)
+        if own_writer:
+            writer.compact()
 
 
 class ray_Katana_asset(ray_Katana):
-    # TODO get asset list from katana_scene
-    def __init__(self):
+    def __init__(self, task_json=None, filter_file=None, categories=None):
+        self.asset_json = None
         if task_json:
-            asset_json = os.path.join(os.path.dirname(task_json), "asset.json")
-            self.write_json_info(asset_json, "", {"aseet": {}})
-            print (asset_json)
-        pass
+            self.asset_json = os.path.join(os.path.dirname(task_json), "asset.json")
+            print (self.asset_json)
+        if filter_file:
+            self.rule_table = compile_rules(filter_file)
+        else:
+            self.rule_table = compile_rules()
+        if categories:
+            self.rule_table = self.rule_table.select(categories)
+
+    def collect_assets(self, nodes=None, writer=None, owners=None):
+        """Walk the node graph once and apply every filter.txt rule.
+
+        Records are streamed to the writer as they are found; without a
+        writer they are compacted into asset.json right away. With
+        ``owners``, every record gets the ``render_nodes`` using its node.
+
+        Returns:
+            int: Number of asset records found.
+
+        """
+        own_writer = writer is None
+        if own_writer:
+            writer = ResultWriter(os.path.dirname(self.asset_json))
+        if nodes is None:
+            nodes = NodegraphAPI.GetAllNodes()
+        writer.declare_categories(self.rule_table.categories)
+        count = 0
+        for category, record in self.rule_table.collect(nodes):
+            if owners is not None:
+                record["render_nodes"] = owners.get(record["node"], [])
+            print ("%s %s: %s" % (category, record["node"], record["path"]))
+            writer.add_asset(category, record)
+            count += 1
+        if own_writer:
+            writer.compact()
+        return count
 
     def get_Alembic_In(self, node_name=None):
         nodes = []
@@ -156,25 +212,67 @@ class ray_Katana_asset(ray_Katana):
                 print (node.getParameter("parameters.filename.value").getValue(0))
 
 
-if __name__ == '__main__':
-    parser = argparse.ArgumentParser()
-    parser.add_argument("-task", help='task id', type=str)
-    parser.add_argument('-file', help='file path', type=str)
-    args = parser.parse_args()
-    katana_scene = args.file
-    json_path = args.task
+def load_options(json_path):
+    """Read the analyse_options.json the client wrote next to task.json."""
+    options_file = os.path.join(json_path, "analyse_options.json")
+    if not os.path.exists(options_file):
+        return {}
+    with open(options_file, "r") as f:
+        return json.load(f)
+
+
+def main(katana_scene, json_path):
+    """Load a scene and write its analysis next to task.json.
+
+    Called once per scene, either from the command line below or for every
+    job of a warm ``katana_worker`` process.
+
+    """
+    options = load_options(json_path)
+    metrics = Metrics(enabled=options.get("metrics", False))
     task_json = os.path.join(json_path, "task.json")
-    KatanaFile.Load(katana_scene)
+    with metrics.phase("load"):
+        KatanaFile.Load(katana_scene)
     print(katana_scene)
     print(task_json)
     print(os.path.basename(sys.executable.lower()))
-    kanana_analyse = ray_Katana_rendernodes()
-    kanana_analyse.kanana_rendernodes(task_json)
-    katana_asset = ray_Katana_asset()
-    task_dict = katana_asset.open_json(task_json)
-    katana_asset.get_Alembic_In()
-    katana_asset.get_PrmanShadingNode()
+    emitter = EventEmitter() if options.get("events", False) else None
+    writer = ResultWriter(json_path, hooks=[emitter] if emitter else None)
+    rendernodes = NamePatterns.from_dict(options.get("rendernodes"))
+    categories = NamePatterns.from_dict(options.get("categories"))
+    with metrics.phase("rendernodes"):
+        kanana_analyse = ray_Katana_rendernodes()
+        kanana_analyse.kanana_rendernodes(task_json, writer, metrics,
+                                          rendernodes)
+    nodes = owners = None
+    if options.get("dependency_mode", False):
+        with metrics.phase("dependencies"):
+            nodes, owners = dependency_nodes(
+                rendernodes.select(NodegraphAPI.GetAllNodesByType("Render")),
+                [node for node_type in GLOBAL_TYPES
+                 for node in NodegraphAPI.GetAllNodesByType(node_type)])
+        metrics.count("dependency_nodes", len(nodes))
+    with metrics.phase("assets"):
+        katana_asset = ray_Katana_asset(task_json, categories=categories)
+        metrics.count("assets", katana_asset.collect_assets(
+            nodes=nodes, writer=writer, owners=owners))
+    if emitter is not None:
+        emitter.flush()
+    with metrics.phase("write"):
+        writer.compact()
+    metrics.save(os.path.join(json_path, "metrics.katana.json"))
+    tips_json = os.path.join(json_path, "tips.json")
+    if not os.path.exists(tips_json):
+        with open(tips_json, "w") as f:
+            f.write("{}")
     analyze_flag_file = os.path.join(json_path, "analyze_sucess")
     with open(analyze_flag_file, "w"):
         pass
 
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-task", help='task id', type=str)
+    parser.add_argument('-file', help='file path', type=str)
+    args = parser.parse_args()
+    main(args.file, args.task)
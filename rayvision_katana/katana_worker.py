@@ -0,0 +1,71 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+"""Request loop that keeps one Katana process warm across analyses.
+
+katana cmd ::
+"C:\\Program Files\\Katana3.2v1\\bin\\katanaBin.exe" --script "katana_worker.py" -port 50123
+
+The worker connects back to the client on ``127.0.0.1:<port>`` and talks
+json, one object per line. Every request names a scene and a task folder,
+every reply carries the status and the current memory use of the process so
+the client can recycle a worker that leaks.
+
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+import traceback
+
+scriptPath = os.path.dirname(os.path.abspath(__file__)).replace("\\", "/")
+if scriptPath not in sys.path:
+    sys.path.append(scriptPath)
+
+from analyse_metrics import current_rss_kb, peak_rss_kb
+
+
+def send(sock, message):
+    sock.sendall((json.dumps(message) + "\n").encode("utf-8"))
+
+
+def serve(port, handler, host="127.0.0.1"):
+    """Answer analysis requests until the client stops or disconnects.
+
+    Args:
+        port (int): Port the client listens on.
+        handler (callable): Called with ``(cg_file, task_path)`` per job.
+        host (str): Address the client listens on.
+
+    """
+    sock = socket.create_connection((host, port))
+    reader = sock.makefile("rb")
+    send(sock, {"status": "ready", "pid": os.getpid()})
+    try:
+        for line in reader:
+            request = json.loads(line.decode("utf-8"))
+            if request.get("command") == "stop":
+                break
+            reply = {"status": "ok"}
+            try:
+                handler(request["file"], request["task"])
+            except Exception:
+                reply = {"status": "error", "error": traceback.format_exc()}
+            # The peak still grows with a leak where the current is unknown.
+            reply["rss_kb"] = current_rss_kb() or peak_rss_kb()
+            send(sock, reply)
+    finally:
+        reader.close()
+        sock.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-port", help="client port", type=int, required=True)
+    args, _ = parser.parse_known_args(argv)
+    return args
+
+
+if __name__ == '__main__':
+    import katana_analyse_script
+    serve(parse_args().port, katana_analyse_script.main)
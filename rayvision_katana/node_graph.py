@@ -0,0 +1,178 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+"""Upstream dependencies of the render nodes of a Katana node graph.
+
+A render node only renders what its input chain produces. In dependency mode
+only the assets of the nodes upstream of the render nodes are collected, and
+every asset is attributed to the render nodes that use it.
+
+The walk follows the input ports of a node to the output ports connected to
+them. A bypassed node contributes nothing and only passes on its first
+input. A group is taken whole: its children are upstream of it, and their
+inputs lead back to the group or to each other.
+
+The upstream nodes of every visited node are cached, so the part of the
+graph shared by several render nodes is only read from Katana once. The
+nodes a shared node reaches are cached as well, the first time a second walk
+meets it, so that part is walked at most twice; caching them for every node
+would hold the square of the length of a chain.
+
+This module runs inside Katana as well, so it only uses the standard library
+and stays compatible with Katana's Python 2.
+
+"""
+
+# Node types whose assets are used by every render node.
+GLOBAL_TYPES = ("RootNode",)
+
+
+def port_inputs(node):
+    """Get the nodes connected to the input ports of a node, in port order."""
+    inputs = []
+    for port in node.getInputPorts():
+        for connected in port.getConnectedPorts():
+            inputs.append(connected.getNode())
+    return inputs
+
+
+def is_bypassed(node):
+    """Check whether a node is bypassed."""
+    bypassed = getattr(node, "isBypassed", None)
+    return bool(bypassed is not None and bypassed())
+
+
+def node_children(node):
+    """Get the children of a group node, or an empty list."""
+    children = getattr(node, "getChildren", None)
+    return list(children()) if children is not None else []
+
+
+class DependencyGraph(object):
+    """Cached upstream walk of a node graph."""
+
+    def __init__(self, inputs=port_inputs, bypassed=is_bypassed,
+                 children=node_children):
+        """Initialize the graph.
+
+        Args:
+            inputs (callable): Given a node, returns its input nodes in port
+                order.
+            bypassed (callable): Given a node, returns True if it is
+                bypassed.
+            children (callable): Given a node, returns its child nodes.
+
+        """
+        self._inputs = inputs
+        self._bypassed = bypassed
+        self._children = children
+        self.nodes = {}
+        self._upstream = {}
+        self._active = {}
+        self._reachable = {}
+        self._walked = set()
+
+    def _visit(self, node):
+        name = node.getName()
+        if name not in self._upstream:
+            self.nodes[name] = node
+            active = not self._bypassed(node)
+            upstream = list(self._inputs(node))
+            if active:
+                upstream.extend(self._children(node))
+            else:
+                upstream = upstream[:1]
+            self._active[name] = active
+            self._upstream[name] = upstream
+        return name
+
+    def reachable(self, node):
+        """Get the names of the active nodes a node depends on.
+
+        Args:
+            node (object): Katana node, or an object with ``getName``.
+
+        Returns:
+            frozenset: Names of the upstream nodes that are not bypassed,
+                the node itself included unless it is bypassed.
+
+        """
+        name = self._visit(node)
+        if name not in self._reachable:
+            self._reachable[name] = self._walk(name, share=True)
+        return self._reachable[name]
+
+    def _walk(self, root, share=False):
+        """Walk the nodes a node reaches, stopping at the cached ones.
+
+        Args:
+            root (str): Name of a visited node.
+            share (bool): Cache the nodes reached by the nodes an earlier
+                walk went through, before using them.
+
+        Returns:
+            frozenset: Names of the nodes reached.
+
+        """
+        reached = set()
+        seen = set([root])
+        pending = [root]
+        while pending:
+            key = pending.pop()
+            if key != root:
+                if share and key in self._walked and \
+                        key not in self._reachable:
+                    self._reachable[key] = self._walk(key)
+                if key in self._reachable:
+                    reached.update(self._reachable[key])
+                    continue
+            self._walked.add(key)
+            if self._active[key]:
+                reached.add(key)
+            for node in self._upstream[key]:
+                upstream = self._visit(node)
+                if upstream not in seen:
+                    seen.add(upstream)
+                    pending.append(upstream)
+        return frozenset(reached)
+
+    def attribute(self, render_nodes):
+        """Map the nodes used by render nodes to those render nodes.
+
+        Returns:
+            dict: Sorted render node names by node name.
+
+        """
+        owners = {}
+        for render_node in render_nodes:
+            render_name = render_node.getName()
+            for name in self.reachable(render_node):
+                owners.setdefault(name, []).append(render_name)
+        for names in owners.values():
+            names.sort()
+        return owners
+
+
+def dependency_nodes(render_nodes, global_nodes=(), graph=None):
+    """Get the nodes used by render nodes, with their attribution.
+
+    Args:
+        render_nodes (list): Render nodes the analysis covers.
+        global_nodes (iterable): Nodes that are not connected to the render
+            nodes but apply to all of them, of the ``GLOBAL_TYPES``.
+        graph (DependencyGraph, optional): Graph to walk, by default one
+            reading the Katana ports.
+
+    Returns:
+        tuple: ``(nodes, owners)``, the used nodes sorted by name and the
+            render node names by node name.
+
+    """
+    graph = graph or DependencyGraph()
+    owners = graph.attribute(render_nodes)
+    nodes = dict((name, graph.nodes[name]) for name in owners)
+    everyone = sorted(render_node.getName() for render_node in render_nodes)
+    for node in global_nodes:
+        name = node.getName()
+        nodes[name] = node
+        owners[name] = everyone
+    return [nodes[name] for name in sorted(nodes)], owners
@@ -0,0 +1,351 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+"""Analyse a .katana project without Katana.
+
+A .katana file is the XML dump of the node graph (optionally gzipped)::
+
+    <katana release="3.2v1">
+      <node name="rootNode" type="RootNode">
+        <node name="Alembic_In" type="Alembic_In">
+          <port name="out" type="out"/>
+          <group_parameter name="Alembic_In">
+            <string_parameter name="abcAsset" value="/cache/shot.abc"/>
+          </group_parameter>
+        </node>
+        <node name="Render" type="Render">
+          <port name="input" type="in" source="Alembic_In.out"/>
+          ...
+
+The file is stream-parsed node by node and the elements are dropped as soon
+as they are read, so memory does not grow with the size of the document.
+Only literal parameter values are used. Expressions, file outputs without a
+literal render location, and render nodes whose outputs come from inside a
+group cannot be evaluated here: they are reported as unresolved and the
+caller falls back to Katana.
+
+This module only uses the standard library, so the benchmark stand-in for
+katanaBin can run it too.
+
+"""
+import collections
+import gzip
+import shutil
+import xml.etree.ElementTree as ElementTree
+
+from rayvision_katana.filter_rules import compile_rules
+from rayvision_katana.node_graph import DependencyGraph
+from rayvision_katana.node_graph import GLOBAL_TYPES
+from rayvision_katana.node_graph import dependency_nodes
+from rayvision_katana.result_writer import ResultWriter
+
+# Node types the render node information is read from.
+RENDER_TYPES = ("Render", "RenderOutputDefine")
+
+# Node types whose content is not a plain upstream chain in the file.
+CONTAINER_TYPES = ("Group", "LiveGroup", "GroupStack", "GroupMerge")
+
+OUTPUT_PREFIX = "args.renderSettings.outputs.outputName."
+
+
+class UnresolvedParameterError(Exception):
+    """The value of a parameter is an expression."""
+
+
+class OfflineParameter(object):
+    """Parameter read from the file, with the NodegraphAPI accessor."""
+
+    __slots__ = ("path", "value", "expression")
+
+    def __init__(self, path, value, expression=None):
+        self.path = path
+        self.value = value
+        self.expression = expression
+
+    def getValue(self, frame):  # pylint: disable=invalid-name
+        """Get the literal value of the parameter."""
+        if self.expression:
+            raise UnresolvedParameterError(self.path)
+        return self.value
+
+
+class OfflineNode(object):
+    """Node read from the file, with the NodegraphAPI accessors."""
+
+    __slots__ = ("name", "node_type", "parameters", "inputs", "has_children")
+
+    def __init__(self, name, node_type):
+        self.name = name
+        self.node_type = node_type
+        self.parameters = {}
+        self.inputs = []
+        self.has_children = False
+
+    def getName(self):  # pylint: disable=invalid-name
+        """Get the node name."""
+        return self.name
+
+    def getType(self):  # pylint: disable=invalid-name
+        """Get the node type."""
+        return self.node_type
+
+    def getParameter(self, path):  # pylint: disable=invalid-name
+        """Get a parameter by dotted path, or None."""
+        return self.parameters.get(path)
+
+
+def open_project(cg_file):
+    """Open a .katana file, gzipped or not."""
+    with open(cg_file, "rb") as project:
+        magic = project.read(2)
+    if magic == b"\x1f\x8b":
+        return gzip.open(cg_file, "rb")
+    return open(cg_file, "rb")
+
+
+def iter_nodes(cg_file, node_types=None):
+    """Stream the nodes of a .katana file.
+
+    Args:
+        cg_file (str): Scene file path.
+        node_types (set, optional): Types whose parameters are kept; other
+            nodes only keep their name, type and inputs.
+
+    Yields:
+        OfflineNode: Nodes in document order, children before their group.
+
+    """
+    nodes = []
+    elements = []
+    params = []
+    with open_project(cg_file) as project:
+        for event, element in ElementTree.iterparse(project,
+                                                    ("start", "end")):
+            tag = element.tag
+            if event == "start":
+                if tag == "node":
+                    if nodes:
+                        nodes[-1].has_children = True
+                    nodes.append(OfflineNode(element.get("name"),
+                                             element.get("type")))
+                    params.append([])
+                elif tag.endswith("_parameter") and nodes:
+                    params[-1].append(element.get("name"))
+                elements.append(element)
+                continue
+
+            elements.pop()
+            if tag == "node":
+                node = nodes.pop()
+                params.pop()
+                yield node
+            elif tag == "port" and nodes:
+                source = element.get("source")
+                if element.get("type") == "in" and source:
+                    nodes[-1].inputs.append(source.rsplit(".", 1)[0])
+            elif tag.endswith("_parameter") and nodes:
+                node = nodes[-1]
+                path = params[-1]
+                keep = node_types is None or node.node_type in node_types
+                if keep and not tag.startswith("group") and (
+                        "value" in element.attrib
+                        or element.get("expression")):
+                    # The top level group is named after the node.
+                    name = ".".join(path[1:])
+                    node.parameters[name] = OfflineParameter(
+                        name, element.get("value"), element.get("expression"))
+                path.pop()
+            # Drop what has been read so the tree never grows.
+            if elements:
+                elements[-1].remove(element)
+            element.clear()
+
+
+def _frames(render_node):
+    """Get the frames string the Katana script writes for a render node."""
+    time_range = render_node.getParameter("farmSettings.TimeRange")
+    if time_range is not None:
+        return "%s[%s]" % (time_range.getValue(0), 1)
+    start = render_node.getParameter("farmSettings.activeFrameRange.start")
+    end = render_node.getParameter("farmSettings.activeFrameRange.end")
+    return "%s-%s[%s]" % (int(float(start.getValue(0))),
+                          int(float(end.getValue(0))), 1)
+
+
+def _outputs(render_node, graph):
+    """Get the file outputs defined upstream of a render node.
+
+    The graph is walked nearest first, so an output defined again downstream
+    overrides the one upstream, as in Katana. Outputs rendered to a ``Temp``
+    folder are skipped, like the Katana script does.
+
+    Raises:
+        UnresolvedParameterError: The upstream graph cannot be evaluated
+            offline.
+
+    """
+    outputs = {}
+    seen = set()
+    pending = collections.deque(render_node.inputs)
+    while pending:
+        name = pending.popleft()
+        if name in seen:
+            continue
+        seen.add(name)
+        node = graph.get(name)
+        if node is None or node.has_children \
+                or node.node_type in CONTAINER_TYPES:
+            raise UnresolvedParameterError("upstream node %s" % name)
+        pending.extend(node.inputs)
+        if node.node_type != "RenderOutputDefine":
+            continue
+        output_name = node.getParameter("outputName")
+        location_type = node.getParameter(OUTPUT_PREFIX + "locationType.value")
+        location = node.getParameter(
+            OUTPUT_PREFIX + "locationSettings.renderLocation.value")
+        if location_type is None:
+            raise UnresolvedParameterError("%s.locationType" % name)
+        if location_type.getValue(0) != "file":
+            # Local outputs render to a temporary folder, which the Katana
+            # script skips as well.
+            continue
+        # Katana makes up the path of a file output left empty.
+        if location is None or not location.getValue(0):
+            raise UnresolvedParameterError("%s.renderLocation" % name)
+        path = location.getValue(0)
+        if path.find("Temp") > 0:
+            continue
+        outputs.setdefault(
+            output_name.getValue(0) if output_name else "primary", path)
+    return outputs
+
+
+class OfflineResult(object):
+    """Summary of an offline analysis."""
+
+    def __init__(self):
+        self.rendernodes = 0
+        self.assets = 0
+        self.unresolved = []
+
+    @property
+    def resolved(self):
+        """bool: True if the analysis needs no Katana fallback."""
+        return not self.unresolved
+
+
+def offline_graph(graph):
+    """Get the ``DependencyGraph`` of the nodes read from a file.
+
+    Bypassing is not stored as a parameter, so no node counts as bypassed.
+
+    Raises:
+        UnresolvedParameterError: The walk reaches a group or an unknown
+            node.
+
+    """
+    def inputs(node):
+        upstream = []
+        for name in node.inputs:
+            if name not in graph:
+                raise UnresolvedParameterError("upstream node %s" % name)
+            upstream.append(graph[name])
+        return upstream
+
+    def children(node):
+        if node.has_children or node.node_type in CONTAINER_TYPES:
+            raise UnresolvedParameterError("upstream node %s" % node.name)
+        return []
+
+    return DependencyGraph(inputs, lambda node: False, children)
+
+
+def analyse_scene(cg_file, task_path, rule_table=None,
+                  dependency_mode=False, hooks=None, rendernodes=None,
+                  categories=None):
+    """Write the task.json scene_info and asset.json of a scene offline.
+
+    Nothing is written when something cannot be resolved.
+
+    Args:
+        cg_file (str): Scene file path.
+        task_path (str): Folder holding task.json.
+        rule_table (RuleTable, optional): Compiled filter rules.
+        dependency_mode (bool): Only keep the assets of the nodes upstream
+            of the render nodes, attributed to them.
+        hooks (list, optional): ``ResultWriter`` hooks, given the records
+            as they are found, even those of a scene that is not resolved.
+        rendernodes (NamePatterns, optional): Render nodes to analyse.
+        categories (NamePatterns, optional): Asset categories to collect.
+
+    Returns:
+        OfflineResult
+
+    """
+    rule_table = (rule_table or compile_rules()).select(categories)
+    node_types = rule_table.node_types.union(RENDER_TYPES)
+    result = OfflineResult()
+    writer = ResultWriter(task_path, hooks)
+    writer.declare_categories(rule_table.categories)
+    graph = {}
+    render_nodes = []
+    # Records by node name, held until the attribution is known.
+    found = {}
+    for node in iter_nodes(cg_file, node_types):
+        graph[node.name] = node
+        if node.node_type == "Render" and (
+                not rendernodes or rendernodes.matches(node.name)):
+            render_nodes.append(node)
+        try:
+            for rule, value in rule_table.match(node):
+                record = {
+                    "node": node.name,
+                    "type": rule.node_type,
+                    "parameter": rule.parameter,
+                    "path": value,
+                }
+                if dependency_mode:
+                    found.setdefault(node.name, []).append(
+                        (rule.category, record))
+                    continue
+                writer.add_asset(rule.category, record)
+                result.assets += 1
+        except UnresolvedParameterError as err:
+            result.unresolved.append("%s: %s" % (node.name, err))
+
+    if dependency_mode:
+        try:
+            _, owners = dependency_nodes(
+                render_nodes, [node for node in graph.values()
+                               if node.node_type in GLOBAL_TYPES],
+                offline_graph(graph))
+        except UnresolvedParameterError as err:
+            result.unresolved.append(str(err))
+            owners = {}
+        for name in sorted(owners):
+            for category, record in found.get(name, ()):
+                record["render_nodes"] = owners[name]
+                writer.add_asset(category, record)
+                result.assets += 1
+
+    if render_nodes:
+        writer.start_rendernodes()
+    for render_node in render_nodes:
+        try:
+            info = {
+                "aov": _outputs(render_node, graph),
+                "frames": _frames(render_node),
+                "denoise": "0",
+                "renderable": "1",
+            }
+        except (UnresolvedParameterError, AttributeError, ValueError) as err:
+            result.unresolved.append("%s: %s" % (render_node.name, err))
+            continue
+        writer.add_rendernode(render_node.name, info)
+        result.rendernodes += 1
+
+    writer.close()
+    if result.resolved:
+        writer.compact()
+    else:
+        shutil.rmtree(writer.stream_path, ignore_errors=True)
+    return result
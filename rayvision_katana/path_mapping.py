@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""Map local file paths to the paths of the files on the server.
+
+``PathMapper`` gives the same server paths as ``utils.convert_path``:
+
+* ``D:\\work\\a.tx`` becomes ``/D/work/a.tx``, drive letters lose their
+  colon;
+* ``\\\\fs01\\share\\a.tx`` becomes ``/fs01/share/a.tx``, UNC roots lose a
+  slash, as does every other path.
+
+Site remaps replace a local prefix with a server prefix instead, e.g. a
+``/mnt/projects`` mount that the farm knows as ``/P/projects``. They are
+compiled into a trie of path components, so the longest matching prefix is
+found in one walk however many remaps there are.
+
+Files of one folder share their conversion: the server path of every folder
+is kept, and the paths of its files are a concatenation away. A scene with
+hundreds of thousands of textures and UDIM tiles converts a few hundred
+folders.
+
+"""
+
+
+class PathMapper(object):
+    """Convert local paths to server paths in bulk."""
+
+    def __init__(self, remaps=None):
+        """Initialize the mapper.
+
+        Args:
+            remaps (dict, optional): Server prefix by local prefix, with
+                either kind of slash, e.g. ``{"//fs01/projects":
+                "/P/projects"}``. A prefix only matches whole folders.
+
+        """
+        self.remaps = dict(remaps or {})
+        self._trie = {}
+        for local, server in self.remaps.items():
+            node = self._trie
+            for part in self._parts(local):
+                node = node.setdefault(part, {})
+            node[None] = server.replace("\\", "/").rstrip("/")
+        self._folders = {}
+
+    @staticmethod
+    def _parts(path):
+        path = path.replace("\\", "/")
+        if len(path) > 1:
+            path = path.rstrip("/")
+        return path.split("/")
+
+    def _remap(self, folder):
+        """Get the server folder of the longest remapped prefix, or None."""
+        node = self._trie
+        found = None
+        parts = folder.split("/")
+        for depth, part in enumerate(parts):
+            node = node.get(part)
+            if node is None:
+                break
+            if None in node:
+                found = depth + 1, node[None]
+        if found is None:
+            return None
+        depth, server = found
+        return "/".join([server] + parts[depth:])
+
+    @staticmethod
+    def convert_default(path):
+        """Convert a path the way ``utils.convert_path`` does."""
+        path = path.replace("\\", "/")
+        if path[1] == ":":
+            return "/" + path.replace(":", "")
+        return path[1:]
+
+    def _folder(self, folder):
+        """Get ``(server folder, strip colons)`` of a local folder."""
+        cached = self._folders.get(folder)
+        if cached is None:
+            server = self._remap(folder) if self._trie else None
+            if server is not None:
+                cached = server, False
+            elif len(folder) > 1 and folder[1] == ":":
+                cached = "/" + folder.replace(":", ""), True
+            else:
+                cached = folder[1:], False
+            self._folders[folder] = cached
+        return cached
+
+    def _convert(self, path):
+        folder, _, name = path.rpartition("/")
+        if not folder:
+            return self.convert_default(path)
+        server, strip_colons = self._folder(folder)
+        if strip_colons and ":" in name:
+            name = name.replace(":", "")
+        return server + "/" + name
+
+    def convert(self, path):
+        """Get the server path of a local path."""
+        return self._convert(path.replace("\\", "/"))
+
+    def map_many(self, paths):
+        """Get the ``(local, server)`` paths of many local paths.
+
+        ``local`` has forward slashes, as in upload.json.
+
+        Returns:
+            list: One pair per path, in order.
+
+        """
+        folders = self._folders
+        pairs = []
+        append = pairs.append
+        for path in paths:
+            local = path.replace("\\", "/")
+            folder, _, name = local.rpartition("/")
+            cached = folders.get(folder)
+            if cached is None:
+                if not folder:
+                    append((local, self.convert_default(local)))
+                    continue
+                cached = self._folder(folder)
+            if cached[1] and ":" in name:
+                name = name.replace(":", "")
+            append((local, cached[0] + "/" + name))
+        return pairs
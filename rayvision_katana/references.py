@@ -0,0 +1,333 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""Assets of the files a scene references.
+
+LiveGroup sources, look files and referenced scenes hold assets of their
+own, which the filter rules of the scene only see as one ``klf&liveGroup``
+path. ``ReferenceResolver`` follows those paths recursively:
+
+* .katana and .livegroup files are node graph XML, read with the offline
+  parser and the filter rules, and their own references are followed;
+* other reference files, such as .klf look files, are scanned for the file
+  paths embedded in their bytes.
+
+Every file is read once per resolver, and read again only when its size or
+mtime changes, so one resolver shared by a batch reads a look file used by
+many shots once. The references of one level are read in parallel, and a
+reference leading back to a file that includes it is reported as a cycle.
+
+"""
+
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from rayvision_katana.assets import merge_records
+from rayvision_katana.constants import REFERENCE_WORKERS
+
+# Extensions of the files whose assets are resolved.
+REFERENCE_EXTENSIONS = (".katana", ".livegroup", ".klf")
+
+# Reference files read as node graph XML; the others are scanned.
+XML_EXTENSIONS = (".katana", ".livegroup")
+
+# asset.json category of the paths found in scanned files, by extension.
+CATEGORY_BY_EXTENSION = {
+    ".tx": "image", ".tex": "image", ".exr": "image", ".tif": "image",
+    ".tiff": "image", ".png": "image", ".jpg": "image", ".hdr": "image",
+    ".abc": "model", ".vdb": "VDB", ".ass": "proxy", ".rs": "proxy",
+    ".usd": "USD", ".usda": "USD", ".usdc": "USD", ".usdz": "USD",
+    ".xgen": "hair", ".klf": "klf&liveGroup", ".livegroup": "klf&liveGroup",
+    ".katana": "klf&liveGroup",
+}
+
+# Longest embedded path the scanner finds.
+MAX_PATH = 1024
+
+# Bytes read at once by the scanner.
+SCAN_CHUNK = 1024 * 1024
+
+
+def path_pattern(start):
+    """Compile the pattern of the embedded paths beginning with ``start``.
+
+    A path starts where it does not follow another path character, so a
+    run of folders is only tried from its beginning, and stops at
+    whitespace, quotes and control characters. The greedy span backtracks
+    to the last extension of the run at most.
+
+    Args:
+        start (bytes): Regex of the beginning of a path.
+
+    """
+    return re.compile(
+        br"(?<![A-Za-z0-9_.~:\\/-])"
+        br"(?:%s)[^\x00-\x20\"'|*?]{0,%d}\.(?:%s)"
+        br"(?![A-Za-z0-9_]|\.[A-Za-z0-9])" % (
+            start, MAX_PATH - 8, "|".join(sorted(
+                CATEGORY_BY_EXTENSION, key=len, reverse=True)).replace(
+                    ".", "").encode("ascii")),
+        re.IGNORECASE)
+
+
+# Absolute paths: a drive or a slash.
+EMBEDDED_PATH = path_pattern(br"[A-Za-z]:[\\/]|[\\/]")
+
+
+def extension(path):
+    """Get the lower case extension of a path."""
+    return os.path.splitext(path)[1].lower()
+
+
+def is_reference(path):
+    """Check whether a path is a file whose assets are resolved."""
+    return extension(path) in REFERENCE_EXTENSIONS
+
+
+def scan_paths(file_path, chunk_size=SCAN_CHUNK, pattern=EMBEDDED_PATH):
+    """Find the file paths embedded in a file, reading it by chunks.
+
+    Only the paths of ``pattern``, absolute ones by default, with an
+    extension of ``CATEGORY_BY_EXTENSION`` are found, and paths holding
+    whitespace are not: the scanner cannot tell them from the text around
+    them.
+
+    Args:
+        file_path (str): File to scan.
+        chunk_size (int): Bytes read at once.
+        pattern (re.Pattern): Paths to find, from ``path_pattern``.
+
+    Yields:
+        str: Every path once, in file order.
+
+    """
+    seen = set()
+    carry = b""
+    with open(file_path, "rb") as scanned:
+        while True:
+            chunk = scanned.read(chunk_size)
+            data = carry + chunk
+            # A path starting in the last MAX_PATH bytes may go on in the
+            # next chunk, so it is scanned again with it.
+            cutoff = len(data) if not chunk else max(0, len(data) - MAX_PATH)
+            carry_start = cutoff
+            for match in pattern.finditer(data):
+                if match.start() >= cutoff:
+                    break
+                carry_start = max(carry_start, match.end())
+                path = match.group().decode("utf-8", "replace")
+                if path not in seen:
+                    seen.add(path)
+                    yield path
+            if not chunk:
+                return
+            carry = data[carry_start:]
+
+
+class FileReferences(object):
+    """What one reference file holds."""
+
+    def __init__(self, path):
+        self.path = path
+        self.assets = []
+        self.references = []
+        self.unresolved = []
+
+
+class ResolvedReferences(object):
+    """Every asset reached from the references of a scene."""
+
+    def __init__(self):
+        self.assets = []
+        self.files = []
+        self.missing = []
+        self.cycles = []
+        self.unresolved = []
+
+    def merge_into(self, asset_info, on_added=None):
+        """Add the assets to an asset.json dict, skipping known paths.
+
+        Args:
+            asset_info (dict): asset.json dict.
+            on_added (callable, optional): Given the category and record of
+                every asset added.
+
+        Returns:
+            int: Number of records added.
+
+        """
+        return merge_records(asset_info, self.assets, on_added)
+
+
+class ReferenceResolver(object):
+    """Resolve reference files recursively, caching every file read."""
+
+    def __init__(self, rule_table=None, max_workers=REFERENCE_WORKERS):
+        """Initialize the resolver.
+
+        Args:
+            rule_table (RuleTable, optional): Filter rules applied to the
+                XML reference files.
+            max_workers (int): Reference files read at once.
+
+        """
+        self._rule_table = rule_table
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._cache = {}
+        self._reading = {}
+        self.reads = 0
+
+    @property
+    def rule_table(self):
+        """RuleTable: The filter rules, compiled on first use."""
+        if self._rule_table is None:
+            from rayvision_katana.filter_rules import compile_rules
+            self._rule_table = compile_rules()
+        return self._rule_table
+
+    def _read_xml(self, result):
+        from rayvision_katana.offline_parser import UnresolvedParameterError
+        from rayvision_katana.offline_parser import iter_nodes
+        rule_table = self.rule_table
+        for node in iter_nodes(result.path, rule_table.node_types):
+            try:
+                for rule, value in rule_table.match(node):
+                    result.assets.append((rule.category, {
+                        "node": node.name,
+                        "type": rule.node_type,
+                        "parameter": rule.parameter,
+                        "path": value,
+                        "reference": result.path,
+                    }))
+            except UnresolvedParameterError as err:
+                result.unresolved.append("%s: %s: %s" % (result.path,
+                                                         node.name, err))
+
+    def _read_scanned(self, result):
+        for path in scan_paths(result.path):
+            result.assets.append((CATEGORY_BY_EXTENSION[extension(path)], {
+                "node": "",
+                "type": "embedded",
+                "parameter": "",
+                "path": path,
+                "reference": result.path,
+            }))
+
+    def read(self, path):
+        """Read one reference file, or get it from the cache.
+
+        Concurrent callers asking for the same file wait for one read.
+
+        Returns:
+            FileReferences: None if the file does not exist.
+
+        """
+        key = path.replace("\\", "/")
+        try:
+            file_stat = os.stat(path)
+        except OSError:
+            return None
+        signature = (file_stat.st_size, file_stat.st_mtime)
+        while True:
+            with self._lock:
+                cached = self._cache.get(key)
+                if cached is not None and cached[0] == signature:
+                    return cached[1]
+                reading = self._reading.get(key)
+                if reading is None:
+                    reading = self._reading[key] = threading.Event()
+                    break
+            reading.wait()
+
+        result = FileReferences(key)
+        try:
+            if extension(key) in XML_EXTENSIONS:
+                self._read_xml(result)
+            else:
+                self._read_scanned(result)
+            result.references = [record["path"].replace("\\", "/")
+                                 for _, record in result.assets
+                                 if is_reference(record["path"])]
+            with self._lock:
+                self._cache[key] = (signature, result)
+                self.reads += 1
+        finally:
+            with self._lock:
+                del self._reading[key]
+            reading.set()
+        return result
+
+    def resolve(self, paths):
+        """Follow references recursively from a scene's reference paths.
+
+        Args:
+            paths (iterable): Paths the scene references.
+
+        Returns:
+            ResolvedReferences
+
+        """
+        resolved = ResolvedReferences()
+        edges = {}
+        level = []
+        for path in paths:
+            path = path.replace("\\", "/")
+            if is_reference(path) and path not in level:
+                level.append(path)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while level:
+                for path, result in zip(level, executor.map(self.read,
+                                                            level)):
+                    if result is None:
+                        resolved.missing.append(path)
+                        edges[path] = []
+                        continue
+                    resolved.files.append(path)
+                    resolved.assets.extend(result.assets)
+                    resolved.unresolved.extend(result.unresolved)
+                    edges[path] = result.references
+                following = []
+                for path in level:
+                    for reference in edges[path]:
+                        if reference not in edges \
+                                and reference not in following:
+                            following.append(reference)
+                level = following
+        resolved.cycles = find_cycles(edges)
+        return resolved
+
+
+def find_cycles(edges):
+    """Find the reference cycles of a graph.
+
+    Args:
+        edges (dict): Referenced paths by path.
+
+    Returns:
+        list: Every cycle as the list of its paths, the first one repeated
+            at the end.
+
+    """
+    cycles = []
+    done = set()
+    for root in sorted(edges):
+        if root in done:
+            continue
+        stack = [(root, iter(edges.get(root, ())))]
+        on_path = [root]
+        while stack:
+            path, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                stack.pop()
+                on_path.pop()
+                done.add(path)
+                continue
+            if child in on_path:
+                cycles.append(on_path[on_path.index(child):] + [child])
+            elif child not in done:
+                stack.append((child, iter(edges.get(child, ()))))
+                on_path.append(child)
+    return cycles
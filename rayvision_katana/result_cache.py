@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""Cache of finished analyses so an unchanged scene skips Katana.
+
+An entry is a folder holding the task.json, asset.json and tips.json of one
+analysis. It is keyed by the scene content hash, the Katana version, the
+plugin configuration and the version of the analysis scripts, so changing
+any of them misses the cache.
+
+"""
+
+import glob
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+from rayvision_katana.constants import RESULT_CACHE_MAX_ENTRIES
+
+# Files of a workspace kept in a cache entry.
+RESULT_FILES = ("task.json", "asset.json", "tips.json")
+# Files making the results: the scripts and rules shipped to Katana and the
+# offline parser standing in for it.
+ANALYSIS_FILES = ("Analyse.py", "katana_analyse_script.py", "katana_worker.py",
+                  "analyse_metrics.py", "events.py", "filter_rules.py",
+                  "filter.txt", "frames.py", "node_graph.py",
+                  "result_writer.py", "offline_parser.py")
+# Compiled modules shipped to Katana along with them.
+ANALYSIS_MODULES = ("linux/script*.so", "windows/*")
+
+_SCRIPT_VERSION = []
+
+
+def analyse_script_version():
+    """Get a digest of the scripts and rules shipped to Katana.
+
+    Any edit to the ``ANALYSIS_FILES`` or the ``ANALYSIS_MODULES`` changes
+    the digest and thereby invalidates every cached result; the client
+    modules do not.
+
+    """
+    if not _SCRIPT_VERSION:
+        folder = os.path.dirname(os.path.abspath(__file__))
+        names = list(ANALYSIS_FILES)
+        for pattern in ANALYSIS_MODULES:
+            names.extend(
+                os.path.relpath(path, folder).replace("\\", "/")
+                for path in glob.glob(os.path.join(folder, pattern))
+                if os.path.isfile(path))
+        digest = hashlib.md5()
+        for name in sorted(names):
+            digest.update(name.encode("utf-8"))
+            with open(os.path.join(folder, name), "rb") as script:
+                digest.update(script.read())
+        _SCRIPT_VERSION.append(digest.hexdigest())
+    return _SCRIPT_VERSION[0]
+
+
+class ResultCache(object):
+    """Folder of cached analysis results with LRU eviction."""
+
+    def __init__(self, root, max_entries=RESULT_CACHE_MAX_ENTRIES,
+                 max_bytes=None):
+        """Initialize the cache.
+
+        Args:
+            root (str): Folder holding one sub folder per entry.
+            max_entries (int): Number of entries kept.
+            max_bytes (int, optional): Total size of the entries kept.
+
+        """
+        self.root = root
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def make_key(scene_hash, software_version, plugin_config, **extra):
+        """Build the key of an analysis.
+
+        Args:
+            scene_hash (str): Content hash of the scene file.
+            software_version (str): Katana version.
+            plugin_config (dict): Plugin information.
+            **extra: Other settings the result depends on.
+
+        Returns:
+            str: Hex digest naming the entry.
+
+        """
+        data = {
+            "scene_hash": scene_hash,
+            "software_version": software_version,
+            "plugin_config": plugin_config,
+            "script_version": analyse_script_version(),
+        }
+        data.update(extra)
+        return hashlib.sha1(json.dumps(data, sort_keys=True).encode(
+            "utf-8")).hexdigest()
+
+    def entry_path(self, key):
+        """Get the folder of an entry."""
+        return os.path.join(self.root, key)
+
+    def get(self, key):
+        """Get the folder of a cached result and mark it recently used.
+
+        Returns:
+            str: The entry folder, or None on a miss.
+
+        """
+        folder = self.entry_path(key)
+        if not all(os.path.isfile(os.path.join(folder, name))
+                   for name in RESULT_FILES):
+            return None
+        try:
+            os.utime(folder, None)
+        except OSError:
+            return None
+        return folder
+
+    def store(self, key, workspace):
+        """Copy the result files of a workspace into the cache.
+
+        When another analysis stores the same key at the same time, the
+        first entry renamed into place is kept.
+
+        """
+        if not os.path.isdir(self.root):
+            try:
+                os.makedirs(self.root)
+            except OSError:
+                if not os.path.isdir(self.root):
+                    raise
+        tmp_folder = tempfile.mkdtemp(prefix=".tmp", dir=self.root)
+        try:
+            for name in RESULT_FILES:
+                shutil.copy2(os.path.join(workspace, name), tmp_folder)
+            self.invalidate(key)
+            # Renaming is atomic, readers never see a half written entry.
+            os.rename(tmp_folder, self.entry_path(key))
+        except OSError:
+            shutil.rmtree(tmp_folder, ignore_errors=True)
+            if self.get(key) is None:
+                raise
+        self.evict()
+
+    def invalidate(self, key):
+        """Remove one entry."""
+        shutil.rmtree(self.entry_path(key), ignore_errors=True)
+
+    def clear(self):
+        """Remove every entry."""
+        for folder, _, _ in self._entries():
+            shutil.rmtree(folder, ignore_errors=True)
+
+    def _entries(self):
+        """Get ``(folder, last_used, size)`` of the entries, newest first."""
+        entries = []
+        if not os.path.isdir(self.root):
+            return entries
+        for name in os.listdir(self.root):
+            folder = os.path.join(self.root, name)
+            if name.startswith(".tmp"):
+                continue
+            try:
+                last_used = os.stat(folder).st_mtime
+                size = sum(os.path.getsize(os.path.join(folder, item))
+                           for item in os.listdir(folder))
+            except OSError:
+                continue
+            entries.append((folder, last_used, size))
+        entries.sort(key=lambda entry: entry[1], reverse=True)
+        return entries
+
+    def evict(self):
+        """Drop the least recently used entries above the limits."""
+        total = 0
+        for index, (folder, _, size) in enumerate(self._entries()):
+            total += size
+            if index >= self.max_entries or (
+                    self.max_bytes is not None and total > self.max_bytes):
+                shutil.rmtree(folder, ignore_errors=True)
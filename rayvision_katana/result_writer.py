@@ -0,0 +1,165 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+"""Stream analysis records to disk and compact them into the result json.
+
+Records are appended to JSON-Lines chunk files under ``<task>/stream`` as
+soon as they are found, so the Katana process never holds the whole result
+in memory or rewrites a growing json file. ``compact`` then writes the
+``scene_info`` of task.json and the asset.json that ``AnalyzeKatana``
+loads, reading each chunk file once.
+
+Hooks see every record as it is written, as ``(kind, data)`` calls: a
+``"rendernode"`` with its ``name`` and ``info``, an ``"asset"`` with its
+``category`` and ``record``, or a ``"warning"`` with its ``message``.
+
+This module runs inside Katana as well, so it only uses the standard library
+and stays compatible with Katana's Python 2.
+
+"""
+import codecs
+import json
+import os
+import shutil
+
+STREAM_FOLDER = "stream"
+INDEX_FILE = "index.json"
+RENDERNODES = "rendernodes"
+
+
+class ResultWriter(object):
+    """Append-only writer of render node and asset records."""
+
+    def __init__(self, task_path, hooks=None):
+        """Initialize the writer.
+
+        Args:
+            task_path (str): Folder holding task.json.
+            hooks (list, optional): Callables given ``(kind, data)`` for
+                every render node, asset and warning.
+
+        """
+        self.task_path = task_path
+        self.hooks = list(hooks or [])
+        self.stream_path = os.path.join(task_path, STREAM_FOLDER)
+        self.categories = []
+        self.rendernodes = False
+        self._files = {}
+
+    def _file(self, name):
+        stream = self._files.get(name)
+        if stream is None:
+            if not os.path.exists(self.stream_path):
+                os.makedirs(self.stream_path)
+            stream = open(os.path.join(self.stream_path, name + ".jsonl"), "w")
+            self._files[name] = stream
+        return stream
+
+    def _write(self, name, record):
+        self._file(name).write(json.dumps(record) + "\n")
+
+    def _notify(self, kind, data):
+        for hook in self.hooks:
+            hook(kind, data)
+
+    def start_rendernodes(self):
+        """Mark that the scene has render nodes, even if none succeed."""
+        self.rendernodes = True
+        self._file(RENDERNODES)
+
+    def add_rendernode(self, name, info):
+        """Append the information of one render node."""
+        self.rendernodes = True
+        record = {"name": name, "info": info}
+        self._write(RENDERNODES, record)
+        self._notify("rendernode", record)
+
+    def declare_categories(self, categories):
+        """Declare asset categories, asset.json lists them in this order."""
+        for category in categories:
+            self._category_file(category)
+
+    def _category_file(self, category):
+        if category not in self.categories:
+            self.categories.append(category)
+        return "asset.%d" % self.categories.index(category)
+
+    def add_asset(self, category, record):
+        """Append one asset record to its category."""
+        self._write(self._category_file(category), record)
+        self._notify("asset", {"category": category, "record": record})
+
+    def warn(self, message):
+        """Report a problem that does not stop the analysis."""
+        self._notify("warning", {"message": message})
+
+    def close(self):
+        """Flush the chunk files and write the stream index."""
+        for stream in self._files.values():
+            stream.close()
+        self._files = {}
+        if not os.path.exists(self.stream_path):
+            os.makedirs(self.stream_path)
+        with open(os.path.join(self.stream_path, INDEX_FILE), "w") as index:
+            json.dump({"categories": self.categories,
+                       "rendernodes": self.rendernodes}, index)
+
+    def compact(self):
+        """Close the writer and produce task.json and asset.json."""
+        self.close()
+        compact(self.task_path)
+
+
+def iter_records(path):
+    """Yield the records of one chunk file."""
+    if not os.path.exists(path):
+        return
+    with codecs.open(path, "r", "utf-8") as stream:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+
+def compact(task_path, remove=True):
+    """Turn the chunk files of a task folder into task.json and asset.json.
+
+    task.json gets ``scene_info.rendernodes`` when the scene had render
+    nodes; asset.json maps every category to its list of records.
+
+    Args:
+        task_path (str): Folder holding task.json and the stream folder.
+        remove (bool): Remove the stream folder afterwards.
+
+    """
+    stream_path = os.path.join(task_path, STREAM_FOLDER)
+    with open(os.path.join(stream_path, INDEX_FILE)) as index_file:
+        index = json.load(index_file)
+
+    if index["rendernodes"]:
+        task_json = os.path.join(task_path, "task.json")
+        task_info = {}
+        if os.path.exists(task_json):
+            with codecs.open(task_json, "r", "utf-8") as task_file:
+                task_info = json.load(task_file)
+        rendernodes = {}
+        for record in iter_records(os.path.join(stream_path,
+                                                RENDERNODES + ".jsonl")):
+            rendernodes[record["name"]] = record["info"]
+        task_info["scene_info"] = {"rendernodes": rendernodes}
+        with codecs.open(task_json, "w", "utf-8") as task_file:
+            json.dump(task_info, task_file, ensure_ascii=False, indent=4)
+
+    asset_json = os.path.join(task_path, "asset.json")
+    with codecs.open(asset_json, "w", "utf-8") as asset_file:
+        asset_file.write("{")
+        for number, category in enumerate(index["categories"]):
+            asset_file.write(",\n" if number else "\n")
+            asset_file.write("    " + json.dumps(category) + ": [")
+            path = os.path.join(stream_path, "asset.%d.jsonl" % number)
+            for count, record in enumerate(iter_records(path)):
+                asset_file.write(",\n        " if count else "\n        ")
+                asset_file.write(json.dumps(record, ensure_ascii=False))
+            asset_file.write("\n    ]")
+        asset_file.write("\n}\n")
+
+    if remove:
+        shutil.rmtree(stream_path, ignore_errors=True)
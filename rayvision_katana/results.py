@@ -0,0 +1,299 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""Lazy and compact access to the json results of an analysis.
+
+``AnalyzeKatana`` no longer parses tips.json, asset.json and task.json when
+an analysis ends; every file is read on the first access of its attribute.
+asset.json, which grows with the scene, can also be read without building
+the document at all:
+
+* ``iter_asset_json`` yields its records one at a time, holding a single
+  record and a read buffer in memory;
+* ``AssetTable`` keeps its records as tuples whose node, type, parameter and
+  folder strings are pooled, so the thousands of records of a texture
+  folder share one copy of every repeated string.
+
+Result files may be stored gzip-compressed, with a ``.gz`` suffix. The
+readers of this module pick the compressed file when the plain one does not
+exist.
+
+"""
+import gzip
+import io
+import json
+import os
+import re
+import shutil
+
+try:
+    TEXT_TYPES = (str, unicode)  # pylint: disable=undefined-variable
+except NameError:
+    TEXT_TYPES = (str,)
+
+COMPRESSED_SUFFIX = ".gz"
+READ_SIZE = 64 * 1024
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+# Marks the fields an asset.json record does not have.
+_MISSING = object()
+
+
+def result_path(path):
+    """Get the path of a result file, or of its compressed form."""
+    if not os.path.exists(path) and os.path.exists(path + COMPRESSED_SUFFIX):
+        return path + COMPRESSED_SUFFIX
+    return path
+
+
+def open_result(path):
+    """Open a result file for reading text, compressed or not."""
+    path = result_path(path)
+    if path.endswith(COMPRESSED_SUFFIX):
+        return io.TextIOWrapper(gzip.open(path, "rb"), encoding="utf-8")
+    return io.open(path, "r", encoding="utf-8")
+
+
+def load_result(path):
+    """Read a whole result file."""
+    with open_result(path) as stream:
+        return json.load(stream)
+
+
+def compress_result(path):
+    """Replace a result file by its gzip-compressed form.
+
+    Returns:
+        str: Path of the compressed file.
+
+    """
+    compressed = path + COMPRESSED_SUFFIX
+    with open(path, "rb") as source:
+        with gzip.open(compressed, "wb") as target:
+            shutil.copyfileobj(source, target)
+    os.remove(path)
+    return compressed
+
+
+class _Reader(object):
+    """Tokens and values of a json stream, read a buffer at a time."""
+
+    def __init__(self, stream, read_size):
+        self.stream = stream
+        self.read_size = read_size
+        self.buffer = ""
+        self.pos = 0
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        chunk = self.stream.read(self.read_size)
+        if not chunk:
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Get the next character that is not whitespace."""
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                raise ValueError("unexpected end of the json document")
+
+    def expect(self, *chars):
+        """Consume one of ``chars`` and return it."""
+        char = self.peek()
+        if char not in chars:
+            raise ValueError("expected %s, found %r" % (" or ".join(chars),
+                                                        char))
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Decode the next json value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except ValueError:
+                if not self._fill():
+                    raise
+                continue
+            # A number may go on in the next buffer; records are objects.
+            if end == len(self.buffer) and not isinstance(value, dict) \
+                    and self._fill():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_asset_json(path, on_category=None, read_size=READ_SIZE):
+    """Read the records of an asset.json one at a time.
+
+    Args:
+        path (str): asset.json, or its compressed form.
+        on_category (callable, optional): Given every category before its
+            records, empty categories included.
+        read_size (int): Characters read at once.
+
+    Yields:
+        tuple: ``(category, record)`` in file order.
+
+    Raises:
+        ValueError: The file is not an asset.json document.
+
+    """
+    with open_result(path) as stream:
+        reader = _Reader(stream, read_size)
+        reader.expect("{")
+        if reader.peek() == "}":
+            return
+        while True:
+            category = reader.value()
+            if on_category is not None:
+                on_category(category)
+            reader.expect(":")
+            reader.expect("[")
+            if reader.peek() == "]":
+                reader.expect("]")
+            else:
+                while True:
+                    yield category, reader.value()
+                    if reader.expect(",", "]") == "]":
+                        break
+            if reader.expect(",", "}") == "}":
+                return
+
+
+def _freeze(value, share):
+    if isinstance(value, list):
+        return tuple(_freeze(item, share) for item in value)
+    if isinstance(value, dict):
+        return dict((key, _freeze(item, share))
+                    for key, item in value.items())
+    return share(value)
+
+
+def _thaw(value):
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    if isinstance(value, dict):
+        return dict((key, _thaw(item)) for key, item in value.items())
+    return value
+
+
+class AssetTable(object):
+    """Compact, read-only store of asset.json records.
+
+    A record is a ``(node, type, parameter, folder, name, extra)`` tuple;
+    the strings but the file name are pooled and records with the same
+    extra fields, e.g. the same ``render_nodes``, share one dict of them.
+    The table pools its strings itself rather than interning them, as
+    Python 2 cannot intern the unicode strings json reads.
+
+    """
+
+    __slots__ = ("categories", "_rows", "_extras", "_strings")
+
+    def __init__(self, records=()):
+        """Initialize the table.
+
+        Args:
+            records (iterable): ``(category, record)`` pairs, e.g. from
+                ``iter_asset_json``.
+
+        """
+        self.categories = []
+        self._rows = {}
+        self._extras = {}
+        self._strings = {}
+        for category, record in records:
+            self.add(category, record)
+
+    @classmethod
+    def from_json(cls, path):
+        """Read an asset.json, or its compressed form, record by record."""
+        table = cls()
+        for category, record in iter_asset_json(path, table.declare):
+            table.add(category, record)
+        return table
+
+    @classmethod
+    def from_dict(cls, asset_info):
+        """Compact an asset.json dict."""
+        table = cls()
+        for category, records in asset_info.items():
+            table.declare(category)
+            for record in records:
+                table.add(category, record)
+        return table
+
+    def declare(self, category):
+        """Add a category, asset.json lists the categories in this order."""
+        rows = self._rows.get(category)
+        if rows is None:
+            rows = self._rows[category] = []
+            self.categories.append(category)
+        return rows
+
+    def _share(self, value):
+        """Get the pooled copy of a string, other values are kept."""
+        if isinstance(value, TEXT_TYPES):
+            return self._strings.setdefault(value, value)
+        return value
+
+    def add(self, category, record):
+        """Add one asset.json record to its category."""
+        rows = self.declare(category)
+        extra = dict(record)
+        node = self._share(extra.pop("node", _MISSING))
+        node_type = self._share(extra.pop("type", _MISSING))
+        parameter = self._share(extra.pop("parameter", _MISSING))
+        path = extra.pop("path")
+        cut = max(path.rfind("/"), path.rfind("\\")) + 1
+        if extra:
+            extra = _freeze(extra, self._share)
+            key = json.dumps(extra, sort_keys=True)
+            extra = self._extras.setdefault(key, extra)
+        else:
+            extra = None
+        rows.append((node, node_type, parameter, self._share(path[:cut]),
+                     path[cut:], extra))
+
+    def __len__(self):
+        return sum(len(rows) for rows in self._rows.values())
+
+    @staticmethod
+    def _record(row):
+        node, node_type, parameter, folder, name, extra = row
+        record = {}
+        for key, value in (("node", node), ("type", node_type),
+                           ("parameter", parameter)):
+            if value is not _MISSING:
+                record[key] = value
+        record["path"] = folder + name
+        if extra is not None:
+            record.update(_thaw(extra))
+        return record
+
+    def __iter__(self):
+        """Yield ``(category, record)`` pairs, building each record dict."""
+        for category in self.categories:
+            for row in self._rows[category]:
+                yield category, self._record(row)
+
+    def paths(self):
+        """Yield the path of every record."""
+        for category in self.categories:
+            for row in self._rows[category]:
+                yield row[3] + row[4]
+
+    def to_dict(self):
+        """Get the asset.json dict of the records."""
+        asset_info = {}
+        for category, record in self:
+            asset_info.setdefault(category, []).append(record)
+        for category in self.categories:
+            asset_info.setdefault(category, [])
+        return asset_info
@@ -9,6 +9,10 @@ References:
 """
 
 # pylint: disable=import-error
+import os
+import stat
+import sys
+
 import pytest
 
 from rayvision_katana.analyse_katana import AnalyzeKatana
@@ -35,3 +39,54 @@ def analyze_info(tmpdir):
 def katana_analyze(analyze_info):
     """Create an katana object."""
     return AnalyzeKatana(**analyze_info)
+
+
+FAKE_KATANA = """#!/bin/sh
+# Stand-in for katanaBin: "$1" script, "$2" task folder, "$3" scene.
+case "$3" in
+    *broken*) exit 1 ;;
+esac
+echo '{}' > "$2/tips.json"
+echo '{}' > "$2/asset.json"
+"""
+
+
+@pytest.fixture()
+def fake_katana(tmpdir):
+    """Get a ``.sh`` executable that plays the part of katanaBin."""
+    exe_path = str(tmpdir.join("fake_katana.sh"))
+    with open(exe_path, "w") as exe_file:
+        exe_file.write(FAKE_KATANA)
+    os.chmod(exe_path, os.stat(exe_path).st_mode | stat.S_IEXEC)
+    return exe_path
+
+
+@pytest.fixture()
+def fake_katana_worker(tmpdir):
+    """Get a ``.sh`` executable that starts the stand-in Katana worker."""
+    script = os.path.join(os.path.dirname(__file__), "fake_katana_worker.py")
+    exe_path = str(tmpdir.join("fake_katana_worker.sh"))
+    with open(exe_path, "w") as exe_file:
+        exe_file.write('#!/bin/sh\nexec "{}" "{}" "$@"\n'.format(
+            sys.executable, script))
+    os.chmod(exe_path, os.stat(exe_path).st_mode | stat.S_IEXEC)
+    return exe_path
+
+
+@pytest.fixture()
+def mock_katana(tmpdir):
+    """Get a ``.sh`` katanaBin that runs Analyse.py on the mock Katana API.
+
+    Scenes are the json files of ``katana_api/NodegraphAPI.load_scene``.
+
+    """
+    tests = os.path.dirname(os.path.abspath(__file__))
+    python_path = os.pathsep.join([os.path.join(tests, "katana_api"),
+                                   os.path.dirname(os.path.dirname(tests))])
+    exe_path = str(tmpdir.join("mock_katana.sh"))
+    with open(exe_path, "w") as exe_file:
+        exe_file.write('#!/bin/sh\nPYTHONPATH="{}" exec "{}" "$1" '
+                       '-task "$2" -file "$3"\n'.format(python_path,
+                                                         sys.executable))
+    os.chmod(exe_path, os.stat(exe_path).st_mode | stat.S_IEXEC)
+    return exe_path
@@ -0,0 +1,32 @@
+"""Stand-in for ``katanaBin --script katana_worker.py`` used by the tests.
+
+It runs the real request loop of ``katana_worker`` with a handler that
+writes the result files instead of loading the scene in Katana.
+
+"""
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__)))))
+
+# pylint: disable=wrong-import-position
+from rayvision_katana.katana_worker import parse_args
+from rayvision_katana.katana_worker import serve
+
+
+def analyse(cg_file, task_path):
+    """Pretend to analyse ``cg_file``, crash on scenes named ``crash``."""
+    if "crash" in os.path.basename(cg_file):
+        os._exit(3)  # pylint: disable=protected-access
+    if "broken" in os.path.basename(cg_file):
+        raise RuntimeError("cannot load {}".format(cg_file))
+    for name in ("tips.json", "asset.json"):
+        with open(os.path.join(task_path, name), "w") as result:
+            json.dump({}, result)
+
+
+if __name__ == "__main__":
+    serve(parse_args().port, analyse)
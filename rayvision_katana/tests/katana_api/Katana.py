@@ -0,0 +1,49 @@
+"""Stand-in for the ``Katana`` module of katanaBin, used by the tests."""
+# pylint: disable=invalid-name,import-error,too-few-public-methods
+import NodegraphAPI
+
+
+class KatanaFile(object):
+    """Scene loading."""
+
+    @staticmethod
+    def Load(path):
+        """Load a json scene of ``NodegraphAPI.load_scene``."""
+        NodegraphAPI.load_scene(path)
+
+
+class FarmAPI(object):
+    """Farm information of the loaded scene."""
+
+    @staticmethod
+    def GetKatanaFileName():
+        """Get the path of the loaded scene."""
+        return NodegraphAPI.SCENE["path"]
+
+
+class _RenderNodeInfo(object):
+    def __init__(self, outputs):
+        self.outputs = sorted(outputs.items())
+
+    def getNumberOfOutputs(self):
+        """Get the number of outputs."""
+        return len(self.outputs)
+
+    def getOutputInfoByIndex(self, index, forceLocal=False):
+        """Get the name and file of an output."""
+        name, output_file = self.outputs[index]
+        return {"name": name, "outputFile": output_file}
+
+
+class Nodes3DAPI(object):
+    """Scene graph evaluation."""
+
+    class RenderNodeUtil(object):
+        """Render node evaluation."""
+
+        @staticmethod
+        def GetRenderNodeInfo(render_node):
+            """Evaluate a render node, which must be unlocked."""
+            assert render_node.getParameter("lock").getValue(0) == 0
+            print("evaluating %s" % render_node.getName())
+            return _RenderNodeInfo(render_node.outputs)
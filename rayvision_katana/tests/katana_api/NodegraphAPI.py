@@ -0,0 +1,55 @@
+"""Stand-in for the ``NodegraphAPI`` module of katanaBin, used by the tests.
+
+``load_scene`` reads a json scene of ``katana_mock`` nodes::
+
+    {"nodes": [{"name": "Render", "type": "Render", "inputs": ["beauty"],
+                "parameters": {"farmSettings.activeFrameRange.start": 1},
+                "outputs": {"primary": "/out/beauty.exr"}}]}
+
+"""
+# pylint: disable=invalid-name,import-error
+import json
+
+from rayvision_katana.tests.katana_mock import FakeNode
+from rayvision_katana.tests.katana_mock import FakeParameter
+
+SCENE = {"path": None, "nodes": []}
+
+
+def load_scene(path):
+    """Replace the node graph by the one of a json scene."""
+    with open(path) as scene:
+        data = json.load(scene)
+    nodes = []
+    for item in data["nodes"]:
+        node = FakeNode(item["name"], item["type"])
+        node.parameters = dict(
+            (name, FakeParameter(value))
+            for name, value in item.get("parameters", {}).items())
+        node.parameters.setdefault("lock", FakeParameter(1))
+        node.outputs = item.get("outputs", {})
+        nodes.append(node)
+    by_name = dict((node.getName(), node) for node in nodes)
+    for item in data["nodes"]:
+        by_name[item["name"]].connect(
+            *[by_name[name] for name in item.get("inputs", [])])
+    SCENE["path"] = path
+    SCENE["nodes"] = nodes
+
+
+def GetAllNodes():
+    """Get every node of the scene."""
+    return list(SCENE["nodes"])
+
+
+def GetAllNodesByType(node_type):
+    """Get the nodes of a type."""
+    return [node for node in SCENE["nodes"] if node.getType() == node_type]
+
+
+def GetNode(name):
+    """Get a node by name, or None."""
+    for node in SCENE["nodes"]:
+        if node.getName() == name:
+            return node
+    return None
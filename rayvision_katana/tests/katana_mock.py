@@ -0,0 +1,84 @@
+"""Minimal stand-ins for the NodegraphAPI objects used by the scripts."""
+
+
+class FakeParameter(object):
+    """A parameter holding one value."""
+
+    def __init__(self, value):
+        self.value = value
+
+    def getValue(self, frame):  # pylint: disable=invalid-name
+        """Get the value, at any frame."""
+        return self.value
+
+    def setValue(self, value, frame):  # pylint: disable=invalid-name
+        """Set the value, at any frame."""
+        self.value = value
+
+
+class FakePort(object):
+    """A port of a node, connected to the ports of other nodes."""
+
+    def __init__(self, node, connected=()):
+        self.node = node
+        self.connected = list(connected)
+
+    def getNode(self):  # pylint: disable=invalid-name
+        """Get the node of the port."""
+        return self.node
+
+    def getConnectedPorts(self):  # pylint: disable=invalid-name
+        """Get the ports connected to this one."""
+        return self.connected
+
+
+class FakeNode(object):
+    """A node with a type, a name and dotted-path parameters.
+
+    ``connect`` plugs other nodes into new input ports, and ``children`` and
+    ``bypassed`` make the node a group or a bypassed node.
+
+    """
+
+    def __init__(self, name, node_type, **parameters):
+        self.name = name
+        self.node_type = node_type
+        self.parameters = {
+            path.replace("__", "."): FakeParameter(value)
+            for path, value in parameters.items()
+        }
+        self.input_ports = []
+        self.children = []
+        self.bypassed = False
+        self.calls = 0
+
+    def connect(self, *nodes):
+        """Connect the output of every node to a new input port."""
+        for node in nodes:
+            self.input_ports.append(FakePort(self, [FakePort(node)]))
+        return self
+
+    def getInputPorts(self):  # pylint: disable=invalid-name
+        """Get the input ports, counting the calls."""
+        self.calls += 1
+        return self.input_ports
+
+    def getChildren(self):  # pylint: disable=invalid-name
+        """Get the child nodes."""
+        return self.children
+
+    def isBypassed(self):  # pylint: disable=invalid-name
+        """Check whether the node is bypassed."""
+        return self.bypassed
+
+    def getName(self):  # pylint: disable=invalid-name
+        """Get the node name."""
+        return self.name
+
+    def getType(self):  # pylint: disable=invalid-name
+        """Get the node type."""
+        return self.node_type
+
+    def getParameter(self, path):  # pylint: disable=invalid-name
+        """Get a parameter by dotted path, or None."""
+        return self.parameters.get(path)
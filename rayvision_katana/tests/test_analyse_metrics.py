@@ -0,0 +1,123 @@
+"""Test for analyse_metrics.py."""
+
+# pylint: disable=import-error
+import json
+import os
+import stat
+import time
+
+import pytest
+
+from rayvision_katana.analyse_katana import AnalyzeKatana
+from rayvision_katana.analyse_metrics import NULL_PHASE
+from rayvision_katana.analyse_metrics import Metrics
+from rayvision_katana.analyse_metrics import reset_high_water
+
+# Stand-in katanaBin that records script metrics like the real script does.
+METRICS_KATANA = """#!/bin/sh
+sleep 0.2
+now=$(python -c 'import time; print(time.time())')
+echo '{}' > "$2/tips.json"
+echo '{"model": [{"node": "a", "type": "Alembic_In", "parameter": "abcAsset", "path": "/cache/a.abc"}]}' > "$2/asset.json"
+echo "{\\"started_at\\": $now, \\"counts\\": {}, \\"phases\\": [\\
+{\\"name\\": \\"load\\", \\"peak_rss_kb\\": 2048}]}" \
+    > "$2/metrics.katana.json"
+"""
+
+
+@pytest.fixture()
+def metrics_katana(tmpdir):
+    """Get a stand-in katanaBin writing metrics.katana.json."""
+    exe_path = str(tmpdir.join("metrics_katana.sh"))
+    with open(exe_path, "w") as exe_file:
+        exe_file.write(METRICS_KATANA)
+    os.chmod(exe_path, os.stat(exe_path).st_mode | stat.S_IEXEC)
+    return exe_path
+
+
+def test_phases_and_counts(tmpdir):
+    """Test that phases are timed and counters add up."""
+    received = []
+    metrics = Metrics(hooks=[received.append])
+    with metrics.phase("load"):
+        time.sleep(0.01)
+    with pytest.raises(ValueError):
+        with metrics.phase("broken"):
+            raise ValueError
+    metrics.count("assets")
+    metrics.count("assets", 2)
+    metrics_json = str(tmpdir.join("metrics.json"))
+    metrics.save(metrics_json)
+
+    with open(metrics_json) as metrics_file:
+        data = json.load(metrics_file)
+    assert [phase["name"] for phase in data["phases"]] == ["load", "broken"]
+    assert data["phases"][0]["seconds"] >= 0.01
+    assert data["phases"][0]["ok"]
+    assert set(data["phases"][0]) == {"name", "start", "seconds", "rss_kb",
+                                      "peak_rss_kb", "ok"}
+    assert not data["phases"][1]["ok"]
+    assert data["counts"] == {"assets": 3}
+    assert received == [data]
+
+
+@pytest.mark.skipif(not reset_high_water(),
+                    reason="the peak memory cannot be reset")
+def test_phase_peaks_are_their_own():
+    """Test that a phase peak leaves out the memory of earlier phases."""
+    metrics = Metrics()
+    with metrics.phase("outer"):
+        with metrics.phase("large"):
+            block = bytearray(64 * 1024 * 1024)
+            block[::4096] = b"x" * len(block[::4096])
+            del block
+        with metrics.phase("small"):
+            pass
+    peaks = dict((phase["name"], phase["peak_rss_kb"])
+                 for phase in metrics.phases)
+    assert peaks["large"] - peaks["small"] > 32 * 1024
+    assert peaks["outer"] >= peaks["large"]
+
+
+def test_disabled_metrics_record_nothing(tmpdir):
+    """Test that disabled metrics are no-ops and write no file."""
+    metrics = Metrics(enabled=False)
+    assert metrics.phase("load") is NULL_PHASE
+    metrics.count("assets")
+    metrics_json = str(tmpdir.join("metrics.json"))
+    metrics.save(metrics_json)
+    assert not metrics.phases
+    assert not metrics.counts
+    assert not os.path.exists(metrics_json)
+
+
+def test_analyse_writes_metrics(analyze_info, metrics_katana):
+    """Test that an analysis merges the Katana metrics into metrics.json."""
+    received = []
+    analyzer = AnalyzeKatana(metrics_hooks=[received.append], **analyze_info)
+    analyzer.analyse(exe_path=metrics_katana, no_upload=True)
+
+    with open(analyzer.options_json) as options_file:
+        assert json.load(options_file) == {"metrics": True,
+                                           "dependency_mode": False,
+                                           "events": False,
+                                           "rendernodes": {
+                                               "include": None,
+                                               "exclude": []},
+                                           "categories": {
+                                               "include": None,
+                                               "exclude": []}}
+    with open(analyzer.metrics_json) as metrics_file:
+        data = json.load(metrics_file)
+    names = [phase["name"] for phase in data["phases"]]
+    assert names == ["katana", "load_result", "verify_assets"]
+    assert data["counts"] == {"rendernodes": 0, "outputs": 0, "assets": 1}
+    assert data["katana"]["startup_seconds"] >= 0.2
+    assert data["phases"][0]["katana_peak_rss_kb"] == 2048
+    assert received == [data]
+
+
+def test_metrics_off_by_default(katana_analyze, fake_katana):
+    """Test that no metrics.json is written unless asked for."""
+    katana_analyze.analyse(exe_path=fake_katana, no_upload=True)
+    assert not os.path.exists(katana_analyze.metrics_json)
@@ -1,6 +1,9 @@
 """Test for analyze_katana_handle.py."""
 
 # pylint: disable=import-error
+import json
+import os
+
 import pytest
 
 from rayvision_utils.exception.exception import CGFileNotExistsError
@@ -17,3 +20,61 @@ def test_check_path(katana_analyze):
     with pytest.raises(CGFileNotExistsError):
         katana_analyze.check_path(katana_analyze.cg_file)
 
+
+def test_construction_is_lightweight(analyze_info, monkeypatch, tmpdir):
+    """Test that creating analyzers neither writes nor re-inits logging."""
+    from rayvision_log import core
+    from rayvision_katana import analyse_katana
+
+    calls = []
+    monkeypatch.setattr(core, "init_logger", lambda *args: calls.append(args))
+    monkeypatch.setattr(analyse_katana, "_LOGGER_CONFIGS", set())
+    log_folder = str(tmpdir.join("logs"))
+    analyze_info = dict(analyze_info, log_folder=log_folder)
+    before = sorted(tmpdir.listdir())
+    first = analyse_katana.AnalyzeKatana(**analyze_info)
+    analyse_katana.AnalyzeKatana(**analyze_info)
+    assert len(calls) == 1
+    assert sorted(tmpdir.listdir()) == before
+    assert not os.path.exists(first.workspace)
+
+    first.save_tips()
+    assert os.path.exists(first.tips_json)
+
+
+def test_selection_reaches_the_script(analyze_info, fake_katana):
+    """Test that the patterns are passed on and key the result cache."""
+    from rayvision_katana.analyse_katana import AnalyzeKatana
+
+    analyzer = AnalyzeKatana(result_cache=True, **analyze_info)
+    full_key = analyzer.result_cache_key()
+    analyzer.analyse(exe_path=fake_katana, no_upload=True,
+                     rendernodes="Render_hero*", exclude_categories=["OCIO"])
+    with open(analyzer.options_json) as options_file:
+        options = json.load(options_file)
+    assert options["rendernodes"] == {"include": ["Render_hero*"],
+                                      "exclude": []}
+    assert options["categories"] == {"include": None, "exclude": ["OCIO"]}
+    assert analyzer.result_cache_key() != full_key
+
+    analyzer.select()
+    assert analyzer.result_cache_key() == full_key
+
+
+def test_select_holds_for_analyse(analyze_info, fake_katana):
+    """Test that a selection made with select is kept by analyse."""
+    from rayvision_katana.analyse_katana import AnalyzeKatana
+
+    analyzer = AnalyzeKatana(**analyze_info)
+    analyzer.select(rendernodes=["Render_hero"], categories="image")
+    analyzer.analyse(exe_path=fake_katana, no_upload=True)
+    with open(analyzer.options_json) as options_file:
+        options = json.load(options_file)
+    assert options["rendernodes"]["include"] == ["Render_hero"]
+    assert options["categories"]["include"] == ["image"]
+
+    analyzer.analyse(exe_path=fake_katana, no_upload=True,
+                     exclude_rendernodes="Render_old")
+    assert analyzer.rendernode_patterns.to_dict() == {
+        "include": None, "exclude": ["Render_old"]}
+    assert not analyzer.category_patterns
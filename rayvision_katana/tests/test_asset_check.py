@@ -0,0 +1,106 @@
+"""Test for asset_check.py."""
+
+# pylint: disable=import-error
+import json
+import os
+
+from rayvision_katana.asset_check import mount_of
+from rayvision_katana.asset_check import sequence_regex
+from rayvision_katana.asset_check import verify_assets
+
+
+def _touch(path, data=b"x"):
+    folder = os.path.dirname(path)
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+    with open(path, "wb") as file_obj:
+        file_obj.write(data)
+
+
+def test_sequence_regex():
+    """Test sequence tokens match the files of the sequence only."""
+    assert sequence_regex("plain.tx") is None
+    assert sequence_regex("color.<UDIM>.tx").match("color.1001.tx")
+    assert not sequence_regex("color.<UDIM>.tx").match("color.101.tx")
+    assert sequence_regex("cache.####.abc").match("cache.0012.abc")
+    assert sequence_regex("cache.%04d.vdb").match("cache.0012.vdb")
+    assert sequence_regex("cache.$F4.bgeo").match("cache.0012.bgeo")
+
+
+def test_verify_assets(tmpdir):
+    """Test files, sequences and missing paths are told apart."""
+    root = str(tmpdir)
+    _touch(os.path.join(root, "tex", "a.tx"), b"abc")
+    _touch(os.path.join(root, "tex", "c.1001.tx"))
+    _touch(os.path.join(root, "tex", "c.1002.tx"))
+    paths = [os.path.join(root, "tex", "a.tx"),
+             os.path.join(root, "tex", "c.<UDIM>.tx"),
+             os.path.join(root, "tex", "gone.tx"),
+             os.path.join(root, "nowhere", "b.tx")]
+    results = verify_assets(paths, max_workers=2, per_mount=1)
+    assert results[paths[0]].exists
+    assert results[paths[0]].size == 3
+    assert len(results[paths[1]].files) == 2
+    assert not results[paths[2]].exists
+    assert not results[paths[3]].exists
+    assert results[paths[3]].mtime is None
+
+
+def test_verify_assets_uses_the_listing(tmpdir, monkeypatch):
+    """Test that the sizes come from the directory entries."""
+    path = os.path.join(str(tmpdir), "tex", "a.1001.tx")
+    _touch(path, b"abcd")
+
+    def no_stat(*_, **__):
+        raise AssertionError("os.stat called")
+
+    monkeypatch.setattr(os, "stat", no_stat)
+    results = verify_assets([path.replace("1001", "<UDIM>")])
+    monkeypatch.undo()
+    assert [item[:2] for item in results[path.replace(
+        "1001", "<UDIM>")].files] == [(path, 4)]
+
+
+def test_analyse_records_missing_assets(analyze_info, katana_analyze,
+                                        tmpdir):
+    """Test missing assets go to tips.json and found ones to upload.json."""
+    texture = str(tmpdir.join("tex", "a.tx"))
+    _touch(texture)
+    katana_analyze.asset_info = {"image": [
+        {"path": texture}, {"path": str(tmpdir.join("tex", "gone.tx"))}]}
+    katana_analyze.post_analyse()
+    with open(katana_analyze.tips_json) as tips_file:
+        assert json.load(tips_file) == {
+            "10012": [str(tmpdir.join("tex", "gone.tx"))]}
+    with open(katana_analyze.upload_json) as upload_file:
+        upload = json.load(upload_file)
+    assert [item["local"] for item in upload["asset"]] == [
+        analyze_info["cg_file"], texture]
+    assert upload["asset"][1]["size"] == 1
+
+
+def test_mounts_are_cached_by_folder(tmpdir, monkeypatch):
+    """Test that the folders of one tree check each ancestor once."""
+    checked = []
+    ismount = os.path.ismount
+
+    def counting_ismount(path):
+        checked.append(path)
+        return ismount(path)
+
+    monkeypatch.setattr(os.path, "ismount", counting_ismount)
+    root = str(tmpdir.join("show"))
+    first = mount_of(os.path.join(root, "tex", "wood"))
+    assert mount_of(os.path.join(root, "tex", "metal")) == first
+    assert mount_of(os.path.join(root, "tex")) == first
+    assert len(checked) == len(set(checked))
+    assert os.path.join(root, "tex", "metal") in checked
+
+
+def test_missing_assets_keep_katana_tips(katana_analyze, tmpdir):
+    """Test that the missing files Katana reported are kept."""
+    gone = str(tmpdir.join("tex", "gone.tx"))
+    katana_analyze.tips_info = {"10012": ["/cache/lost.abc"]}
+    katana_analyze.asset_info = {"image": [{"path": gone}]}
+    katana_analyze.verify_assets()
+    assert katana_analyze.tips_info == {"10012": ["/cache/lost.abc", gone]}
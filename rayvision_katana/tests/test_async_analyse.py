@@ -0,0 +1,152 @@
+"""Test for async_analyse.py."""
+
+# pylint: disable=import-error
+import asyncio
+import os
+import stat
+import time
+
+import pytest
+
+from rayvision_utils.exception.exception import AnalyseFailError
+
+from rayvision_katana.analyse_katana import AnalyzeKatana
+from rayvision_katana.batch import LicensePool
+
+HANGING_KATANA = """#!/bin/sh
+echo $$ > "$2/katana.pid"
+echo "loading $3"
+sleep 30
+"""
+
+
+@pytest.fixture()
+def hanging_katana(tmpdir):
+    """Get a stand-in katanaBin that never finishes."""
+    exe_path = str(tmpdir.join("hanging_katana.sh"))
+    with open(exe_path, "w") as exe_file:
+        exe_file.write(HANGING_KATANA)
+    os.chmod(exe_path, os.stat(exe_path).st_mode | stat.S_IEXEC)
+    return exe_path
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+    return True
+
+
+def _pid(analyzer):
+    with open(os.path.join(analyzer.workspace, "katana.pid")) as pid_file:
+        return int(pid_file.read())
+
+
+def test_analyse_async_runs_concurrently(tmpdir, analyze_info, fake_katana):
+    """Test one loop drives several analyses to completion."""
+    analyzers = []
+    for index in range(3):
+        analyze_info["workspace"] = str(tmpdir.mkdir(str(index)))
+        analyzers.append(AnalyzeKatana(**analyze_info))
+
+    async def run_all():
+        semaphore = asyncio.Semaphore(2)
+        return await asyncio.gather(*[
+            analyzer.analyse_async(exe_path=fake_katana, semaphore=semaphore)
+            for analyzer in analyzers])
+
+    results = asyncio.run(run_all())
+    assert [result.tips_info for result in results] == [{}, {}, {}]
+
+
+class CountingPool(LicensePool):
+    """License pool remembering how many slots were taken at once."""
+
+    def __init__(self, licenses):
+        super(CountingPool, self).__init__(licenses)
+        self.taken = 0
+        self.active = 0
+        self.peak = 0
+
+    def __enter__(self):
+        super(CountingPool, self).__enter__()
+        self.taken += 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.active -= 1
+        super(CountingPool, self).__exit__(exc_type, exc_val, exc_tb)
+
+
+def test_analyse_async_holds_the_license_pool(tmpdir, analyze_info,
+                                              fake_katana):
+    """Test that the analyses share the license slots of their pool."""
+    pool = CountingPool(1)
+    analyzers = []
+    for index in range(3):
+        analyze_info["workspace"] = str(tmpdir.mkdir(str(index)))
+        analyzers.append(AnalyzeKatana(license_pool=pool, **analyze_info))
+
+    async def run_all():
+        await asyncio.gather(*[analyzer.analyse_async(exe_path=fake_katana)
+                               for analyzer in analyzers])
+
+    asyncio.run(run_all())
+    assert (pool.taken, pool.peak, pool.active) == (3, 1, 0)
+
+
+def test_cancel_gives_back_a_late_license(katana_analyze, fake_katana):
+    """Test that a slot coming after a cancellation is released."""
+    pool = CountingPool(1)
+    katana_analyze.license_pool = pool
+
+    async def cancel():
+        with pool:
+            task = asyncio.ensure_future(
+                katana_analyze.analyse_async(exe_path=fake_katana))
+            await asyncio.sleep(0.5)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+        await asyncio.sleep(0.5)
+
+    asyncio.run(cancel())
+    assert (pool.taken, pool.active) == (2, 0)
+
+
+def test_analyse_async_timeout_kills_katana(katana_analyze, hanging_katana):
+    """Test a hung Katana is killed and reported in tips.json."""
+    start = time.time()
+    with pytest.raises(AnalyseFailError):
+        asyncio.run(katana_analyze.analyse_async(exe_path=hanging_katana,
+                                                 timeout=1))
+    assert time.time() - start < 10
+    assert "timed out" in katana_analyze.tips_info["999"][0]
+    assert not _alive(_pid(katana_analyze))
+
+
+def test_analyse_async_cancel_kills_katana(katana_analyze, hanging_katana):
+    """Test cancelling the analysis kills the Katana process."""
+
+    async def cancel():
+        task = asyncio.ensure_future(
+            katana_analyze.analyse_async(exe_path=hanging_katana))
+        await asyncio.sleep(1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel())
+    assert not _alive(_pid(katana_analyze))
+
+
+def test_analyse_async_memory_ceiling(katana_analyze, hanging_katana):
+    """Test the memory ceiling stops Katana."""
+    with pytest.raises(AnalyseFailError):
+        asyncio.run(katana_analyze.analyse_async(exe_path=hanging_katana,
+                                                 timeout=10,
+                                                 max_memory_mb=0.001))
+    assert "MB" in katana_analyze.tips_info["999"][0]
@@ -0,0 +1,102 @@
+"""Test for batch.py."""
+
+# pylint: disable=import-error
+import json
+import threading
+import time
+
+import pytest
+
+from rayvision_katana.batch import LicensePool
+from rayvision_katana.batch import analyse_many
+from rayvision_katana.batch import main
+
+
+def _scenes(tmpdir, names):
+    scenes = []
+    for name in names:
+        cg_file = str(tmpdir.join(name))
+        with open(cg_file, "w"):
+            pass
+        scenes.append(cg_file)
+    return scenes
+
+
+def test_analyse_many_isolates_failures(tmpdir, analyze_info, fake_katana):
+    """Test a failing scene does not abort the rest of the batch."""
+    scenes = _scenes(tmpdir, ["a.katana", "broken.katana", "b.katana"])
+    defaults = dict(analyze_info)
+    defaults.pop("cg_file")
+    results = analyse_many(scenes, max_workers=3, licenses=2,
+                           exe_path=fake_katana, **defaults)
+    assert [result.cg_file for result in results] == scenes
+    assert [result.ok for result in results] == [True, False, True]
+    assert results[0].analyzer.tips_info == {}
+    assert results[1].to_dict()["error"].startswith("AnalyseFailError")
+
+
+def test_analyse_many_gives_every_scene_a_workspace(tmpdir, analyze_info,
+                                                    fake_katana):
+    """Test that scenes run on one reused thread do not share a workspace."""
+    scenes = _scenes(tmpdir, ["a.katana", "b.katana", "c.katana",
+                              "d.katana"])
+    defaults = dict(analyze_info)
+    defaults.pop("cg_file")
+    results = analyse_many(scenes, max_workers=1, exe_path=fake_katana,
+                           **defaults)
+    assert len(set(result.analyzer.workspace for result in results)) == 4
+    assert [result.analyzer.task_info["task_info"]["input_cg_file"]
+            for result in results] == [scene.replace("\\", "/")
+                                       for scene in scenes]
+
+
+def test_analyse_many_selection_per_scene(tmpdir, analyze_info,
+                                          fake_katana):
+    """Test that a scene dict can carry its render node patterns."""
+    scenes = _scenes(tmpdir, ["a.katana", "b.katana"])
+    defaults = dict(analyze_info)
+    defaults.pop("cg_file")
+    results = analyse_many([{"cg_file": scenes[0],
+                             "rendernodes": ["Render_hero"]}, scenes[1]],
+                           exe_path=fake_katana, **defaults)
+    assert [result.ok for result in results] == [True, True]
+    assert [result.analyzer.rendernode_patterns.include
+            for result in results] == [["Render_hero"], None]
+
+
+def test_license_pool_caps_concurrency():
+    """Test no more than ``licenses`` holders run at once."""
+    pool = LicensePool(2)
+    state = {"live": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def hold():
+        with pool:
+            with lock:
+                state["live"] += 1
+                state["peak"] = max(state["peak"], state["live"])
+            time.sleep(0.02)
+            with lock:
+                state["live"] -= 1
+
+    threads = [threading.Thread(target=hold) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert state["peak"] == 2
+    with pytest.raises(ValueError):
+        LicensePool(0)
+
+
+def test_main(tmpdir, fake_katana, capsys):
+    """Test the console entry point reports every scene."""
+    scenes = _scenes(tmpdir, ["a.katana", "broken.katana"])
+    code = main(scenes + ["--software-version", "3.2v1",
+                          "--project-name", "Project1",
+                          "--plugin", "KtoA=2.4.0.3",
+                          "--workspace", str(tmpdir),
+                          "--exe-path", fake_katana])
+    summary = json.loads(capsys.readouterr().out)
+    assert code == 1
+    assert [item["status"] for item in summary] == ["ok", "failed"]
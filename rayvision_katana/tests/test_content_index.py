@@ -0,0 +1,98 @@
+"""Test for content_index.py."""
+
+# pylint: disable=import-error
+import os
+
+from rayvision_katana.analyse_katana import AnalyzeKatana
+from rayvision_katana.content_index import ContentIndex
+from rayvision_katana.history import SceneHistory
+from rayvision_katana.history import make_manifest
+
+
+def _write(path, content):
+    with open(path, "w") as asset:
+        asset.write(content)
+    return path.replace("\\", "/")
+
+
+def test_lookup_record_and_verify(tmpdir):
+    """Test the bulk lookup, the records and the verification."""
+    index = ContentIndex(str(tmpdir.join("content.db")))
+    index.record_many([("a" * 32, 1, "/srv/a"), ("b" * 32, 2, "/srv/b")],
+                      uploaded=10.0)
+    digests = ["a" * 32, "c" * 32] + ["%032d" % number
+                                      for number in range(1200)]
+    assert index.lookup_many(digests) == {"a" * 32: ("/srv/a", 10.0)}
+    assert index.verify(lambda server: server != "/srv/b") == ["b" * 32]
+    assert len(index) == 1
+
+
+def test_remove_keeps_other_algorithms(tmpdir):
+    """Test that removing an md5 hash keeps the same digest of blake2b."""
+    index = ContentIndex(str(tmpdir.join("content.db")))
+    index.record_many([("a" * 32, 1, "/srv/md5")])
+    index.record_many([("a" * 32, 1, "/srv/blake2b")], algorithm="blake2b")
+    index.remove_many(["a" * 32])
+    assert index.lookup_many(["a" * 32]) == {}
+    assert index.lookup_many(["a" * 32], algorithm="blake2b")["a" * 32][0] \
+        == "/srv/blake2b"
+
+
+def test_rebuild_from_history(tmpdir):
+    """Test that the uploaded manifests are merged with the records."""
+    history = SceneHistory(str(tmpdir.join("history")))
+    files = {"/a.abc": {"server": "/a.abc", "size": 1, "mtime": 1,
+                        "hash": "a" * 32}}
+    history.save("/shot1.katana", dict(make_manifest("/shot1.katana", files),
+                                       uploaded_at=5.0))
+    history.save("/shot2.katana", dict(make_manifest(
+        "/shot2.katana", files, algorithm="blake2b"), uploaded_at=6.0))
+    pending = {"/b.abc": dict(files["/a.abc"], hash="b" * 32)}
+    history.save("/shot3.katana", make_manifest("/shot3.katana", pending))
+    index = ContentIndex(str(tmpdir.join("content.db")))
+    index.record_many([("z" * 32, 1, "/srv/z"), ("a" * 32, 1, "/srv/a")],
+                      uploaded=1.0)
+    assert index.rebuild(history.root) == 3
+    assert index.lookup_many(["a" * 32, "b" * 32, "z" * 32]) == {
+        "a" * 32: ("/a.abc", 5.0), "z" * 32: ("/srv/z", 1.0)}
+    assert index.lookup_many(["a" * 32], "blake2b") == {
+        "a" * 32: ("/a.abc", 6.0)}
+
+
+def test_dedup_upload_json(analyze_info, tmpdir):
+    """Test that content sent by an earlier task is marked or dropped."""
+    library = _write(str(tmpdir.join("hdri.exr")), "sky")
+    copy = _write(str(tmpdir.join("shot_hdri.exr")), "sky")
+    asset_info = {"image": [{"node": "n", "type": "Material",
+                             "parameter": "p", "path": path}
+                            for path in (library, copy)]}
+
+    first = AnalyzeKatana(content_index=True, **analyze_info)
+    first.asset_info = {"image": asset_info["image"][:1]}
+    first.write_upload_json()
+    first.record_uploaded(uploaded=10.0)
+
+    marked = AnalyzeKatana(content_index=True, **analyze_info)
+    marked.asset_info = asset_info
+    marked.write_upload_json()
+    entries = {entry["local"]: entry for entry in marked.upload_info["asset"]}
+    assert entries[copy]["source"] == entries[library]["source"]
+    assert entries[copy]["uploaded_at"] == 10.0
+    assert "source" in entries[analyze_info["cg_file"].replace("\\", "/")]
+
+    dropped = AnalyzeKatana(content_index=True, dedup="drop", **analyze_info)
+    dropped.asset_info = asset_info
+    dropped.write_upload_json()
+    assert not dropped.upload_info["asset"]
+    assert sorted(entry["local"] for entry in
+                  dropped.upload_info["deduplicated"]) == sorted(
+                      [analyze_info["cg_file"].replace("\\", "/"), library,
+                       copy])
+    assert os.path.exists(os.path.join(analyze_info["workspace"],
+                                       "content_index.db"))
+
+    other = AnalyzeKatana(content_index=True, hash_algorithm="blake2b",
+                          **analyze_info)
+    other.asset_info = asset_info
+    other.write_upload_json()
+    assert not any("source" in entry for entry in other.upload_info["asset"])
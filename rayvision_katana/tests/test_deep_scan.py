@@ -0,0 +1,129 @@
+"""Test for deep_scan.py."""
+
+# pylint: disable=import-error
+import threading
+
+from rayvision_katana.analyse_katana import AnalyzeKatana
+from rayvision_katana.deep_scan import DeepScanCache
+from rayvision_katana.deep_scan import DeepScanner
+from rayvision_katana.deep_scan import scan_usda
+
+ROOT = """#usda 1.0
+(
+    subLayers = [
+        @./layers/anim.usda@,
+        @@@/lib/weird@name.usda@@@
+    ]
+)
+
+def Xform "set" (
+    prepend references = @set.usdc@</set>
+    payload = @./cache/crowd.abc@
+)
+{
+    asset inputs:file = @textures/wood.<UDIM>.tx@
+    asset inputs:sky = @omniverse://server/sky.exr@
+}
+"""
+
+ANIM = """#usda 1.0
+def "anim" (references = [@../set.usdc@, @./anim_tex.usda@])
+{
+}
+"""
+
+
+def _write(path, content):
+    path.dirpath().ensure(dir=True)
+    path.write_binary(content)
+    return str(path).replace("\\", "/")
+
+
+def _shot(tmpdir):
+    root = _write(tmpdir.join("shot.usda"), ROOT.encode("utf-8"))
+    _write(tmpdir.join("layers", "anim.usda"), ANIM.encode("utf-8"))
+    _write(tmpdir.join("layers", "anim_tex.usda"),
+           b'#usda 1.0\nasset file = @/tex/face.tx@\n')
+    _write(tmpdir.join("set.usdc"),
+           b"PXR-USDC\x00\x07/tex/brick.exr\x00\x05/lib/chair.usd\x00")
+    _write(tmpdir.join("cache", "crowd.abc"), b"Ogawa\x00/tex/cloth.tx\x00")
+    return root
+
+
+def test_scan_usda_arcs(tmpdir):
+    """Test that the arc of every path of a text layer is found."""
+    root = _write(tmpdir.join("shot.usda"), ROOT.encode("utf-8"))
+    assert list(scan_usda(root)) == [
+        ("subLayers", "./layers/anim.usda"),
+        ("subLayers", "/lib/weird@name.usda"),
+        ("references", "set.usdc"),
+        ("payload", "./cache/crowd.abc"),
+        ("asset", "textures/wood.<UDIM>.tx"),
+        ("asset", "omniverse://server/sky.exr"),
+    ]
+
+
+def test_deep_scan(tmpdir):
+    """Test the recursive scan on a process pool and the scan cache."""
+    root = _shot(tmpdir)
+    folder = str(tmpdir).replace("\\", "/")
+    cache = DeepScanCache(str(tmpdir.join("deep_scan.db")))
+    scanner = DeepScanner(cache, max_workers=2)
+    records = dict((record["path"], (category, record))
+                   for category, record in scanner.scan([root]))
+    assert sorted(records) == sorted([
+        folder + "/layers/anim.usda", "/lib/weird@name.usda",
+        folder + "/set.usdc", folder + "/cache/crowd.abc",
+        folder + "/textures/wood.<UDIM>.tx", "/tex/brick.exr",
+        "/lib/chair.usd", "/tex/cloth.tx",
+        folder + "/layers/anim_tex.usda", "/tex/face.tx"])
+    assert records["/tex/face.tx"] == ("image", {
+        "node": "", "type": "embedded", "parameter": "asset",
+        "path": "/tex/face.tx",
+        "reference": folder + "/layers/anim_tex.usda"})
+    assert records[folder + "/set.usdc"][0] == "USD"
+    assert records[folder + "/cache/crowd.abc"][1]["parameter"] == "payload"
+    assert scanner.scanned == 5
+
+    scanner = DeepScanner(cache, max_workers=2)
+    assert len(list(scanner.scan([root]))) == 10
+    assert scanner.scanned == 0
+
+
+def test_deep_scan_odd_files(tmpdir):
+    """Test relative binary paths, unreadable files and other extensions."""
+    root = _write(tmpdir.join("shot.usda"), b"#usda 1.0\n"
+                  b"subLayers = [@./crate.usdc@, @./folder.usdc@]\n"
+                  b"asset look = @./look.mtlx@\n")
+    _write(tmpdir.join("crate.usdc"), b"PXR-USDC\x00\x09./tex/a.exr\x00"
+           b"\x0a../lib/b.abc\x00\x06tex/c.tx\x00")
+    tmpdir.mkdir("folder.usdc")
+    folder = str(tmpdir).replace("\\", "/")
+    scanner = DeepScanner(max_workers=2)
+    unscanned = []
+    records = []
+    # analyse_many scans from its threads.
+    thread = threading.Thread(target=lambda: records.extend(
+        scanner.scan([root], unscanned)))
+    thread.start()
+    thread.join()
+    assert sorted((record["path"], category)
+                  for category, record in records) == sorted([
+                      (folder + "/crate.usdc", "USD"),
+                      (folder + "/folder.usdc", "USD"),
+                      (folder + "/look.mtlx", "other"),
+                      (folder + "/tex/a.exr", "image"),
+                      (str(tmpdir.dirpath()).replace("\\", "/")
+                       + "/lib/b.abc", "model")])
+    assert [path for path, _ in unscanned] == [folder + "/folder.usdc"]
+
+
+def test_analysis_adds_dependencies(analyze_info, tmpdir):
+    """Test that the dependencies reach asset.json."""
+    root = _shot(tmpdir)
+    analyzer = AnalyzeKatana(deep_scan=True, **analyze_info)
+    analyzer.asset_info = {"USD": [{"node": "UsdIn", "type": "UsdIn",
+                                    "parameter": "fileName", "path": root}]}
+    assert analyzer.scan_dependencies() == 10
+    assert [record["path"] for record in analyzer.asset_info["model"]] == [
+        str(tmpdir.join("cache", "crowd.abc")).replace("\\", "/")]
@@ -0,0 +1,147 @@
+"""Test for discovery.py."""
+
+# pylint: disable=import-error
+import os
+import time
+
+import pytest
+
+from rayvision_utils.exception import tips_code
+from rayvision_utils.exception.exception import CGExeNotExistError
+
+from rayvision_katana import discovery
+from rayvision_katana.analyse_katana import AnalyzeKatana
+from rayvision_katana.discovery import InstallIndex
+
+
+def _install(root, version, plugins=()):
+    folder = os.path.join(root, "Katana" + version)
+    os.makedirs(os.path.join(folder, "plugins", "Resources"))
+    for plugin in plugins:
+        os.makedirs(os.path.join(folder, "plugins", "Resources", plugin))
+    exe_path = os.path.join(folder, "katana")
+    with open(exe_path, "w"):
+        pass
+    return exe_path
+
+
+@pytest.fixture()
+def roots(tmpdir, monkeypatch):
+    """Get an install root configured through the environment."""
+    root = str(tmpdir.mkdir("Foundry"))
+    monkeypatch.setattr(discovery, "INSTALL_ROOTS", {})
+    monkeypatch.setenv("KATANA_INSTALL_ROOTS", root)
+    monkeypatch.delenv("KATANA_ROOT", raising=False)
+    return root
+
+
+def test_lookup_and_persistence(tmpdir, roots, monkeypatch):
+    """Test that the saved index is reused until a root changes."""
+    exe_path = _install(roots, "3.2v1", ["Arnold"])
+    index_path = str(tmpdir.join("installs.json"))
+    index = InstallIndex(index_path, "linux")
+    install = index.lookup("3.2v1")
+    assert install.exe_path == os.path.normpath(exe_path)
+    assert install.plugins == ["Arnold"]
+    assert index.lookup("3.5v1") is None
+
+    scans = []
+    original_scan = discovery.scan
+    monkeypatch.setattr(discovery, "scan",
+                        lambda *args: scans.append(1) or original_scan(*args))
+    assert InstallIndex(index_path, "linux").lookup("3.2v1") is not None
+    assert not scans
+
+    # Installing a version changes the mtime of its root.
+    _install(roots, "3.5v1")
+    os.utime(roots, (time.time() + 10, time.time() + 10))
+    assert InstallIndex(index_path, "linux").lookup("3.5v1") is not None
+    assert len(scans) == 1
+
+
+def test_removed_install_is_rescanned(tmpdir, roots):
+    """Test that an executable gone since the last scan is not returned."""
+    exe_path = _install(roots, "3.2v1")
+    index = InstallIndex(str(tmpdir.join("installs.json")), "linux")
+    assert index.lookup("3.2v1") is not None
+    os.remove(exe_path)
+    assert index.lookup("3.2v1") is None
+    assert index.versions() == []
+
+
+def test_registry_changes_the_fingerprint(tmpdir, roots, monkeypatch):
+    """Test that a version installed through the registry is found."""
+    folder = str(tmpdir.join("Program Files", "Katana3.2v1"))
+    os.makedirs(os.path.join(folder, "bin"))
+    with open(os.path.join(folder, "bin", "katanaBin.exe"), "w"):
+        pass
+    entries = []
+    monkeypatch.setattr(discovery, "registry_installs", lambda: entries)
+    index_path = str(tmpdir.join("installs.json"))
+    assert InstallIndex(index_path, "windows").lookup("3.2v1") is None
+    entries.append(("3.2v1", folder))
+    assert InstallIndex(index_path, "windows").lookup("3.2v1").root == \
+        os.path.normpath(folder)
+
+
+def test_index_in_a_fresh_root(tmpdir, roots):
+    """Test that the index folder is created, and saving is best effort."""
+    _install(roots, "3.2v1")
+    index_path = str(tmpdir.join("fresh", "root", "installs.json"))
+    assert InstallIndex(index_path, "linux").lookup("3.2v1") is not None
+    assert os.path.exists(index_path)
+
+    blocked = str(tmpdir.join("blocked"))
+    with open(blocked, "w"):
+        pass
+    index = InstallIndex(os.path.join(blocked, "installs.json"), "linux")
+    assert index.lookup("3.2v1") is not None
+    assert index.lookup("3.5v1") is None
+
+
+def test_find_location_in_a_fresh_root(analyze_info, roots, tmpdir):
+    """Test a missing version raises CGExeNotExistError in a new root."""
+    workspace = str(tmpdir.join("new_root"))
+    os.makedirs(workspace)
+    analyzer = AnalyzeKatana(**dict(analyze_info, workspace=workspace,
+                                    software_version="9.9v9"))
+    os.rmdir(workspace)
+    with pytest.raises(CGExeNotExistError):
+        analyzer.find_location()
+
+
+def test_katana_root(tmpdir, roots, monkeypatch, caplog):
+    """Test that KATANA_ROOT is followed through links or its skip logged."""
+    exe_path = _install(str(tmpdir), "4.5v1")
+    link = str(tmpdir.join("katana"))
+    os.symlink(os.path.dirname(exe_path), link)
+    monkeypatch.setenv("KATANA_ROOT", link)
+    assert discovery.scan("linux")["4.5v1"].exe_path == os.path.join(
+        link, "katana")
+
+    custom = str(tmpdir.mkdir("custom"))
+    monkeypatch.setenv("KATANA_ROOT", custom)
+    assert discovery.scan("linux") == {}
+    assert "its folder name does not give the Katana version" in caplog.text
+    monkeypatch.setenv("KATANA_ROOT", str(tmpdir.mkdir("Katana5.0v1")))
+    assert discovery.scan("linux") == {}
+    assert "holds no katana or bin/katanaBin" in caplog.text
+
+
+def test_near_miss_tip(analyze_info, roots):
+    """Test that a missing version suggests the installed close ones."""
+    _install(roots, "3.2v1")
+    _install(roots, "4.0v2")
+    analyzer = AnalyzeKatana(**dict(analyze_info, software_version="3.2v4"))
+    with pytest.raises(CGExeNotExistError):
+        analyzer.find_location()
+    message = analyzer.tips_info[tips_code.CG_NOTEXISTS][0]
+    assert "Katana 3.2v4 has not been found" in message
+    assert "close versions: 3.2v1." in message
+
+
+def test_find_location(analyze_info, roots):
+    """Test that find_location answers from the index."""
+    exe_path = _install(roots, "3.2v1")
+    analyzer = AnalyzeKatana(**analyze_info)
+    assert analyzer.find_location() == os.path.normpath(exe_path)
@@ -0,0 +1,140 @@
+"""Test for events.py."""
+
+# pylint: disable=import-error
+import asyncio
+import io
+import json
+import os
+import stat
+import sys
+
+import pytest
+from rayvision_utils.exception.exception import AnalyseFailError
+
+from rayvision_katana.analyse_katana import AnalyzeKatana
+from rayvision_katana.events import EventEmitter
+from rayvision_katana.events import format_event
+from rayvision_katana.events import parse_event
+from rayvision_katana.result_writer import ResultWriter
+
+# Plays the part of katana_analyse_script.main with the real writer.
+FAKE_SCRIPT = """
+import json, os, sys
+sys.path.insert(0, {package!r})
+from events import EventEmitter
+from result_writer import ResultWriter
+
+task_path = sys.argv[1]
+with open(os.path.join(task_path, "analyse_options.json")) as options:
+    emitter = EventEmitter() if json.load(options)["events"] else None
+writer = ResultWriter(task_path, hooks=[emitter] if emitter else None)
+writer.start_rendernodes()
+writer.declare_categories(["model", "image"])
+writer.add_rendernode("Render", {{"aov": {{}}, "frames": "1-10[1]"}})
+print("Katana says hello")
+writer.warn("render node Broken failed: no camera")
+for index in range(3):
+    writer.add_asset("image", {{"node": "Tex", "type": "ImageRead",
+                               "parameter": "file",
+                               "path": "/tex/%s.tx" % index}})
+writer.compact()
+with open(os.path.join(task_path, "tips.json"), "w") as tips:
+    tips.write("{{}}")
+"""
+
+
+@pytest.fixture()
+def streaming_katana(tmpdir):
+    """Get a ``.sh`` stand-in for katanaBin that streams its events."""
+    script = str(tmpdir.join("fake_script.py"))
+    with open(script, "w") as script_file:
+        script_file.write(FAKE_SCRIPT.format(package=os.path.dirname(
+            os.path.dirname(os.path.abspath(__file__)))))
+    exe_path = str(tmpdir.join("streaming_katana.sh"))
+    with open(exe_path, "w") as exe_file:
+        exe_file.write('#!/bin/sh\ncase "$3" in *broken*) exit 1 ;; esac\n'
+                       'exec "{}" "{}" "$2"\n'.format(sys.executable, script))
+    os.chmod(exe_path, os.stat(exe_path).st_mode | stat.S_IEXEC)
+    return exe_path
+
+
+def test_format_and_parse():
+    """Test that events survive the output line, other lines do not."""
+    line = format_event("asset", {"category": "image",
+                                  "record": {"path": u"/tex/模.tx"}})
+    assert parse_event(line.encode("utf-8") + b"\n") == {
+        "event": "asset", "category": "image",
+        "record": {"path": u"/tex/模.tx"}}
+    assert parse_event("Katana says hello") is None
+    assert parse_event(line[:-1]) is None
+
+
+def test_writer_hooks_and_emitter(tmpdir):
+    """Test that the writer hooks see the records as they are written."""
+    stream = io.StringIO()
+    writer = ResultWriter(str(tmpdir), hooks=[EventEmitter(stream, 60)])
+    writer.add_rendernode("Render", {"frames": "1-2[1]"})
+    writer.add_asset("image", {"path": "/a.tx"})
+    flushed = stream.getvalue()
+    writer.warn("careful")
+    writer.compact()
+    events = [parse_event(line) for line in stream.getvalue().splitlines()]
+    assert [event["event"] for event in events] == [
+        "rendernode", "asset", "warning"]
+    assert events[1] == {"event": "asset", "category": "image",
+                         "record": {"path": "/a.tx"}}
+    assert flushed.count("\n") == 2
+
+
+def test_iter_events_streams_katana(analyze_info, streaming_katana):
+    """Test that the events come while the json files stay the same."""
+    analyze = AnalyzeKatana(**analyze_info)
+    events = list(analyze.iter_events(streaming_katana, no_upload=True,
+                                      check_assets=False))
+    assert [event["event"] for event in events] == [
+        "rendernode", "warning", "asset", "asset", "asset"]
+    assert events[0]["info"] == {"aov": {}, "frames": "1-10[1]"}
+    assert [event["record"] for event in events[2:]] == \
+        analyze.asset_info["image"]
+    assert analyze.event_hooks == []
+
+    quiet = AnalyzeKatana(**analyze_info)
+    quiet.analyse(streaming_katana, no_upload=True, check_assets=False)
+    assert quiet.asset_info == analyze.asset_info
+    assert quiet.task_info["scene_info"] == analyze.task_info["scene_info"]
+
+
+def test_analyse_async_streams_katana(analyze_info, streaming_katana):
+    """Test that the coroutine passes the Katana events to the hooks."""
+    events = []
+    analyze = AnalyzeKatana(event_hooks=[events.append], **analyze_info)
+    asyncio.run(analyze.analyse_async(streaming_katana, no_upload=True,
+                                      check_assets=False))
+    assert [event["event"] for event in events] == [
+        "rendernode", "warning", "asset", "asset", "asset"]
+
+
+def test_cached_result_is_replayed(analyze_info, streaming_katana):
+    """Test that a result restored from the cache emits its events."""
+    AnalyzeKatana(result_cache=True, **analyze_info).analyse(
+        streaming_katana, no_upload=True, check_assets=False)
+    events = []
+    analyze = AnalyzeKatana(result_cache=True, event_hooks=[events.append],
+                            **analyze_info)
+    analyze.analyse(streaming_katana, no_upload=True)
+    assert [event["event"] for event in events] == [
+        "rendernode", "asset", "asset", "asset", "warning"]
+    assert events[-1]["message"] == "3 assets are missing"
+    with open(analyze.options_json) as options:
+        assert json.load(options)["events"] is True
+
+
+def test_iter_events_raises_failures(analyze_info, streaming_katana, tmpdir):
+    """Test that a failed analysis raises from the generator."""
+    broken = str(tmpdir.join("broken.katana"))
+    with open(broken, "w"):
+        pass
+    analyze_info["cg_file"] = broken
+    analyze = AnalyzeKatana(**analyze_info)
+    with pytest.raises(AnalyseFailError):
+        list(analyze.iter_events(streaming_katana))
@@ -0,0 +1,107 @@
+"""Test for filter_rules.py."""
+
+# pylint: disable=import-error
+import pytest
+
+from rayvision_katana.filter_rules import FilterRuleError
+from rayvision_katana.filter_rules import NamePatterns
+from rayvision_katana.filter_rules import RuleTable
+from rayvision_katana.filter_rules import compile_rules
+from rayvision_katana.filter_rules import parse_rules
+from rayvision_katana.tests.katana_mock import FakeNode
+
+FILTER = """
+#model:
+    {Alembic_In} : {abcAsset}
+
+#image:
+    #arnold
+        {ArnoldShadingNode} : {parameters.filename.value}   &&  {nodeType}=={image}
+    #renderman
+        {Material} : {shaders.prmanLightParams.lightColorMap.value}
+
+#klf&liveGroup:
+    {LiveGroup} : {source}  &&  {disable}=={1.0}
+"""
+
+
+def test_parse_rules():
+    """Test sections, renderers and conditions are parsed."""
+    rules = parse_rules(FILTER.splitlines())
+    assert [rule.category for rule in rules] == [
+        "model", "image", "image", "klf&liveGroup"]
+    assert rules[1].renderer == "arnold"
+    assert rules[1].conditions == (("nodeType", "image"),)
+    assert rules[2].renderer == "renderman"
+    assert rules[3].renderer is None
+    with pytest.raises(FilterRuleError):
+        parse_rules(["{Alembic_In} abcAsset"])
+    with pytest.raises(FilterRuleError):
+        parse_rules(["{LiveGroup} : {source} || {disable}=={1}"])
+
+
+def test_collect_applies_rules_by_type():
+    """Test one pass over the nodes applies all matching rules."""
+    table = RuleTable(parse_rules(FILTER.splitlines()))
+    nodes = [
+        FakeNode("abc", "Alembic_In", abcAsset="/cache/a.abc"),
+        FakeNode("tex", "ArnoldShadingNode", nodeType="image",
+                 parameters__filename__value="/tex/a.tx"),
+        FakeNode("noise", "ArnoldShadingNode", nodeType="noise",
+                 parameters__filename__value="/tex/ignored.tx"),
+        FakeNode("lg", "LiveGroup", source="/lg/a.livegroup", disable=1),
+        FakeNode("lg_off", "LiveGroup", source="/lg/b.livegroup", disable=0),
+        FakeNode("empty", "Alembic_In", abcAsset=""),
+        FakeNode("merge", "Merge"),
+    ]
+    found = list(table.collect(nodes))
+    assert [(category, record["path"]) for category, record in found] == [
+        ("model", "/cache/a.abc"),
+        ("image", "/tex/a.tx"),
+        ("klf&liveGroup", "/lg/a.livegroup"),
+    ]
+    assert found[1][1] == {"node": "tex", "type": "ArnoldShadingNode",
+                           "parameter": "parameters.filename.value",
+                           "path": "/tex/a.tx"}
+
+
+def test_compile_shipped_filter():
+    """Test the filter.txt shipped with the package compiles."""
+    table = compile_rules()
+    assert table.categories == ["model", "image", "klf&liveGroup", "hair",
+                                "proxy", "VDB", "USD", "OCIO"]
+    assert len(table.rules_for("Material")) == 5
+
+
+def test_legacy_filter_lines():
+    """Test the forms of the baseline filter.txt keep their meaning."""
+    table = RuleTable(parse_rules([
+        "#image:", "{PrmanShadingNode} : {PrmanShadingNode}",
+        "#procy:", "{ArnoldStandin} : {filename}"]))
+    assert table.categories == ["image", "proxy"]
+    texture = FakeNode("pxr", "PrmanShadingNode", nodeType="PxrTexture",
+                       parameters__filename__value="/tex/a.tex")
+    bump = FakeNode("bump", "PrmanShadingNode", nodeType="PxrBump",
+                    parameters__filename__value="/tex/b.tex")
+    assert [record["path"] for _, record in table.collect(
+        [texture, bump])] == ["/tex/a.tex"]
+
+
+def test_name_patterns_select_categories_and_nodes():
+    """Test the include and exclude patterns of names."""
+    patterns = NamePatterns(["Render_*", "Main"], "Render_*_old")
+    assert [patterns.matches(name) for name in (
+        "Render_key", "Render_key_old", "Main", "Other")] == [
+            True, False, True, False]
+    assert [node.getName() for node in patterns.select(
+        [FakeNode("Main", "Render"), FakeNode("Preview", "Render")])] == [
+            "Main"]
+    assert NamePatterns.from_dict(patterns.to_dict()).to_dict() == {
+        "include": ["Render_*", "Main"], "exclude": ["Render_*_old"]}
+    assert not NamePatterns.from_dict(None)
+
+    table = compile_rules()
+    assert table.select(NamePatterns()) is table
+    assert table.select(NamePatterns(exclude=["*o*"])).categories == [
+        "image", "hair", "VDB", "USD", "OCIO"]
+    assert table.select(NamePatterns("model")).categories == ["model"]
@@ -0,0 +1,53 @@
+"""Test for frames.py."""
+
+# pylint: disable=import-error
+import pytest
+
+from rayvision_katana.frames import FrameSet
+from rayvision_katana.frames import plan_chunks
+
+
+def test_parse_and_format():
+    """Test that the task.json and TimeRange formats round trip."""
+    assert str(FrameSet.parse("1-100[1]")) == "1-100[1]"
+    assert str(FrameSet.parse("1-10,11,12-20[1]")) == "1-20[1]"
+    assert str(FrameSet.parse("1-10x3[1]")) == "1-10[3]"
+    assert list(FrameSet.parse("-2-2[2],7")) == [-2, 0, 2, 7]
+    with pytest.raises(ValueError):
+        FrameSet.parse("1-a[1]")
+
+
+def test_large_ranges_stay_compact():
+    """Test that a million frames are not expanded."""
+    frames = FrameSet.from_range(1, 1000000)
+    assert len(frames) == 1000000
+    assert 999999 in frames
+    assert frames.ranges == ((1, 1000000, 1),)
+
+
+def test_union_and_intersection():
+    """Test the set operations on progressions with different steps."""
+    evens = FrameSet.from_range(0, 100, 2)
+    threes = FrameSet.from_range(0, 100, 3)
+    common = evens & threes
+    assert common.ranges == ((0, 96, 6),)
+    assert list(common) == list(range(0, 97, 6))
+    both = evens | threes
+    assert len(both) == len(set(range(0, 101, 2)) | set(range(0, 101, 3)))
+    assert list(both) == sorted(set(range(0, 101, 2)) | set(range(0, 101, 3)))
+    assert FrameSet.parse("1-5[1]") | FrameSet.parse("6-9[1]") == \
+        FrameSet.parse("1-9[1]")
+
+
+def test_chunks():
+    """Test that chunks are cut without expanding the frames."""
+    frames = FrameSet.parse("1-10[1],21-30[2]")
+    assert [str(chunk) for chunk in frames.chunks(4)] == [
+        "1-4[1]", "5-8[1]", "9-10[1],21-23[2]", "25-29[2]"]
+    assert sum(1 for _ in FrameSet.from_range(1, 10 ** 7).chunks(10 ** 5)) \
+        == 100
+    jobs = list(plan_chunks({"B": {"frames": "1-3[1]"},
+                             "A": {"frames": "1-5[1]"}}, 2))
+    assert [(job["rendernode"], job["frames"]) for job in jobs] == [
+        ("A", "1-2[1]"), ("A", "3-4[1]"), ("A", "5-5[1]"),
+        ("B", "1-2[1]"), ("B", "3-3[1]")]
@@ -0,0 +1,67 @@
+"""Test for hash_cache.py."""
+
+# pylint: disable=import-error
+import hashlib
+import os
+
+from rayvision_katana.hash_cache import HashCache
+
+
+def _write(path, data):
+    with open(path, "wb") as file_obj:
+        file_obj.write(data)
+
+
+def test_get_digest_uses_cache(tmpdir):
+    """Test an unchanged file is hashed only once."""
+    file_path = str(tmpdir.join("scene.katana"))
+    _write(file_path, b"katana")
+    calls = []
+
+    def compute(path):
+        calls.append(path)
+        return "digest"
+
+    cache = HashCache(str(tmpdir.join("cache.db")))
+    assert cache.get_digest(file_path, compute) == "digest"
+    assert cache.get_digest(file_path, compute) == "digest"
+    assert calls == [file_path]
+
+    # Another process sharing the database sees the digest too.
+    other = HashCache(str(tmpdir.join("cache.db")))
+    assert other.get_digest(file_path, compute) == "digest"
+    assert len(calls) == 1
+
+
+def test_get_digest_rehashes_changed_file(tmpdir):
+    """Test a change of size or mtime invalidates the digest."""
+    file_path = str(tmpdir.join("scene.katana"))
+    _write(file_path, b"v1")
+    cache = HashCache(str(tmpdir.join("cache.db")))
+    assert cache.get_digest(file_path) == hashlib.md5(b"v1").hexdigest()
+    _write(file_path, b"version2")
+    assert cache.get_digest(file_path) == hashlib.md5(b"version2").hexdigest()
+    assert cache.get_digest(str(tmpdir.join("missing"))) is None
+
+
+def test_evict_keeps_recent_entries(tmpdir):
+    """Test the cache is bounded to ``max_entries``."""
+    cache = HashCache(str(tmpdir.join("cache.db")), max_entries=2)
+    for index in range(4):
+        file_path = str(tmpdir.join("f{}".format(index)))
+        _write(file_path, b"x")
+        cache.get_digest(file_path)
+    cache.evict()
+    assert len(cache) == 2
+
+
+def test_get_file_md5(katana_analyze):
+    """Test ``get_file_md5`` goes through the workspace hash cache."""
+    _write(katana_analyze.cg_file, b"scene")
+    expected = hashlib.md5(b"scene").hexdigest()
+    assert katana_analyze.get_file_md5(katana_analyze.cg_file) == expected
+    assert len(katana_analyze.hash_cache) == 1
+    assert os.path.dirname(katana_analyze.hash_cache.db_path) == \
+        katana_analyze.workspace_root
+    assert katana_analyze.get_file_md5("missing.katana") == \
+        hashlib.md5().hexdigest()
@@ -0,0 +1,80 @@
+"""Test for hashing.py."""
+
+# pylint: disable=import-error
+import hashlib
+import os
+
+import pytest
+
+from rayvision_katana import hashing
+from rayvision_katana.analyse_katana import AnalyzeKatana
+from rayvision_katana.hash_cache import HashCache
+
+
+def _write(path, content):
+    with open(path, "wb") as data:
+        data.write(content)
+    return path
+
+
+@pytest.mark.parametrize("algorithm", ["md5", "blake2b"])
+def test_hash_file(tmpdir, monkeypatch, algorithm):
+    """Test buffered and memory-mapped reads give the hashlib digest."""
+    monkeypatch.setattr(hashing, "MMAP_MIN_SIZE", 64 * 1024)
+    monkeypatch.setattr(hashing, "MMAP_WINDOW", 64 * 1024)
+    for size in (0, 1000, 64 * 1024, 300 * 1024 + 7):
+        content = os.urandom(size)
+        path = _write(str(tmpdir.join("%s.bin" % size)), content)
+        assert hashing.hash_file(path, algorithm, buffer_size=4096) == \
+            hashlib.new(algorithm, content).hexdigest()
+
+
+def test_sample_file(tmpdir):
+    """Test the sampled fingerprint sees the head, middle and tail only."""
+    sample = 1024
+    content = bytearray(os.urandom(10 * sample))
+    path = _write(str(tmpdir.join("cache.abc")), content)
+    fingerprint = hashing.sample_file(path, sample_size=sample)
+
+    content[2 * sample] ^= 0xff
+    _write(path, content)
+    assert hashing.sample_file(path, sample_size=sample) == fingerprint
+    content[5 * sample] ^= 0xff
+    _write(path, content)
+    assert hashing.sample_file(path, sample_size=sample) != fingerprint
+
+    small = _write(str(tmpdir.join("small.tx")), b"small")
+    assert hashing.sample_file(small, sample_size=sample) == \
+        hashlib.md5(b"small").hexdigest()
+
+
+def test_hash_files_with_cache(tmpdir, monkeypatch):
+    """Test the bulk hashing, the missing files and the cached digests."""
+    paths = [_write(str(tmpdir.join("%s.tx" % index)), b"%d" % index)
+             for index in range(20)]
+    missing = str(tmpdir.join("missing.tx"))
+    cache = HashCache(str(tmpdir.join("hash_cache.db")))
+    digests = hashing.hash_files(paths + [missing, paths[0]], "blake2b",
+                                 workers=4, cache=cache)
+    assert len(digests) == 21
+    assert digests[missing] is None
+    assert digests[paths[3]] == hashlib.blake2b(b"3").hexdigest()
+    assert len(cache) == 20
+
+    monkeypatch.setattr(hashing, "hash_file", None)
+    assert hashing.hash_files(paths, "blake2b", cache=cache) == dict(
+        (path, digests[path]) for path in paths)
+    with pytest.raises(ValueError):
+        hashing.hash_files(paths, "nope")
+
+
+def test_analyzer_digests(analyze_info, tmpdir):
+    """Test the analyzer hashes with its algorithm."""
+    path = _write(str(tmpdir.join("a.tx")), b"a")
+    analyzer = AnalyzeKatana(hash_algorithm="blake2b", hash_cache=False,
+                             **analyze_info)
+    assert analyzer.get_file_digests([path, str(tmpdir.join("b.tx"))]) == {
+        path: hashlib.blake2b(b"a").hexdigest(),
+        str(tmpdir.join("b.tx")): hashlib.blake2b().hexdigest()}
+    with pytest.raises(ValueError):
+        AnalyzeKatana(hash_algorithm="nope", **analyze_info)
@@ -0,0 +1,85 @@
+"""Test for history.py."""
+
+# pylint: disable=import-error
+import json
+import os
+import time
+
+from rayvision_katana.analyse_katana import AnalyzeKatana
+
+
+def _write(path, content):
+    with open(path, "w") as asset:
+        asset.write(content)
+    return path.replace("\\", "/")
+
+
+def _analyse(analyze_info, paths, uploaded=True):
+    analyzer = AnalyzeKatana(incremental=True, **analyze_info)
+    analyzer.asset_info = {"model": [{"node": "n", "type": "Alembic_In",
+                                      "parameter": "abcAsset", "path": path}
+                                     for path in paths]}
+    analyzer.write_upload_json()
+    if uploaded:
+        analyzer.record_uploaded()
+    with open(analyzer.manifest_json) as manifest_file:
+        manifest = json.load(manifest_file)
+    return analyzer, manifest
+
+
+def _uploaded(analyzer):
+    return sorted(entry["local"] for entry in analyzer.upload_info["asset"])
+
+
+def test_delta_upload(analyze_info, tmpdir, monkeypatch):
+    """Test that only new or changed files are uploaded again."""
+    first = _write(str(tmpdir.join("a.abc")), "a")
+    second = _write(str(tmpdir.join("b.abc")), "b")
+    scene = analyze_info["cg_file"].replace("\\", "/")
+
+    analyzer, manifest = _analyse(analyze_info, [first, second])
+    assert _uploaded(analyzer) == sorted([scene, first, second])
+    assert len(manifest["asset"]) == 3
+    assert all(entry["hash"] for entry in manifest["asset"])
+
+    # Same content with a new mtime is hashed again but not uploaded.
+    later = time.time() + 10
+    os.utime(first, (later, later))
+    _write(second, "changed")
+    os.utime(second, (later, later))
+    hashed = []
+    original = AnalyzeKatana.get_file_digests
+    monkeypatch.setattr(AnalyzeKatana, "get_file_digests",
+                        lambda self, paths: hashed.extend(paths)
+                        or original(self, paths))
+    analyzer, manifest = _analyse(analyze_info, [first, second])
+    assert _uploaded(analyzer) == [second]
+    assert sorted(hashed) == sorted([first, second])
+    assert len(manifest["asset"]) == 3
+
+    # A dropped asset is reported and nothing else is hashed.
+    del hashed[:]
+    analyzer, manifest = _analyse(analyze_info, [second])
+    assert _uploaded(analyzer) == []
+    assert manifest["removed"] == [first]
+    assert hashed == []
+
+
+def test_forget_history(analyze_info, tmpdir):
+    """Test that forgetting the history uploads everything again."""
+    asset = _write(str(tmpdir.join("a.abc")), "a")
+    analyzer, _ = _analyse(analyze_info, [asset])
+    analyzer.forget_history()
+    analyzer, _ = _analyse(analyze_info, [asset])
+    assert asset in _uploaded(analyzer)
+
+
+def test_history_waits_for_the_upload(analyze_info, tmpdir):
+    """Test that an analysis whose upload did not succeed changes nothing."""
+    asset = _write(str(tmpdir.join("a.abc")), "a")
+    analyzer, _ = _analyse(analyze_info, [asset], uploaded=False)
+    assert analyzer.history.load(analyzer.cg_file) is None
+    analyzer, _ = _analyse(analyze_info, [asset])
+    assert asset in _uploaded(analyzer)
+    analyzer, _ = _analyse(analyze_info, [asset])
+    assert _uploaded(analyzer) == []
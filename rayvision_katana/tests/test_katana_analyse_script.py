@@ -0,0 +1,90 @@
+"""Test for Analyse.py and katana_analyse_script.py on the mock Katana API."""
+
+# pylint: disable=import-error
+import json
+import logging
+
+from rayvision_katana.analyse_katana import AnalyzeKatana
+
+SCENE = {"nodes": [
+    {"name": "shot_abc", "type": "Alembic_In",
+     "parameters": {"abcAsset": "/cache/shot.abc"}},
+    {"name": "tex", "type": "ArnoldShadingNode",
+     "parameters": {"nodeType": "image",
+                    "parameters.filename.value": "/tex/wood.tx"}},
+    {"name": "Render", "type": "Render", "inputs": ["shot_abc"],
+     "parameters": {"farmSettings.activeFrameRange.start": 1,
+                    "farmSettings.activeFrameRange.end": 10},
+     "outputs": {"primary": "/out/beauty.exr",
+                 "deep": "/tmp/Temp/deep.exr"}},
+    {"name": "Render_preview", "type": "Render", "inputs": ["tex"],
+     "parameters": {"farmSettings.activeFrameRange.start": 1,
+                    "farmSettings.activeFrameRange.end": 1},
+     "outputs": {"primary": "/out/preview.exr"}},
+]}
+
+
+def _scene(analyze_info):
+    with open(analyze_info["cg_file"], "w") as scene:
+        json.dump(SCENE, scene)
+    return analyze_info
+
+
+def test_analyse_runs_the_script(analyze_info, mock_katana):
+    """Test that katanaBin runs the script with every analysis."""
+    analyzer = AnalyzeKatana(**_scene(analyze_info))
+    analyzer.analyse(exe_path=mock_katana, no_upload=True,
+                     check_assets=False)
+    assert analyzer.task_info["scene_info"]["rendernodes"] == {
+        "Render": {"aov": {"primary": "/out/beauty.exr"},
+                   "frames": "1-10[1]", "denoise": "0", "renderable": "1"},
+        "Render_preview": {"aov": {"primary": "/out/preview.exr"},
+                           "frames": "1-1[1]", "denoise": "0",
+                           "renderable": "1"}}
+    assert [record["path"] for record in analyzer.asset_info["model"]] == [
+        "/cache/shot.abc"]
+    assert [record["path"] for record in analyzer.asset_info["image"]] == [
+        "/tex/wood.tx"]
+
+
+def test_selection_reaches_katana(analyze_info, mock_katana, caplog):
+    """Test that the other render nodes are not evaluated at all."""
+    caplog.set_level(logging.INFO)
+    analyzer = AnalyzeKatana(event_hooks=[lambda event: None],
+                             **_scene(analyze_info))
+    analyzer.analyse(exe_path=mock_katana, no_upload=True,
+                     check_assets=False, rendernodes="Render",
+                     categories="model")
+    assert list(analyzer.task_info["scene_info"]["rendernodes"]) == [
+        "Render"]
+    assert list(analyzer.asset_info) == ["model"]
+    assert "evaluating Render" in caplog.text
+    assert "evaluating Render_preview" not in caplog.text
+
+
+def test_events_stream_from_katana(analyze_info, mock_katana,
+                                  monkeypatch):
+    """Test that the script katanaBin runs prints the events live."""
+    events = []
+    analyzer = AnalyzeKatana(event_hooks=[events.append],
+                             **_scene(analyze_info))
+    monkeypatch.setattr(analyzer, "replay_events", None)
+    analyzer.analyse(exe_path=mock_katana, no_upload=True,
+                     check_assets=False)
+    assert analyzer._events_streamed  # pylint: disable=protected-access
+    assert sorted(event["name"] for event in events
+                  if event["event"] == "rendernode") == [
+                      "Render", "Render_preview"]
+    assert sorted(event["record"]["path"] for event in events
+                  if event["event"] == "asset") == [
+                      "/cache/shot.abc", "/tex/wood.tx"]
+
+
+def test_dependency_mode_reaches_katana(analyze_info, mock_katana):
+    """Test that the assets are attributed to the render nodes using them."""
+    analyzer = AnalyzeKatana(dependency_mode=True, **_scene(analyze_info))
+    analyzer.analyse(exe_path=mock_katana, no_upload=True,
+                     check_assets=False, rendernodes="Render")
+    assert [(category, record["path"], record["render_nodes"])
+            for category, record in analyzer.iter_assets()] == [
+                ("model", "/cache/shot.abc", ["Render"])]
@@ -0,0 +1,92 @@
+"""Test for node_graph.py."""
+
+# pylint: disable=import-error
+from rayvision_katana.node_graph import DependencyGraph
+from rayvision_katana.node_graph import dependency_nodes
+from rayvision_katana.tests.katana_mock import FakeNode
+
+
+def _shot():
+    """Two render nodes sharing a merge, with unused and bypassed nodes."""
+    nodes = {name: FakeNode(name, node_type) for name, node_type in (
+        ("abc", "Alembic_In"), ("tex", "ArnoldShadingNode"),
+        ("material", "NetworkMaterial"), ("merge", "Merge"),
+        ("crowd", "Alembic_In"), ("proxy", "Alembic_In"),
+        ("switch", "Merge"), ("unused", "ArnoldShadingNode"),
+        ("beauty", "Render"), ("crowd_pass", "Render"))}
+    nodes["material"].connect(nodes["tex"])
+    nodes["merge"].connect(nodes["abc"], nodes["material"])
+    nodes["switch"].connect(nodes["crowd"], nodes["proxy"])
+    nodes["switch"].bypassed = True
+    nodes["beauty"].connect(nodes["merge"])
+    nodes["crowd_pass"].connect(nodes["merge"], nodes["switch"])
+    return nodes
+
+
+def test_attribute_render_nodes():
+    """Test the walk, the attribution and that bypassed nodes are skipped."""
+    nodes = _shot()
+    graph = DependencyGraph()
+    owners = graph.attribute([nodes["beauty"], nodes["crowd_pass"]])
+    assert owners == {
+        "abc": ["beauty", "crowd_pass"],
+        "tex": ["beauty", "crowd_pass"],
+        "material": ["beauty", "crowd_pass"],
+        "merge": ["beauty", "crowd_pass"],
+        "beauty": ["beauty"],
+        "crowd": ["crowd_pass"],
+        "crowd_pass": ["crowd_pass"],
+    }
+    # The shared subgraph is read once.
+    assert nodes["merge"].calls == 1
+    assert nodes["tex"].calls == 1
+    assert nodes["unused"].calls == 0
+    assert graph.reachable(nodes["beauty"]) == frozenset(
+        ["abc", "tex", "material", "merge", "beauty"])
+
+
+def test_groups_are_taken_whole():
+    """Test that the children of an upstream group are used."""
+    group = FakeNode("shading", "Group")
+    tex = FakeNode("tex", "ArnoldShadingNode")
+    tex.connect(group)
+    group.children = [tex]
+    render = FakeNode("beauty", "Render").connect(group)
+    assert DependencyGraph().reachable(render) == frozenset(
+        ["shading", "tex", "beauty"])
+
+
+def test_dependency_nodes_keep_global_nodes():
+    """Test that the root node applies to every render node."""
+    nodes = _shot()
+    root = FakeNode("rootNode", "RootNode")
+    used, owners = dependency_nodes([nodes["beauty"], nodes["crowd_pass"]],
+                                    [root])
+    assert [node.getName() for node in used] == sorted(
+        ["abc", "tex", "material", "merge", "beauty", "crowd", "crowd_pass",
+         "rootNode"])
+    assert owners["rootNode"] == ["beauty", "crowd_pass"]
+
+
+def test_shared_nodes_cache_their_reachable_nodes():
+    """Test that the second walk through a node caches what it reaches."""
+    nodes = _shot()
+    graph = DependencyGraph()
+    graph.attribute([nodes["beauty"], nodes["crowd_pass"]])
+    # pylint: disable=protected-access
+    assert sorted(graph._reachable) == ["beauty", "crowd_pass", "merge"]
+    assert graph._reachable["merge"] == frozenset(
+        ["abc", "tex", "material", "merge"])
+
+
+def test_cycles_reach_each_other():
+    """Test a group whose child leads back to the group."""
+    group = FakeNode("shading", "Group")
+    tex = FakeNode("tex", "ArnoldShadingNode").connect(group)
+    material = FakeNode("material", "NetworkMaterial").connect(tex)
+    group.children = [material]
+    group.connect(FakeNode("abc", "Alembic_In"))
+    graph = DependencyGraph()
+    assert graph.reachable(tex) == frozenset(
+        ["shading", "tex", "material", "abc"])
+    assert graph.reachable(material) == graph.reachable(tex)
@@ -0,0 +1,193 @@
+"""Test for offline_parser.py."""
+
+# pylint: disable=import-error
+import gzip
+import json
+import os
+
+from rayvision_katana.analyse_katana import AnalyzeKatana
+from rayvision_katana.filter_rules import NamePatterns
+from rayvision_katana.offline_parser import analyse_scene
+from rayvision_katana.offline_parser import iter_nodes
+
+SCENE = """<?xml version="1.0" encoding="UTF-8"?>
+<katana release="3.2v1" version="3.2.1.000001">
+  <node name="rootNode" type="RootNode">
+    <group_parameter name="rootNode">
+      <string_parameter name="OCIO" value=""/>
+    </group_parameter>
+    <node name="Alembic_In" type="Alembic_In">
+      <port name="out" type="out"/>
+      <group_parameter name="Alembic_In">
+        <string_parameter name="abcAsset" value="/cache/shot.abc"/>
+      </group_parameter>
+    </node>
+    <node name="tex" type="ArnoldShadingNode">
+      <group_parameter name="tex">
+        <string_parameter name="nodeType" value="image"/>
+        <group_parameter name="parameters">
+          <group_parameter name="filename">
+            <string_parameter name="value" value="{texture}"/>
+          </group_parameter>
+        </group_parameter>
+      </group_parameter>
+    </node>
+    <node name="beauty" type="RenderOutputDefine">
+      <port name="input" type="in" source="Alembic_In.out"/>
+      <port name="out" type="out"/>
+      <group_parameter name="beauty">
+        <string_parameter name="outputName" value="primary"/>
+        <group_parameter name="args">
+          <group_parameter name="renderSettings">
+            <group_parameter name="outputs">
+              <group_parameter name="outputName">
+                <group_parameter name="locationType">
+                  <string_parameter name="value" value="file"/>
+                </group_parameter>
+                <group_parameter name="locationSettings">
+                  <group_parameter name="renderLocation">
+                    <string_parameter name="value" value="/out/beauty.exr"/>
+                  </group_parameter>
+                </group_parameter>
+              </group_parameter>
+            </group_parameter>
+          </group_parameter>
+        </group_parameter>
+      </group_parameter>
+    </node>
+    <node name="Render" type="Render">
+      <port name="input" type="in" source="beauty.out"/>
+      <group_parameter name="Render">
+        <group_parameter name="farmSettings">
+          <group_parameter name="activeFrameRange">
+            <number_parameter name="start" value="1"/>
+            <number_parameter name="end" value="{end}"/>
+          </group_parameter>
+        </group_parameter>
+      </group_parameter>
+    </node>
+  </node>
+</katana>
+"""
+
+
+def _scene(path, texture="/tex/a.tx", end="100", compress=False):
+    data = SCENE.format(texture=texture, end=end).encode("utf-8")
+    opener = gzip.open if compress else open
+    with opener(path, "wb") as scene:
+        scene.write(data)
+    return path
+
+
+def _load(path):
+    with open(path) as json_file:
+        return json.load(json_file)
+
+
+def test_iter_nodes_reads_parameters(tmpdir):
+    """Test nodes, parameters and connections are read from the xml."""
+    cg_file = _scene(str(tmpdir.join("scene.katana")), compress=True)
+    nodes = {node.getName(): node for node in iter_nodes(cg_file)}
+    assert nodes["Alembic_In"].getParameter("abcAsset").getValue(0) == \
+        "/cache/shot.abc"
+    assert nodes["Render"].inputs == ["beauty"]
+    assert nodes["rootNode"].has_children
+
+
+def test_analyse_scene(tmpdir):
+    """Test the offline analysis writes the same layouts as Katana."""
+    cg_file = _scene(str(tmpdir.join("scene.katana")))
+    result = analyse_scene(cg_file, str(tmpdir))
+    assert result.resolved
+    task_info = _load(str(tmpdir.join("task.json")))
+    assert task_info["scene_info"]["rendernodes"] == {"Render": {
+        "aov": {"primary": "/out/beauty.exr"},
+        "frames": "1-100[1]",
+        "denoise": "0",
+        "renderable": "1",
+    }}
+    asset_info = _load(str(tmpdir.join("asset.json")))
+    assert [item["path"] for item in asset_info["model"]] == [
+        "/cache/shot.abc"]
+    assert [item["path"] for item in asset_info["image"]] == ["/tex/a.tx"]
+
+
+def test_output_without_location_is_unresolved(tmpdir):
+    """Test that a file output Katana has to locate is reported."""
+    cg_file = str(tmpdir.join("scene.katana"))
+    with open(cg_file, "w") as scene:
+        scene.write(SCENE.format(texture="/tex/a.tx", end="100").replace(
+            'value="/out/beauty.exr"', 'value=""'))
+    result = analyse_scene(cg_file, str(tmpdir))
+    assert result.unresolved == ["Render: beauty.renderLocation"]
+
+
+def test_downstream_outputs_override(tmpdir):
+    """Test that the output nearest the render node wins and Temp is not."""
+    start = SCENE.index('    <node name="beauty"')
+    end = SCENE.index('    <node name="Render"')
+    rod = SCENE[start:end]
+    outputs = "".join(
+        rod.replace('"beauty"', '"%s"' % name)
+        .replace("Alembic_In.out", source)
+        .replace('value="primary"', 'value="%s"' % output)
+        .replace("/out/beauty.exr", path)
+        for name, source, output, path in (
+            ("beauty_v2", "beauty.out", "primary", "/out/beauty_v2.exr"),
+            ("deep", "beauty_v2.out", "deep", "/out/Temp/deep.exr")))
+    cg_file = str(tmpdir.join("scene.katana"))
+    with open(cg_file, "w") as scene:
+        scene.write(SCENE.format(texture="/tex/a.tx", end="100").replace(
+            'source="beauty.out"/>\n      <group_parameter name="Render">',
+            'source="deep.out"/>\n      <group_parameter name="Render">')
+                    .replace('    <node name="Render"',
+                             outputs + '    <node name="Render"'))
+    assert analyse_scene(cg_file, str(tmpdir)).resolved
+    task_info = _load(str(tmpdir.join("task.json")))
+    assert task_info["scene_info"]["rendernodes"]["Render"]["aov"] == {
+        "primary": "/out/beauty_v2.exr"}
+
+
+def test_analyse_falls_back_to_katana(analyze_info, fake_katana):
+    """Test an expression the parser cannot evaluate runs Katana instead."""
+    _scene(analyze_info["cg_file"])
+    analyzer = AnalyzeKatana(analyse_mode="offline", **analyze_info)
+    analyzer.analyse(exe_path=fake_katana)
+    assert analyzer.task_info["scene_info"]["rendernodes"]["Render"][
+        "frames"] == "1-100[1]"
+
+    with open(analyze_info["cg_file"], "w") as scene:
+        scene.write(SCENE.format(texture="/tex/a.tx", end="100").replace(
+            'value="/tex/a.tx"', "expression=\"getenv('TEX', '')\""))
+    analyzer = AnalyzeKatana(analyse_mode="offline", **analyze_info)
+    analyzer.analyse(exe_path=fake_katana)
+    # The stand-in Katana writes an empty asset.json.
+    assert analyzer.asset_info == {}
+    assert not os.path.exists(os.path.join(analyzer.workspace, "stream"))
+
+
+def test_analyse_scene_dependency_mode(tmpdir):
+    """Test that only the assets upstream of a render node are kept."""
+    cg_file = _scene(str(tmpdir.join("scene.katana")))
+    result = analyse_scene(cg_file, str(tmpdir), dependency_mode=True)
+    assert result.resolved
+    assert result.assets == 1
+    asset_info = _load(str(tmpdir.join("asset.json")))
+    assert asset_info["model"] == [{
+        "node": "Alembic_In", "type": "Alembic_In", "parameter": "abcAsset",
+        "path": "/cache/shot.abc", "render_nodes": ["Render"]}]
+    # The texture node is not connected to the render node.
+    assert asset_info["image"] == []
+
+
+def test_analyse_scene_selection(tmpdir):
+    """Test that only the selected render nodes and categories are kept."""
+    cg_file = _scene(str(tmpdir.join("scene.katana")))
+    result = analyse_scene(cg_file, str(tmpdir),
+                           rendernodes=NamePatterns(exclude="Render"),
+                           categories=NamePatterns("image"))
+    assert result.resolved
+    assert result.rendernodes == 0
+    asset_info = _load(str(tmpdir.join("asset.json")))
+    assert list(asset_info) == ["image"]
+    assert [item["path"] for item in asset_info["image"]] == ["/tex/a.tx"]
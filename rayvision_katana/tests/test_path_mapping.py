@@ -0,0 +1,62 @@
+"""Test for path_mapping.py."""
+
+# pylint: disable=import-error
+from rayvision_utils.utils import convert_path
+
+from rayvision_katana.analyse_katana import AnalyzeKatana
+from rayvision_katana.path_mapping import PathMapper
+
+PATHS = [
+    "D:/work/render/c05/112132P-embery.jpg",
+    "D:\\work\\render\\c05\\wood.<UDIM>.tx",
+    "d:/a:b/c:d.tx",
+    "//fs01/share/textures/sky.exr",
+    "\\\\fs01\\share\\textures\\sky.exr",
+    "/mnt/projects/show/shot.abc",
+    "/shot.abc",
+    "relative/shot.abc",
+    "ab",
+]
+
+
+def test_same_as_convert_path():
+    """Test that the mapper without remaps matches convert_path."""
+    mapper = PathMapper()
+    assert [mapper.convert(path) for path in PATHS] == [
+        convert_path(path) for path in PATHS]
+    assert mapper.map_many(PATHS) == [
+        (path.replace("\\", "/"), convert_path(path)) for path in PATHS]
+
+
+def test_remaps():
+    """Test that the longest remapped folder prefix wins."""
+    mapper = PathMapper({
+        "/mnt/projects": "/P/projects",
+        "/mnt/projects/show/cache/": "/cache/show",
+        "\\\\fs01\\share": "/S",
+        "X:": "/X_drive",
+    })
+    assert mapper.convert("/mnt/projects/show/a.tx") == \
+        "/P/projects/show/a.tx"
+    assert mapper.convert("/mnt/projects/show/cache/v1/a.abc") == \
+        "/cache/show/v1/a.abc"
+    assert mapper.convert("//fs01/share/sky.exr") == "/S/sky.exr"
+    assert mapper.convert("X:\\tex\\a:b.tx") == "/X_drive/tex/a:b.tx"
+    # Prefixes only match whole folders.
+    assert mapper.convert("/mnt/projects2/a.tx") == "mnt/projects2/a.tx"
+    assert mapper.convert("D:/tex/a.tx") == "/D/tex/a.tx"
+
+
+def test_upload_json_remaps(analyze_info, tmpdir):
+    """Test that upload.json uses the site remaps."""
+    texture = tmpdir.join("tex", "a.tx")
+    texture.write("a", ensure=True)
+    local = str(texture).replace("\\", "/")
+    folder = str(tmpdir).replace("\\", "/")
+    analyzer = AnalyzeKatana(path_remaps={folder: "/site"}, **analyze_info)
+    analyzer.asset_info = {"image": [{"node": "n", "type": "Material",
+                                      "parameter": "p", "path": local}]}
+    analyzer.write_upload_json()
+    entries = dict((entry["local"], entry["server"])
+                   for entry in analyzer.upload_info["asset"])
+    assert entries[local] == "/site/tex/a.tx"
@@ -0,0 +1,138 @@
+"""Test for references.py."""
+
+# pylint: disable=import-error
+import os
+import threading
+
+from rayvision_katana.analyse_katana import AnalyzeKatana
+from rayvision_katana.references import ReferenceResolver
+from rayvision_katana.references import scan_paths
+
+LIVEGROUP = """<?xml version="1.0" encoding="UTF-8"?>
+<katana release="3.2v1">
+  <node name="{name}" type="LiveGroup">
+    <node name="{name}_abc" type="Alembic_In">
+      <group_parameter name="{name}_abc">
+        <string_parameter name="abcAsset" value="{abc}"/>
+      </group_parameter>
+    </node>
+    <node name="{name}_look" type="LookFileMaterialsIn">
+      <group_parameter name="{name}_look">
+        <string_parameter name="lookfile" value="{reference}"/>
+      </group_parameter>
+    </node>
+  </node>
+</katana>
+"""
+
+
+def _write(path, content):
+    with open(path, "wb") as reference:
+        reference.write(content)
+    return path.replace("\\", "/")
+
+
+def _livegroup(path, name, abc, reference):
+    return _write(path, LIVEGROUP.format(name=name, abc=abc,
+                                         reference=reference).encode("utf-8"))
+
+
+def test_scan_paths_across_chunks(tmpdir):
+    """Test that embedded paths are found whatever the chunk boundaries."""
+    paths = ["/tex/wood.<UDIM>.tx", "C:/tex/sky.exr", "/cache/shot.abc",
+             "//server/share/look.klf"]
+    data = b""
+    for index, path in enumerate(paths * 20):
+        noise = os.urandom(97 + index * 13)
+        data += noise.replace(b"/", b"\0").replace(b"\\", b"\0")
+        data += b"\x00" + path.encode("utf-8") + b"\x00"
+    data += b"/not/a/path.bak /tex/notes.tx.bak"
+    scanned = _write(str(tmpdir.join("look.klf")), data)
+    assert list(scan_paths(scanned)) == paths
+    assert list(scan_paths(scanned, chunk_size=61)) == paths
+
+
+def test_scan_paths_in_text(tmpdir):
+    """Test that a path stops at whitespace and long text stays fast."""
+    text = _write(str(tmpdir.join("notes.klf")),
+                  b"<p>/root/mat use /tex/b.exr</p> C:\\tex\\c.tx, "
+                  b"a/b/d.tx\n" + b"/" * 200000 + b" x/" * 200000)
+    assert list(scan_paths(text)) == ["/tex/b.exr", "C:\\tex\\c.tx"]
+
+
+def test_resolve_mixed_slashes(tmpdir):
+    """Test that a cycle written with backslashes is detected."""
+    first = str(tmpdir.join("first.livegroup")).replace("\\", "/")
+    second = str(tmpdir.join("second.livegroup")).replace("\\", "/")
+    _livegroup(first, "first", "/cache/first.abc", second)
+    _livegroup(second, "second", "/cache/second.abc",
+               first.replace("/", "\\"))
+    resolved = ReferenceResolver().resolve([first])
+    assert resolved.cycles == [[first, second, first]]
+
+
+def test_resolve_recursively(tmpdir):
+    """Test nested references, the file cache and cycle detection."""
+    klf = _write(str(tmpdir.join("look.klf")),
+                 b"\x00\x12/tex/skin.tx\x00\x09/tex/eyes.exr\x00")
+    second = str(tmpdir.join("second.livegroup")).replace("\\", "/")
+    first = _livegroup(str(tmpdir.join("first.livegroup")), "first",
+                       "/cache/first.abc", second)
+    _livegroup(second, "second", "/cache/second.abc", first)
+    _livegroup(str(tmpdir.join("third.livegroup")), "third",
+               "/cache/third.abc", klf)
+
+    resolver = ReferenceResolver()
+    resolved = resolver.resolve([first, str(tmpdir.join("third.livegroup")),
+                                 "/tex/other.tx",
+                                 str(tmpdir.join("gone.klf"))])
+    paths = sorted(record["path"] for _, record in resolved.assets)
+    assert paths == sorted([
+        "/cache/first.abc", "/cache/second.abc", "/cache/third.abc",
+        first, second, klf, "/tex/skin.tx", "/tex/eyes.exr"])
+    assert resolved.cycles == [[first, second, first]]
+    assert resolved.missing == [str(tmpdir.join("gone.klf")).replace(
+        "\\", "/")]
+    assert resolver.reads == 4
+
+    asset_info = {"model": [{"node": "n", "type": "Alembic_In",
+                             "parameter": "abcAsset",
+                             "path": "/cache/first.abc"}]}
+    assert resolver.resolve([klf]).merge_into(asset_info) == 2
+    assert [record["reference"] for record in asset_info["image"]] == [
+        klf, klf]
+    assert resolver.reads == 4
+
+    _write(klf, b"\x00/tex/skin_v2.tx\x00" + b"\x00" * 64)
+    assert [record["path"] for _, record in resolver.resolve([klf]).assets] \
+        == ["/tex/skin_v2.tx"]
+    assert resolver.reads == 5
+
+
+def test_shared_file_is_read_once(tmpdir):
+    """Test that concurrent analyses of a batch read a file once."""
+    klf = _write(str(tmpdir.join("look.klf")), b"\x00/tex/skin.tx\x00")
+    resolver = ReferenceResolver()
+    threads = [threading.Thread(target=resolver.resolve, args=([klf],))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert resolver.reads == 1
+
+
+def test_analysis_uploads_referenced_assets(analyze_info, tmpdir):
+    """Test that referenced assets reach asset.json and upload.json."""
+    texture = _write(str(tmpdir.join("skin.tx")), b"tx")
+    klf = _write(str(tmpdir.join("look.klf")),
+                 b"\x00" + texture.encode("utf-8") + b"\x00")
+    analyzer = AnalyzeKatana(references=True, **analyze_info)
+    analyzer.asset_info = {"klf&liveGroup": [{
+        "node": "look", "type": "LookFileMaterialsIn",
+        "parameter": "lookfile", "path": klf}]}
+    analyzer.resolve_references()
+    assert analyzer.asset_info["image"][0]["path"] == texture
+    analyzer.write_upload_json()
+    assert texture in [entry["local"]
+                       for entry in analyzer.upload_info["asset"]]
@@ -0,0 +1,94 @@
+"""Test for result_cache.py."""
+
+# pylint: disable=import-error
+import json
+import os
+
+from rayvision_katana import result_cache
+from rayvision_katana.analyse_katana import AnalyzeKatana
+from rayvision_katana.result_cache import ResultCache
+
+
+def _entry(workspace, scene_info):
+    if not os.path.exists(workspace):
+        os.makedirs(workspace)
+    for name, data in (("task.json", {"scene_info": scene_info}),
+                       ("asset.json", {}), ("tips.json", {})):
+        with open(os.path.join(workspace, name), "w") as result:
+            json.dump(data, result)
+    return workspace
+
+
+def test_make_key_changes_with_inputs():
+    """Test every input of the key changes it."""
+    key = ResultCache.make_key("hash", "3.2v1", {"KtoA": "2.4.0.3"})
+    assert key == ResultCache.make_key("hash", "3.2v1", {"KtoA": "2.4.0.3"})
+    assert key != ResultCache.make_key("other", "3.2v1", {"KtoA": "2.4.0.3"})
+    assert key != ResultCache.make_key("hash", "3.5v1", {"KtoA": "2.4.0.3"})
+    assert key != ResultCache.make_key("hash", "3.2v1", {"KtoA": "3.0.0.0"})
+
+
+def test_store_get_and_evict(tmpdir):
+    """Test entries round trip and the oldest one is evicted."""
+    cache = ResultCache(str(tmpdir.join("cache")), max_entries=2)
+    for index in range(3):
+        workspace = _entry(str(tmpdir.join(str(index))), {"index": index})
+        cache.store("key{}".format(index), workspace)
+        os.utime(cache.entry_path("key{}".format(index)),
+                 (index, index))
+    cache.evict()
+    assert cache.get("key0") is None
+    assert cache.get("key2") is not None
+    cache.invalidate("key2")
+    assert cache.get("key2") is None
+    cache.clear()
+    assert cache.get("key1") is None
+
+
+def test_concurrent_store(tmpdir):
+    """Test that storing a key another analysis just stored succeeds."""
+    cache = ResultCache(str(tmpdir.join("cache")))
+    cache.store("key", _entry(str(tmpdir.join("first")), {"index": 1}))
+    # The other analysis renames its entry between invalidate and rename.
+    cache.invalidate = lambda key: None
+    cache.store("key", _entry(str(tmpdir.join("second")), {"index": 2}))
+    with open(os.path.join(cache.get("key"), "task.json")) as task:
+        assert json.load(task) == {"scene_info": {"index": 1}}
+    assert os.listdir(cache.root) == ["key"]
+
+
+def test_analyse_skips_katana_on_hit(analyze_info, fake_katana, tmpdir):
+    """Test a second analysis of the same scene does not run Katana."""
+    first = AnalyzeKatana(result_cache=True, **analyze_info)
+    first.analyse(exe_path=fake_katana)
+
+    analyze_info["workspace"] = str(tmpdir.mkdir("second"))
+    analyze_info["project_name"] = "Project2"
+    cache = first.result_cache
+    second = AnalyzeKatana(result_cache=cache, **analyze_info)
+    # A missing executable proves Katana is not started.
+    second.analyse(exe_path=str(tmpdir.join("missing.sh")))
+    assert second.task_info["task_info"]["project_name"] == "Project2"
+    assert second.asset_info == {}
+
+    second.invalidate_result_cache()
+    assert cache.get(second.result_cache_key()) is None
+
+
+def test_script_version_covers_compiled_modules(monkeypatch):
+    """Test that the compiled modules shipped to Katana are hashed."""
+    version = result_cache.analyse_script_version()
+    monkeypatch.setattr(result_cache, "_SCRIPT_VERSION", [])
+    monkeypatch.setattr(result_cache, "ANALYSIS_MODULES", ())
+    assert result_cache.analyse_script_version() != version
+    monkeypatch.setattr(result_cache, "_SCRIPT_VERSION", [])
+    monkeypatch.setattr(result_cache, "ANALYSIS_FILES", ("Analyse.py",))
+    assert result_cache.analyse_script_version() != version
+
+
+def test_key_depends_on_analyse_mode(analyze_info):
+    """Test that offline and Katana analyses are cached apart."""
+    katana = AnalyzeKatana(result_cache=True, **analyze_info)
+    offline = AnalyzeKatana(result_cache=True, analyse_mode="offline",
+                            **analyze_info)
+    assert katana.result_cache_key() != offline.result_cache_key()
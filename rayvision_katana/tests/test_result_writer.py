@@ -0,0 +1,54 @@
+"""Test for result_writer.py."""
+
+# pylint: disable=import-error
+import json
+import os
+
+from rayvision_katana.result_writer import ResultWriter
+from rayvision_katana.result_writer import STREAM_FOLDER
+
+
+def _load(path):
+    with open(path) as json_file:
+        return json.load(json_file)
+
+
+def test_compact_produces_task_and_asset_json(tmpdir):
+    """Test streamed records end up in the current json layouts."""
+    task_path = str(tmpdir)
+    with open(os.path.join(task_path, "task.json"), "w") as task_file:
+        json.dump({"task_info": {"project_name": "Project1"}}, task_file)
+
+    writer = ResultWriter(task_path)
+    writer.start_rendernodes()
+    writer.declare_categories(["model", "image", "USD"])
+    writer.add_rendernode("Render1", {"aov": {}, "frames": "1-10[1]"})
+    for index in range(3):
+        writer.add_asset("image", {"path": "/tex/{}.tx".format(index)})
+    writer.add_asset("model", {"path": u"/cache/模型.abc"})
+    writer.add_asset("OCIO", {"path": "/ocio/config.ocio"})
+    writer.compact()
+
+    task_info = _load(os.path.join(task_path, "task.json"))
+    assert task_info == {
+        "task_info": {"project_name": "Project1"},
+        "scene_info": {"rendernodes": {
+            "Render1": {"aov": {}, "frames": "1-10[1]"}}},
+    }
+    asset_info = _load(os.path.join(task_path, "asset.json"))
+    assert list(asset_info) == ["model", "image", "USD", "OCIO"]
+    assert asset_info["model"] == [{"path": u"/cache/模型.abc"}]
+    assert [item["path"] for item in asset_info["image"]] == [
+        "/tex/0.tx", "/tex/1.tx", "/tex/2.tx"]
+    assert asset_info["USD"] == []
+    assert not os.path.exists(os.path.join(task_path, STREAM_FOLDER))
+
+
+def test_compact_without_rendernodes_keeps_task_json(tmpdir):
+    """Test task.json is left alone when the scene has no Render node."""
+    task_path = str(tmpdir)
+    with open(os.path.join(task_path, "task.json"), "w") as task_file:
+        json.dump({"task_info": {}}, task_file)
+    ResultWriter(task_path).compact()
+    assert _load(os.path.join(task_path, "task.json")) == {"task_info": {}}
+    assert _load(os.path.join(task_path, "asset.json")) == {}
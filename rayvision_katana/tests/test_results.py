@@ -0,0 +1,110 @@
+"""Test for results.py."""
+
+# pylint: disable=import-error
+import json
+import os
+
+import pytest
+
+from rayvision_katana.analyse_katana import AnalyzeKatana
+from rayvision_katana.result_writer import ResultWriter
+from rayvision_katana.results import AssetTable
+from rayvision_katana.results import compress_result
+from rayvision_katana.results import iter_asset_json
+from rayvision_katana.results import load_result
+
+ASSET_INFO = {
+    "model": [{"node": "Alembic_In", "type": "Alembic_In",
+               "parameter": "abcAsset", "path": u"/cache/镜头.abc",
+               "render_nodes": ["Render"]}],
+    "image": [{"node": "tex%s" % index, "type": "ArnoldShadingNode",
+               "parameter": "parameters.filename.value",
+               "path": "/tex/wood/wood.%s.tx" % (1001 + index),
+               "render_nodes": ["Render"]} for index in range(20)],
+    "USD": [],
+    "OCIO": [{"path": "config.ocio"}],
+}
+
+
+def _records(asset_info):
+    return [(category, record) for category, records in asset_info.items()
+            for record in records]
+
+
+def test_iter_asset_json_layouts(tmpdir):
+    """Test that both asset.json layouts stream, compressed or not."""
+    writer = ResultWriter(str(tmpdir))
+    writer.declare_categories(list(ASSET_INFO))
+    for category, record in _records(ASSET_INFO):
+        writer.add_asset(category, record)
+    writer.compact()
+    compact_json = str(tmpdir.join("asset.json"))
+    indented_json = str(tmpdir.join("indented.json"))
+    with open(indented_json, "w") as indented:
+        json.dump(ASSET_INFO, indented, indent=2)
+
+    for path in (compact_json, indented_json, compress_result(compact_json)):
+        categories = []
+        records = list(iter_asset_json(path, categories.append, read_size=7))
+        assert records == _records(ASSET_INFO)
+        assert categories == list(ASSET_INFO)
+    assert load_result(compact_json) == ASSET_INFO
+
+    with open(indented_json, "w") as indented:
+        indented.write('{"model": [{"path": "/a.abc"}')
+    with pytest.raises(ValueError):
+        list(iter_asset_json(indented_json))
+
+
+def test_asset_table_shares_strings():
+    """Test that the table gives the records back, sharing their strings."""
+    table = AssetTable.from_dict(ASSET_INFO)
+    assert len(table) == 22
+    assert table.to_dict() == ASSET_INFO
+    assert list(table) == _records(ASSET_INFO)
+    rows = table._rows["image"]  # pylint: disable=protected-access
+    assert rows[0][3] is rows[1][3] == "/tex/wood/"
+    assert rows[0][5] is rows[1][5]
+    assert list(table.paths())[-1] == "config.ocio"
+
+
+class _Text(type(u"")):
+    """Text that cannot be interned, like unicode on Python 2."""
+
+
+def test_asset_table_shares_uninternable_strings():
+    """Test that strings intern rejects are shared as well."""
+    records = [("image", {"node": _Text("tex"), "type": _Text("Shader"),
+                          "parameter": _Text("filename"),
+                          "path": _Text("/tex/wood.%s.tx" % index),
+                          "flags": [_Text("udim"), True, 1]})
+               for index in range(2)]
+    table = AssetTable(records)
+    rows = table._rows["image"]  # pylint: disable=protected-access
+    assert rows[0][0] is rows[1][0] == "tex"
+    assert rows[0][3] is rows[1][3] == "/tex/"
+    assert table.to_dict()["image"][0]["flags"] == ["udim", True, 1]
+    assert table.to_dict()["image"][0]["flags"][1] is True
+
+
+def test_results_are_read_lazily(analyze_info, fake_katana):
+    """Test that the results are read on access and can be compressed."""
+    analyzer = AnalyzeKatana(compress_results=True, **analyze_info)
+    analyzer.analyse(exe_path=fake_katana, no_upload=True)
+    assert not os.path.exists(analyzer.asset_json)
+    with open(analyzer.tips_json, "w") as tips:
+        json.dump({"changed": ["after the analysis"]}, tips)
+    assert analyzer.tips_info == {"changed": ["after the analysis"]}
+
+    analyzer.asset_info = ASSET_INFO
+    assert list(analyzer.iter_assets()) == _records(ASSET_INFO)
+    table = analyzer.compact_result()
+    assert list(analyzer.iter_assets()) == _records(ASSET_INFO)
+    assert analyzer.asset_info == ASSET_INFO
+    assert analyzer.compact_result() is not table
+
+    analyzer.load_result()
+    assert analyzer.asset_info == {}
+    os.remove(analyzer.tips_json)
+    with pytest.raises(IOError):
+        analyzer.load_result()
@@ -0,0 +1,60 @@
+"""Test for worker.py."""
+
+# pylint: disable=import-error
+import pytest
+
+from rayvision_utils.exception.exception import AnalyseFailError
+
+from rayvision_katana.analyse_katana import AnalyzeKatana
+from rayvision_katana.worker import KatanaWorker
+
+
+def _scene(tmpdir, name):
+    cg_file = str(tmpdir.join(name))
+    with open(cg_file, "w"):
+        pass
+    return cg_file
+
+
+def test_worker_is_reused(analyze_info, fake_katana_worker):
+    """Test several analyses share one warm worker process."""
+    with KatanaWorker(fake_katana_worker) as worker:
+        first = AnalyzeKatana(worker=worker, **analyze_info).analyse()
+        pid = worker.pid
+        second = AnalyzeKatana(worker=worker, **analyze_info).analyse()
+        assert worker.pid == pid
+        assert worker.jobs == 2
+    assert first.tips_info == {}
+    assert second.asset_info == {}
+    assert not worker.alive
+
+
+def test_worker_restarts_after_crash(tmpdir, analyze_info,
+                                     fake_katana_worker):
+    """Test a crashed worker fails its job and is replaced for the next."""
+    worker = KatanaWorker(fake_katana_worker)
+    analyze_info["cg_file"] = _scene(tmpdir, "crash.katana")
+    crashed = AnalyzeKatana(worker=worker, **analyze_info)
+    with pytest.raises(AnalyseFailError):
+        crashed.analyse()
+    assert "999" in crashed.tips_info
+    analyze_info["cg_file"] = _scene(tmpdir, "shot.katana")
+    AnalyzeKatana(worker=worker, **analyze_info).analyse()
+    assert worker.alive
+    worker.stop()
+
+
+def test_worker_is_recycled(tmpdir, fake_katana_worker):
+    """Test the process is replaced after ``max_jobs`` or ``max_rss_mb``."""
+    cg_file = _scene(tmpdir, "shot.katana")
+    worker = KatanaWorker(fake_katana_worker, max_rss_mb=1)
+    worker.analyse(cg_file, str(tmpdir))
+    assert not worker.alive
+    worker = KatanaWorker(fake_katana_worker, max_jobs=2)
+    worker.analyse(cg_file, str(tmpdir))
+    assert worker.alive
+    worker.analyse(cg_file, str(tmpdir))
+    assert not worker.alive
+    with pytest.raises(AnalyseFailError):
+        worker.analyse(_scene(tmpdir, "broken.katana"), str(tmpdir))
+    worker.stop()
@@ -0,0 +1,126 @@
+"""Test for workspace.py."""
+
+# pylint: disable=import-error
+import json
+import os
+import time
+import zipfile
+
+from rayvision_katana import workspace
+from rayvision_katana.workspace import WorkspaceManager
+
+DAY = 24 * 3600
+
+
+def _workspace(root, name, age, size=10, cg_file="/shots/a.katana"):
+    path = root.mkdir(name)
+    path.join("task.json").write(json.dumps({"task_info": {
+        "task_id": "task" + name, "input_cg_file": cg_file}}))
+    path.join("upload.json").write("x" * size)
+    mtime = time.time() - age
+    for item in path.listdir() + [path]:
+        os.utime(str(item), (mtime, mtime))
+    return str(path)
+
+
+def test_retention_rules(tmpdir):
+    """Test the age, count and size rules and the grace period."""
+    _workspace(tmpdir, "1001", 10 * DAY)
+    _workspace(tmpdir, "1002", 5 * DAY)
+    _workspace(tmpdir, "1003", 2 * DAY, size=1000)
+    _workspace(tmpdir, "1004", 60)
+    tmpdir.mkdir("history")
+    root = str(tmpdir)
+
+    result = WorkspaceManager(root, max_age=7 * DAY).sweep()
+    assert result.removed == ["1001"]
+    result = WorkspaceManager(root, max_count=1).sweep()
+    assert result.removed == ["1002", "1003"]
+    assert os.path.isdir(os.path.join(root, "1004"))
+    assert os.path.isdir(os.path.join(root, "history"))
+
+    _workspace(tmpdir, "1005", 3 * DAY, size=5000)
+    result = WorkspaceManager(root, max_bytes=1000, grace=0).sweep()
+    assert result.removed == ["1005"]
+    assert result.freed_bytes > 5000
+
+
+def test_archive_and_lookup(tmpdir):
+    """Test that removed workspaces can be found and extracted."""
+    _workspace(tmpdir, "2001", 3 * DAY, cg_file="/shots/a.katana")
+    _workspace(tmpdir, "2002", 3 * DAY, cg_file="/shots/b.katana")
+    _workspace(tmpdir, "2003", 2 * DAY, cg_file="/shots/b.katana")
+    manager = WorkspaceManager(str(tmpdir), max_age=DAY, archive=True)
+    result = manager.sweep()
+    assert sorted(result.archived) == ["2001", "2002", "2003"]
+    assert len([name for name in os.listdir(manager.archive_root)
+                if name.endswith(".zip")]) == 2
+
+    assert [row[0] for row in manager.find(cg_file="/shots/b.katana")] == [
+        "2002", "2003"]
+    assert manager.find(task_id="task2001")[0][0] == "2001"
+    folder = manager.extract("2002", str(tmpdir.join("restored")))
+    with open(os.path.join(folder, "task.json")) as task_file:
+        assert json.load(task_file)["task_info"]["task_id"] == "task2002"
+
+
+def test_sizes_only_scanned_for_a_size_limit(tmpdir, monkeypatch):
+    """Test that an age sweep only walks the workspaces it removes."""
+    scanned = []
+    scan_workspace = workspace.scan_workspace
+
+    def counting_scan(path):
+        scanned.append(os.path.basename(path))
+        return scan_workspace(path)
+
+    monkeypatch.setattr(workspace, "scan_workspace", counting_scan)
+    _workspace(tmpdir, "4001", 10 * DAY, size=100)
+    _workspace(tmpdir, "4002", 60)
+    result = WorkspaceManager(str(tmpdir), max_age=DAY).sweep()
+    assert result.removed == ["4001"]
+    assert result.freed_bytes > 100
+    assert scanned == ["4001"]
+
+
+def test_repacked_workspace_is_archived_once(tmpdir):
+    """Test that packing a workspace again replaces its archived copy."""
+    _workspace(tmpdir, "5001", 3 * DAY)
+    _workspace(tmpdir, "5002", 3 * DAY)
+    manager = WorkspaceManager(str(tmpdir), max_age=DAY, archive=True)
+    manager.sweep()
+    # The same folder name again, a day later.
+    _workspace(tmpdir, "5001", 2 * DAY)
+    manager.sweep()
+    names = []
+    for archive in os.listdir(manager.archive_root):
+        if archive.endswith(".zip"):
+            with zipfile.ZipFile(os.path.join(manager.archive_root,
+                                              archive)) as zip_file:
+                names.extend(zip_file.namelist())
+    assert sorted(names) == ["5001/task.json", "5001/upload.json",
+                             "5002/task.json", "5002/upload.json"]
+    assert len(manager.find(name="5001")) == 1
+
+
+def test_archive_retention(tmpdir):
+    """Test that old archives are removed with their index entries."""
+    _workspace(tmpdir, "6001", 3 * DAY)
+    manager = WorkspaceManager(str(tmpdir), max_age=DAY, archive=True,
+                               archive_max_age=10 * DAY)
+    assert manager.sweep().evicted_archives == []
+    result = manager.sweep(now=time.time() + 20 * DAY)
+    assert len(result.evicted_archives) == 1
+    assert manager.archives() == []
+    assert manager.find(name="6001") == []
+
+
+def test_background_sweep(tmpdir):
+    """Test that the background thread sweeps."""
+    _workspace(tmpdir, "3001", 10 * DAY)
+    manager = WorkspaceManager(str(tmpdir), max_age=DAY)
+    manager.start(interval=0.05)
+    deadline = time.time() + 5
+    while os.path.exists(str(tmpdir.join("3001"))) and time.time() < deadline:
+        time.sleep(0.05)
+    manager.stop()
+    assert not os.path.exists(str(tmpdir.join("3001")))
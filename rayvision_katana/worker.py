@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""Client side of the warm Katana analysis worker.
+
+``KatanaWorker`` starts ``katana_worker.py`` inside katanaBin once and sends
+it one job per scene, so Katana start-up and plugin loading are paid once
+instead of per analysis. A worker that crashes is restarted on the next job,
+and one that ran too many jobs or grew too large is recycled.
+
+"""
+
+import json
+import logging
+import os
+import socket
+import subprocess
+import threading
+
+from rayvision_utils.exception.exception import AnalyseFailError
+
+from rayvision_katana.constants import WORKER_MAX_JOBS
+from rayvision_katana.constants import WORKER_START_TIMEOUT
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             "katana_worker.py")
+
+
+class KatanaWorker(object):
+    """A long-lived katanaBin process analysing one scene at a time."""
+
+    def __init__(self, exe_path, script_path=WORKER_SCRIPT,
+                 max_jobs=WORKER_MAX_JOBS, max_rss_mb=None,
+                 start_timeout=WORKER_START_TIMEOUT, job_timeout=None,
+                 logger=None):
+        """Initialize the worker, the process starts with the first job.
+
+        Args:
+            exe_path (str): katanaBin, or a ``.sh``/``.bat`` stand-in that
+                takes the script path as its first argument.
+            script_path (str): Worker script run inside Katana.
+            max_jobs (int): Jobs served before the process is recycled.
+            max_rss_mb (int, optional): Resident memory above which the
+                process is recycled after a job.
+            start_timeout (int): Seconds to wait for Katana to start.
+            job_timeout (int, optional): Seconds to wait for one analysis.
+            logger (object, optional): Custom log object.
+
+        """
+        self.exe_path = exe_path
+        self.script_path = script_path
+        self.max_jobs = max_jobs
+        self.max_rss_mb = max_rss_mb
+        self.start_timeout = start_timeout
+        self.job_timeout = job_timeout
+        self.logger = logger or logging.getLogger(__name__)
+        self.pid = None
+        self.jobs = 0
+        self._process = None
+        self._sock = None
+        self._reader = None
+        self._lock = threading.Lock()
+
+    @property
+    def alive(self):
+        """bool: True if the worker process is running."""
+        return self._process is not None and self._process.poll() is None
+
+    def command(self, port):
+        """Build the command line that starts the worker."""
+        if str(self.exe_path).endswith(('.sh', '.bat')):
+            return [self.exe_path, self.script_path, "-port", str(port)]
+        return [self.exe_path, "--script", self.script_path,
+                "-port", str(port)]
+
+    def _log_output(self, stdout):
+        for line in iter(stdout.readline, b""):
+            line = line.strip()
+            if line:
+                self.logger.debug("[katana %s] %s", self.pid,
+                                  line.decode("utf-8", "replace"))
+        stdout.close()
+
+    def start(self):
+        """Start the Katana process and wait until it is ready."""
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            server.bind(("127.0.0.1", 0))
+            server.listen(1)
+            server.settimeout(self.start_timeout)
+            cmd = self.command(server.getsockname()[1])
+            self.logger.info("start katana worker: %s", cmd)
+            self._process = subprocess.Popen(cmd, stdout=subprocess.PIPE,
+                                             stderr=subprocess.STDOUT)
+            output = threading.Thread(target=self._log_output,
+                                      args=(self._process.stdout,))
+            output.daemon = True
+            output.start()
+            try:
+                self._sock, _ = server.accept()
+            except socket.timeout:
+                self.kill()
+                raise AnalyseFailError("Katana worker did not start")
+        finally:
+            server.close()
+        self._sock.settimeout(self.start_timeout)
+        self._reader = self._sock.makefile("rb")
+        self.pid = self._receive()["pid"]
+        self.jobs = 0
+
+    def _send(self, message):
+        self._sock.sendall((json.dumps(message) + "\n").encode("utf-8"))
+
+    def _receive(self):
+        line = self._reader.readline()
+        if not line:
+            raise EOFError("Katana worker closed the connection")
+        return json.loads(line.decode("utf-8"))
+
+    def analyse(self, cg_file, task_path):
+        """Analyse one scene, starting or restarting the worker if needed.
+
+        Args:
+            cg_file (str): Scene file path.
+            task_path (str): Folder holding task.json.
+
+        Raises:
+            AnalyseFailError: The analysis failed or the worker crashed.
+
+        """
+        with self._lock:
+            if not self.alive:
+                self.kill()
+                self.start()
+            try:
+                self._sock.settimeout(self.job_timeout)
+                self._send({"file": cg_file, "task": task_path})
+                reply = self._receive()
+            except (EOFError, ValueError, socket.error) as err:
+                self.logger.error("Katana worker %s died: %s", self.pid, err)
+                self.kill()
+                raise AnalyseFailError("Katana worker died: {}".format(err))
+
+            self.jobs += 1
+            rss_kb = reply.get("rss_kb")
+            if self.jobs >= self.max_jobs or (
+                    self.max_rss_mb and rss_kb
+                    and rss_kb > self.max_rss_mb * 1024):
+                self.logger.info("recycle katana worker %s after %s jobs, "
+                                 "rss %s KB", self.pid, self.jobs, rss_kb)
+                self.stop()
+
+        if reply.get("status") != "ok":
+            self.logger.error(reply.get("error"))
+            raise AnalyseFailError(reply.get("error"))
+
+    def stop(self, timeout=30):
+        """Ask the worker to exit, killing it if it does not."""
+        if self.alive:
+            try:
+                self._send({"command": "stop"})
+                self._process.wait(timeout=timeout)
+            except Exception:  # pylint: disable=broad-except
+                self.logger.debug("katana worker %s did not stop", self.pid)
+        self.kill()
+
+    def kill(self):
+        """Kill the worker process and drop the connection."""
+        if self.alive:
+            self._process.kill()
+        if self._process is not None:
+            self._process.wait()
+            self._process = None
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
@@ -0,0 +1,411 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""Retention of the analysis workspaces of a workspace root.
+
+Every analysis leaves a ``<workspace root>/<tmp_mark>`` folder holding its
+json files. ``WorkspaceManager.sweep`` removes the finished ones beyond an
+age, a count or a total size, oldest first. Removed workspaces can be packed
+into one zip archive per day first; an SQLite index of the archives finds a
+workspace again by its folder name, task id or scene. The archives have an
+age and a total size limit of their own.
+
+The age of a workspace is the mtime of its folder; the files of the
+workspaces are only walked when a total size limit needs their sizes.
+
+Only folders whose names are all digits are considered, so the caches kept
+in the workspace root are never touched.
+
+"""
+
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import zipfile
+
+from rayvision_katana.constants import WORKSPACE_ARCHIVE_NAME
+from rayvision_katana.constants import WORKSPACE_GRACE
+
+
+class WorkspaceInfo(object):
+    """A workspace folder with its size, or None, and modification time."""
+
+    __slots__ = ("name", "path", "mtime", "size")
+
+    def __init__(self, name, path, mtime, size):
+        self.name = name
+        self.path = path
+        self.mtime = mtime
+        self.size = size
+
+
+def scan_workspace(path):
+    """Get the newest mtime and the total size of the files of a folder."""
+    mtime = os.stat(path).st_mtime
+    size = 0
+    for folder, _, names in os.walk(path):
+        for name in names:
+            try:
+                file_stat = os.stat(os.path.join(folder, name))
+            except OSError:
+                continue
+            size += file_stat.st_size
+            mtime = max(mtime, file_stat.st_mtime)
+    return mtime, size
+
+
+class SweepResult(object):
+    """What a sweep did."""
+
+    def __init__(self):
+        self.removed = []
+        self.archived = []
+        self.evicted_archives = []
+        self.freed_bytes = 0
+
+    def to_dict(self):
+        """Get the result as a json serializable dict."""
+        return {"removed": self.removed, "archived": self.archived,
+                "evicted_archives": self.evicted_archives,
+                "freed_bytes": self.freed_bytes}
+
+
+class WorkspaceManager(object):
+    """Apply retention rules to the workspaces of a workspace root."""
+
+    def __init__(self, root, max_age=None, max_count=None, max_bytes=None,
+                 archive=False, grace=WORKSPACE_GRACE, logger=None,
+                 archive_max_age=None, archive_max_bytes=None):
+        """Initialize the manager.
+
+        Args:
+            root (str): Workspace root of the analyses.
+            max_age (float, optional): Seconds a workspace is kept.
+            max_count (int, optional): Workspaces kept, newest first.
+            max_bytes (int, optional): Total size of the workspaces kept.
+            archive (bool): Pack the workspaces into the daily archives
+                before removing them.
+            grace (float): Seconds since its last change before a workspace
+                counts as finished and can be removed.
+            logger (logging.Logger, optional): Logger of the sweeps.
+            archive_max_age (float, optional): Seconds an archive is kept
+                after its last change.
+            archive_max_bytes (int, optional): Total size of the archives
+                kept, newest first.
+
+        """
+        self.root = root
+        self.max_age = max_age
+        self.max_count = max_count
+        self.max_bytes = max_bytes
+        self.archive = archive
+        self.grace = grace
+        self.logger = logger
+        self.archive_max_age = archive_max_age
+        self.archive_max_bytes = archive_max_bytes
+        self.archive_root = os.path.join(root, WORKSPACE_ARCHIVE_NAME)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def workspaces(self):
+        """Get the workspaces of the root, oldest first."""
+        try:
+            names = os.listdir(self.root)
+        except OSError:
+            return []
+        infos = []
+        for name in names:
+            path = os.path.join(self.root, name)
+            if not name.isdigit() or not os.path.isdir(path):
+                continue
+            try:
+                if self.max_bytes is None:
+                    mtime, size = os.stat(path).st_mtime, None
+                else:
+                    mtime, size = scan_workspace(path)
+            except OSError:
+                continue
+            infos.append(WorkspaceInfo(name, path, mtime, size))
+        infos.sort(key=lambda info: info.mtime)
+        return infos
+
+    def expired(self, infos, now=None):
+        """Get the finished workspaces that break a retention rule.
+
+        Args:
+            infos (list): Workspaces, oldest first.
+            now (float, optional): Current time.
+
+        """
+        now = time.time() if now is None else now
+        expired = set()
+        if self.max_age is not None:
+            expired.update(info.name for info in infos
+                           if now - info.mtime > self.max_age)
+        if self.max_count is not None and len(infos) > self.max_count:
+            expired.update(info.name
+                           for info in infos[:len(infos) - self.max_count])
+        if self.max_bytes is not None:
+            total = sum(info.size for info in infos)
+            for info in infos:
+                if total <= self.max_bytes:
+                    break
+                expired.add(info.name)
+                total -= info.size
+        return [info for info in infos if info.name in expired
+                and now - info.mtime > self.grace]
+
+    def sweep(self, now=None):
+        """Remove, and optionally archive, the expired workspaces.
+
+        Returns:
+            SweepResult
+
+        """
+        result = SweepResult()
+        with self._lock:
+            expired = self.expired(self.workspaces(), now)
+            if self.archive and expired:
+                result.archived = self.pack(expired)
+                archived = set(result.archived)
+                expired = [info for info in expired if info.name in archived]
+            for info in expired:
+                if info.size is None:
+                    try:
+                        info.size = scan_workspace(info.path)[1]
+                    except OSError:
+                        info.size = 0
+                shutil.rmtree(info.path, ignore_errors=True)
+                result.removed.append(info.name)
+                result.freed_bytes += info.size
+            if self.archive_max_age is not None \
+                    or self.archive_max_bytes is not None:
+                result.evicted_archives = self.evict_archives(now)
+        if self.logger and result.removed:
+            self.logger.info("removed %s workspaces, %s bytes",
+                             len(result.removed), result.freed_bytes)
+        return result
+
+    def _connect(self):
+        if not os.path.isdir(self.archive_root):
+            os.makedirs(self.archive_root)
+        conn = sqlite3.connect(os.path.join(self.archive_root, "index.db"),
+                               timeout=30)
+        conn.execute("CREATE TABLE IF NOT EXISTS workspace ("
+                     "name TEXT PRIMARY KEY, "
+                     "archive TEXT NOT NULL, "
+                     "task_id TEXT, "
+                     "cg_file TEXT, "
+                     "mtime REAL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS workspace_task_id "
+                     "ON workspace (task_id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS workspace_cg_file "
+                     "ON workspace (cg_file)")
+        return conn
+
+    @staticmethod
+    def _task_info(path):
+        try:
+            with open(os.path.join(path, "task.json")) as task_file:
+                return json.load(task_file).get("task_info", {})
+        except (IOError, OSError, ValueError, AttributeError):
+            return {}
+
+    def archives(self):
+        """Get the archive files with their size and mtime, oldest first."""
+        try:
+            names = os.listdir(self.archive_root)
+        except OSError:
+            return []
+        archives = []
+        for name in sorted(names):
+            if not name.endswith(".zip"):
+                continue
+            path = os.path.join(self.archive_root, name)
+            try:
+                archive_stat = os.stat(path)
+            except OSError:
+                continue
+            archives.append((name, archive_stat.st_size,
+                             archive_stat.st_mtime))
+        return archives
+
+    def evict_archives(self, now=None):
+        """Remove the archives beyond the archive age or total size.
+
+        Returns:
+            list: Names of the archives removed.
+
+        """
+        now = time.time() if now is None else now
+        archives = self.archives()
+        evicted = set()
+        if self.archive_max_age is not None:
+            evicted.update(name for name, _, mtime in archives
+                           if now - mtime > self.archive_max_age)
+        if self.archive_max_bytes is not None:
+            total = sum(size for _, size, _ in archives)
+            for name, size, _ in archives:
+                if total <= self.archive_max_bytes:
+                    break
+                evicted.add(name)
+                total -= size
+        evicted = sorted(evicted)
+        if not evicted:
+            return evicted
+        conn = self._connect()
+        try:
+            for name in evicted:
+                os.remove(os.path.join(self.archive_root, name))
+                with conn:
+                    conn.execute("DELETE FROM workspace WHERE archive = ?",
+                                 (name,))
+        finally:
+            conn.close()
+        if self.logger:
+            self.logger.info("removed %s workspace archives", len(evicted))
+        return evicted
+
+    def _drop_members(self, archive, names):
+        """Rewrite an archive without the files of some workspaces."""
+        path = os.path.join(self.archive_root, archive)
+        if not os.path.exists(path):
+            return
+        prefixes = tuple(name + "/" for name in names)
+        tmp_path = "{}.{}.tmp".format(path, os.getpid())
+        with zipfile.ZipFile(path) as source, \
+                zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED) as target:
+            for member in source.infolist():
+                if not member.filename.startswith(prefixes):
+                    target.writestr(member, source.read(member))
+        if os.name == "nt":
+            os.remove(path)
+        os.rename(tmp_path, path)
+
+    def pack(self, infos):
+        """Add workspaces to the archives of the days they last changed.
+
+        Every archive is opened once per call. A workspace packed before is
+        dropped from its archive first, so an archive holds one copy of it.
+
+        Returns:
+            list: Names of the workspaces that were archived.
+
+        """
+        by_day = {}
+        for info in infos:
+            day = time.strftime("%Y-%m-%d", time.localtime(info.mtime))
+            by_day.setdefault(day, []).append(info)
+        archived = []
+        conn = self._connect()
+        try:
+            packed = {}
+            for info in infos:
+                for (archive,) in conn.execute(
+                        "SELECT archive FROM workspace WHERE name = ?",
+                        (info.name,)):
+                    packed.setdefault(archive, []).append(info.name)
+            for archive, names in sorted(packed.items()):
+                self._drop_members(archive, names)
+            for day, day_infos in sorted(by_day.items()):
+                archive = os.path.join(self.archive_root, day + ".zip")
+                rows = []
+                with zipfile.ZipFile(archive, "a", zipfile.ZIP_DEFLATED) \
+                        as zip_file:
+                    for info in day_infos:
+                        for folder, _, names in os.walk(info.path):
+                            for name in names:
+                                file_path = os.path.join(folder, name)
+                                zip_file.write(file_path, os.path.join(
+                                    info.name,
+                                    os.path.relpath(file_path, info.path)))
+                        task_info = self._task_info(info.path)
+                        rows.append((info.name, day + ".zip",
+                                     task_info.get("task_id") or None,
+                                     task_info.get("input_cg_file") or None,
+                                     info.mtime))
+                with conn:
+                    conn.executemany("INSERT OR REPLACE INTO workspace "
+                                     "VALUES (?, ?, ?, ?, ?)", rows)
+                archived.extend(row[0] for row in rows)
+        finally:
+            conn.close()
+        return archived
+
+    def find(self, name=None, task_id=None, cg_file=None):
+        """Find archived workspaces.
+
+        Args:
+            name (str, optional): Workspace folder name.
+            task_id (str, optional): Task id of task.json.
+            cg_file (str, optional): Scene path of task.json.
+
+        Returns:
+            list: ``(name, archive path, task_id, cg_file)`` tuples.
+
+        """
+        clauses = []
+        values = []
+        for column, value in (("name", name), ("task_id", task_id),
+                              ("cg_file", cg_file)):
+            if value is not None:
+                clauses.append("{} = ?".format(column))
+                values.append(value.replace("\\", "/") if column == "cg_file"
+                              else value)
+        query = "SELECT name, archive, task_id, cg_file FROM workspace"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        conn = self._connect()
+        try:
+            rows = conn.execute(query + " ORDER BY mtime", values).fetchall()
+        finally:
+            conn.close()
+        return [(row[0], os.path.join(self.archive_root, row[1])) + row[2:]
+                for row in rows]
+
+    def extract(self, name, target):
+        """Extract an archived workspace into ``target/<name>``.
+
+        Raises:
+            KeyError: The workspace is not archived.
+
+        """
+        found = self.find(name=name)
+        if not found:
+            raise KeyError(name)
+        prefix = name + "/"
+        with zipfile.ZipFile(found[0][1]) as zip_file:
+            members = [member for member in zip_file.namelist()
+                       if member.startswith(prefix)]
+            zip_file.extractall(target, members)
+        return os.path.join(target, name)
+
+    def start(self, interval=3600):
+        """Sweep in a background thread every ``interval`` seconds."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.is_set():
+                try:
+                    self.sweep()
+                except Exception as err:  # pylint: disable=broad-except
+                    if self.logger:
+                        self.logger.error("workspace sweep failed: %s", err)
+                self._stop.wait(interval)
+
+        self._thread = threading.Thread(target=run,
+                                        name="workspace-sweep")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Stop the background sweeps."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
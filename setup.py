@@ -19,9 +19,13 @@ setup(
     package_dir={'': '.'},
     packages=find_packages('.'),
     description='A Python-based API for Using Renderbus cloud rendering service.',
-    entry_points={},
+    entry_points={
+        'console_scripts': [
+            'rayvision-katana-analyse=rayvision_katana.batch:main',
+        ],
+    },
     install_requires=list(parse_requirements('requirements.txt')),
-    package_data={},
+    package_data={'rayvision_katana': ['filter.txt']},
     classifiers=[
         'Programming Language :: Python',
         'Programming Language :: Python :: 2',